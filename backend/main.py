@@ -1,25 +1,47 @@
 import os
+import time
+import hashlib
 import uuid
 import logging
 import asyncio
+import json
+import math
+import threading
+import zipfile
 from pathlib import Path
-from typing import Dict, Any
+from typing import AsyncIterator, Dict, Any, List, Optional, Tuple
 from contextlib import asynccontextmanager
 
-from fastapi import FastAPI, UploadFile, File, HTTPException, BackgroundTasks
+from fastapi import FastAPI, UploadFile, File, HTTPException, Query, Response
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import JSONResponse
+from fastapi.responses import JSONResponse, StreamingResponse
 from dotenv import load_dotenv
 
 from models.schemas import (
     UploadResponse,
     TaskStatusResponse,
     TaskResultResponse,
+    TaskSectionsResponse,
+    BatchDocument,
+    BatchUploadResponse,
+    BatchStatusResponse,
+    RejectedFile,
     TaskStatus,
+    JobPriority,
     AnalysisResult
 )
-from services.pdf_processor import PDFProcessor
-from services.ernie_analyzer import ERNIEAnalyzer
+from services.pdf_processor import PDFProcessor, summarize_page_records, EXTRACTOR_VERSION
+from services.text_normalizer import normalize_pages, NORMALIZER_VERSION
+from services.ernie_analyzer import ERNIEAnalyzer, SECTION_NAMES
+from services.execution import ExecutionLayer
+from services.task_store import create_task_store
+from services.job_queue import JobQueue, QueueFullError
+from services.file_storage import (
+    stream_to_disk, extract_zip_pdfs, FileTooLargeError, RequestBodyLimit, MULTIPART_OVERHEAD
+)
+from services.cache import ResultCache, TextCache
+from services.events import EventBroker
+from services.single_flight import SingleFlight
 
 # Load environment variables
 load_dotenv()
@@ -35,16 +57,321 @@ logger = logging.getLogger(__name__)
 NOVITA_API_KEY = os.getenv("NOVITA_API_KEY")
 MAX_FILE_SIZE_MB = int(os.getenv("MAX_FILE_SIZE_MB", "10"))
 UPLOAD_DIR = Path(os.getenv("UPLOAD_DIR", "./uploads"))
+IO_THREAD_WORKERS = int(os.getenv("IO_THREAD_WORKERS", "32"))
+CPU_PROCESS_WORKERS = int(os.getenv("CPU_PROCESS_WORKERS", str(min(4, os.cpu_count() or 1))))
+PDF_EXTRACT_WORKERS = int(os.getenv("PDF_EXTRACT_WORKERS", str(max(1, CPU_PROCESS_WORKERS))))
+PDF_PARALLEL_MIN_PAGES = int(os.getenv("PDF_PARALLEL_MIN_PAGES", "16"))
+PDF_NORMALIZE_TEXT = os.getenv("PDF_NORMALIZE_TEXT", "true").lower() in ("1", "true", "yes")
+ERNIE_MAX_CONCURRENT_COMPLETIONS = int(os.getenv("ERNIE_MAX_CONCURRENT_COMPLETIONS", "8"))
+ERNIE_HTTP_MAX_CONNECTIONS = int(os.getenv("ERNIE_HTTP_MAX_CONNECTIONS", "20"))
+ERNIE_HTTP_MAX_KEEPALIVE = int(os.getenv("ERNIE_HTTP_MAX_KEEPALIVE", "10"))
+ANALYSIS_MODE = os.getenv("ANALYSIS_MODE", "monolithic")
+ANALYSIS_SECTION_CONCURRENCY = int(os.getenv("ANALYSIS_SECTION_CONCURRENCY", "6"))
+ANALYSIS_CHUNK_CHARS = int(os.getenv("ANALYSIS_CHUNK_CHARS", "12000"))
+ANALYSIS_MAP_CONCURRENCY = int(os.getenv("ANALYSIS_MAP_CONCURRENCY", "6"))
+ANALYSIS_RETRIEVAL_TOP_K = int(os.getenv("ANALYSIS_RETRIEVAL_TOP_K", "8"))
+ERNIE_RESPONSE_FORMAT = os.getenv("ERNIE_RESPONSE_FORMAT", "auto")
+ERNIE_STREAM = os.getenv("ERNIE_STREAM", "true").lower() in ("1", "true", "yes")
+ERNIE_CONTEXT_WINDOW = int(os.getenv("ERNIE_CONTEXT_WINDOW", "131072"))
+ERNIE_TOKENIZER = os.getenv("ERNIE_TOKENIZER", "approx")
+ERNIE_INPUT_TOKENS = int(os.getenv("ERNIE_INPUT_TOKENS", "4500"))
+TASK_STORE = os.getenv("TASK_STORE", "sqlite")
+TASK_DB_PATH = os.getenv("TASK_DB_PATH", "./tasks.db")
+TASK_RETENTION_HOURS = float(os.getenv("TASK_RETENTION_HOURS", "168"))
+JOB_QUEUE_DEPTH = int(os.getenv("JOB_QUEUE_DEPTH", "100"))
+JOB_WORKERS = int(os.getenv("JOB_WORKERS", "8"))
+CACHE_DIR = Path(os.getenv("CACHE_DIR", "./cache"))
+RESULT_CACHE_MAX_MB = int(os.getenv("RESULT_CACHE_MAX_MB", "256"))
+RESULT_CACHE_TTL_HOURS = float(os.getenv("RESULT_CACHE_TTL_HOURS", "720"))
+TEXT_CACHE_MAX_MB = int(os.getenv("TEXT_CACHE_MAX_MB", "512"))
+TEXT_CACHE_TTL_HOURS = float(os.getenv("TEXT_CACHE_TTL_HOURS", "720"))
+EVENTS_RECHECK_SECONDS = float(os.getenv("EVENTS_RECHECK_SECONDS", "15"))
+RESULT_MAX_WAIT_SECONDS = float(os.getenv("RESULT_MAX_WAIT_SECONDS", "60"))
+RESULT_MAX_WAITERS = int(os.getenv("RESULT_MAX_WAITERS", "1000"))
+TASK_CANCEL_WAIT_SECONDS = float(os.getenv("TASK_CANCEL_WAIT_SECONDS", "10"))
+BATCH_DB_PATH = os.getenv("BATCH_DB_PATH", "./batches.db")
+BATCH_MAX_FILES = int(os.getenv("BATCH_MAX_FILES", "200"))
+BATCH_MAX_ARCHIVE_MB = int(os.getenv("BATCH_MAX_ARCHIVE_MB", "500"))
+BATCH_CONCURRENCY = int(os.getenv("BATCH_CONCURRENCY", "4"))
+BATCH_MAX_ACTIVE_JOBS = int(os.getenv("BATCH_MAX_ACTIVE_JOBS", str(max(1, JOB_WORKERS // 2))))
 
 # Ensure upload directory exists
 UPLOAD_DIR.mkdir(exist_ok=True)
 
-# In-memory task storage (for demo purposes)
-tasks: Dict[str, Dict[str, Any]] = {}
+# Task storage, shared across workers and restarts when backed by SQLite
+task_store = create_task_store(TASK_STORE, TASK_DB_PATH)
+# Batch records (the task_ids of a batch), stored the same way
+batch_store = create_task_store(TASK_STORE, BATCH_DB_PATH)
 
 # Initialize services
 pdf_processor = PDFProcessor()
+execution = ExecutionLayer(io_workers=IO_THREAD_WORKERS, cpu_workers=CPU_PROCESS_WORKERS)
+job_queue = JobQueue(max_depth=JOB_QUEUE_DEPTH, workers=JOB_WORKERS)
+result_cache = ResultCache(
+    CACHE_DIR / "results.db",
+    max_bytes=RESULT_CACHE_MAX_MB * 1024 * 1024,
+    ttl_seconds=RESULT_CACHE_TTL_HOURS * 3600
+)
+text_cache = TextCache(
+    CACHE_DIR / "texts.db",
+    max_bytes=TEXT_CACHE_MAX_MB * 1024 * 1024,
+    ttl_seconds=TEXT_CACHE_TTL_HOURS * 3600
+)
+event_broker = EventBroker()
+single_flight = SingleFlight()
 ernie_analyzer = None
+# Recorded as the "owner" of every task this process queues, so a restarted
+# server can tell its predecessors' unfinished tasks from those of live
+# sibling workers sharing the task store
+PROCESS_OWNER = {"pid": os.getpid(), "instance": uuid.uuid4().hex}
+# Requests currently parked in /api/result?wait=...
+result_waiters = 0
+# Feeders submitting the documents of a batch, by batch_id
+batch_feeders: Dict[str, asyncio.Task] = {}
+# Batch documents queued or running, across all batches
+batch_slots = asyncio.Semaphore(max(1, BATCH_MAX_ACTIVE_JOBS))
+batch_active_jobs = 0
+
+
+# Task fields a coalesced follower copies from the task it is attached to
+MIRRORED_FIELDS = (
+    "status", "progress", "stage", "error", "result", "cache_hit", "partial_sections",
+    "coverage", "page_count", "pages_used", "extraction", "normalization", "metadata",
+    "text_cache_hit", "timings", "fallback_sections",
+)
+
+
+# Serializes task writes with followers copying their leader's state, so a
+# follower never ends up with an older state than its leader
+task_write_lock = threading.Lock()
+
+
+def write_task(task_id: str, fields: Dict[str, Any]) -> bool:
+    """Blocking part of ``update_task``; runs in the I/O thread pool"""
+    with task_write_lock:
+        updated = task_store.update(task_id, **fields)
+        written = [task_id] if updated else []
+        mirrored = {name: value for name, value in fields.items() if name in MIRRORED_FIELDS}
+        if mirrored:
+            for follower in single_flight.followers(task_id):
+                if task_store.update(follower, **mirrored):
+                    written.append(follower)
+        for name in written:
+            if event_broker.has_subscribers(name):
+                event_broker.publish(name, task_store.get(name))
+    return updated
+
+
+def copy_leader_state(task_id: str, leader: str) -> None:
+    """Blocking: start a follower from its leader's current state"""
+    with task_write_lock:
+        state = task_store.get(leader) or {}
+        task_store.update(
+            task_id,
+            coalesced_with=leader,
+            **{name: state[name] for name in MIRRORED_FIELDS if name in state}
+        )
+        if event_broker.has_subscribers(task_id):
+            event_broker.publish(task_id, task_store.get(task_id))
+
+
+async def get_task(task_id: str) -> Optional[Dict[str, Any]]:
+    """Read a task record without blocking the event loop on the store"""
+    return await execution.run_io(task_store.get, task_id)
+
+
+async def update_task(task_id: str, **fields: Any) -> bool:
+    """
+    Update a task record and push the new state to its event stream watchers
+    
+    Tasks coalesced onto this one (see ``enqueue_task``) get the same
+    progress, status and result fields. The store is written from the I/O
+    thread pool, so a store busy with other workers' writes never stalls the
+    event loop.
+    """
+    return await execution.run_io(write_task, task_id, fields)
+
+
+async def enqueue_task(task_id: str, content_hash: Optional[str], priority: JobPriority) -> Optional[str]:
+    """
+    Queue a task, or attach it to an in-flight analysis of the same document
+    
+    A follower is never queued: it starts from the leader's current state and
+    receives every later update, including the final result, through
+    ``update_task``.
+    
+    Args:
+        task_id: Task to process
+        content_hash: SHA-256 of the uploaded PDF
+        priority: Priority class of the analysis job
+        
+    Returns:
+        The task_id it was attached to, or None if the task was queued
+        
+    Raises:
+        QueueFullError: If the task had to be queued and the queue is full
+    """
+    leader = single_flight.attach(content_hash, task_id) if content_hash else None
+    if leader is not None:
+        # A waiting leader runs at the highest priority of the tasks sharing it
+        job_queue.promote(leader, priority)
+        await execution.run_io(copy_leader_state, task_id, leader)
+        return leader
+    try:
+        job_queue.submit(task_id, priority)
+    except QueueFullError:
+        single_flight.finish(task_id)
+        raise
+    return None
+
+
+async def release_followers(task_id: str) -> None:
+    """
+    Re-enqueue the followers of a leader that will not run
+    
+    The first follower becomes the new leader (its own upload is kept for
+    this) and the rest attach to it.
+    """
+    for follower in single_flight.finish(task_id):
+        task = await get_task(follower)
+        if task is None:
+            continue
+        try:
+            leader = await enqueue_task(follower, task.get("content_hash"), task.get("priority") or JobPriority.NORMAL)
+            if leader is None:
+                # Now queued on its own, so no longer attached to the old leader
+                await update_task(follower, coalesced_with=None)
+        except QueueFullError:
+            await update_task(
+                follower,
+                status=TaskStatus.FAILED,
+                progress=0,
+                stage="failed",
+                error="Analysis queue is full. Please retry later."
+            )
+
+
+def remove_upload(file_path: Optional[str]) -> None:
+    """Delete an uploaded PDF if it is still on disk"""
+    if not file_path:
+        return
+    try:
+        path = Path(file_path)
+        if path.exists():
+            path.unlink()
+            logger.info(f"Cleaned up file: {path}")
+    except Exception as e:
+        logger.error(f"Failed to clean up file: {str(e)}")
+
+
+def queue_position(task_id: str) -> Optional[int]:
+    """Queue position of a task, or of the task it is attached to"""
+    return job_queue.position(single_flight.leader_of(task_id) or task_id)
+
+
+def task_owner_alive(owner: Optional[Dict[str, Any]]) -> bool:
+    """Whether the process that queued a task may still be running it"""
+    if not owner:
+        return False
+    if owner.get("instance") == PROCESS_OWNER["instance"]:
+        return True
+    pid = owner.get("pid")
+    if not pid or pid == os.getpid():
+        # This process took over the pid of the one that queued the task
+        return False
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+
+async def recover_orphaned_tasks() -> None:
+    """
+    Requeue tasks left pending or processing by a server that stopped
+    
+    The job queue lives in memory, so such tasks would otherwise never
+    finish and their watchers would wait forever. A task is requeued when
+    its upload (or its cached text) is still there, and failed otherwise;
+    batch documents go back to a feeder for their batch. Tasks queued by
+    sibling workers that are still running are left alone, and a
+    conditional update on the owner keeps two starting workers from
+    claiming the same task.
+    """
+    tasks = await execution.run_io(
+        task_store.find_by_status, [TaskStatus.PENDING, TaskStatus.PROCESSING]
+    )
+    batches: Dict[str, List[str]] = {}
+    requeued = failed = 0
+    for task_id, task in sorted(tasks.items(), key=lambda item: item[1].get("created_at", 0)):
+        owner = task.get("owner")
+        if task_owner_alive(owner):
+            continue
+        content_hash = task.get("content_hash")
+        file_path = task.get("file_path")
+        recoverable = bool(file_path and Path(file_path).exists())
+        if not recoverable and content_hash and ernie_analyzer:
+            recoverable = await execution.run_io(
+                text_cache.get_document, text_cache_key(content_hash), ernie_analyzer.prompt_char_budget
+            ) is not None
+        batch_id = task.get("batch_id")
+        if recoverable:
+            fields = {
+                "status": TaskStatus.PENDING,
+                "progress": 0,
+                "stage": "batched" if batch_id else "queued",
+                "partial_sections": None,
+                "coalesced_with": None,
+            }
+        else:
+            fields = {
+                "status": TaskStatus.FAILED,
+                "progress": 0,
+                "stage": "failed",
+                "error": "The server restarted before this task finished and its upload is gone. Please upload it again.",
+            }
+        claimed = await execution.run_io(
+            task_store.update_if, task_id, {"owner": owner}, owner=PROCESS_OWNER, **fields
+        )
+        if not claimed:
+            continue
+        if not recoverable:
+            failed += 1
+            continue
+        requeued += 1
+        if batch_id:
+            batches.setdefault(batch_id, []).append(task_id)
+            continue
+        try:
+            await enqueue_task(task_id, content_hash, task.get("priority") or JobPriority.NORMAL)
+        except QueueFullError:
+            await update_task(
+                task_id,
+                status=TaskStatus.FAILED,
+                stage="failed",
+                error="Analysis queue is full. Please retry later."
+            )
+    for batch_id, task_ids in batches.items():
+        batch_feeders[batch_id] = asyncio.create_task(feed_batch(batch_id, task_ids))
+    if requeued or failed:
+        logger.info(f"Recovered unfinished tasks from a previous run: {requeued} requeued, {failed} failed")
+
+
+async def purge_expired_tasks():
+    """Periodically drop task records older than the retention window"""
+    while True:
+        try:
+            purged = await execution.run_io(task_store.purge, TASK_RETENTION_HOURS * 3600)
+            if purged:
+                logger.info(f"Purged {purged} expired tasks")
+            purged = await execution.run_io(batch_store.purge, TASK_RETENTION_HOURS * 3600)
+            if purged:
+                logger.info(f"Purged {purged} expired batches")
+        except Exception as e:
+            logger.error(f"Task purge failed: {str(e)}")
+        await asyncio.sleep(3600)
 
 
 @asynccontextmanager
@@ -53,16 +380,44 @@ async def lifespan(app: FastAPI):
     global ernie_analyzer
     
     # Startup
+    purge_task = asyncio.create_task(purge_expired_tasks())
+    
     if not NOVITA_API_KEY:
         logger.error("NOVITA_API_KEY not found in environment variables!")
     else:
-        ernie_analyzer = ERNIEAnalyzer(NOVITA_API_KEY)
+        ernie_analyzer = ERNIEAnalyzer(
+            NOVITA_API_KEY,
+            max_concurrent_completions=ERNIE_MAX_CONCURRENT_COMPLETIONS,
+            max_connections=ERNIE_HTTP_MAX_CONNECTIONS,
+            max_keepalive_connections=ERNIE_HTTP_MAX_KEEPALIVE,
+            analysis_mode=ANALYSIS_MODE,
+            section_concurrency=ANALYSIS_SECTION_CONCURRENCY,
+            response_format=ERNIE_RESPONSE_FORMAT,
+            stream=ERNIE_STREAM,
+            chunk_chars=ANALYSIS_CHUNK_CHARS,
+            map_concurrency=ANALYSIS_MAP_CONCURRENCY,
+            context_window=ERNIE_CONTEXT_WINDOW,
+            tokenizer=ERNIE_TOKENIZER,
+            input_tokens=ERNIE_INPUT_TOKENS,
+            retrieval_top_k=ANALYSIS_RETRIEVAL_TOP_K,
+            execution=execution,
+        )
         logger.info("ERNIE Analyzer initialized successfully")
     
+    job_queue.start(process_whitepaper)
+    await recover_orphaned_tasks()
+    
     yield
     
     # Shutdown
     logger.info("Application shutting down")
+    purge_task.cancel()
+    for feeder in list(batch_feeders.values()):
+        feeder.cancel()
+    await job_queue.stop()
+    if ernie_analyzer:
+        await ernie_analyzer.aclose()
+    execution.shutdown(wait=False)
 
 
 # Initialize FastAPI app
@@ -73,6 +428,15 @@ app = FastAPI(
     lifespan=lifespan
 )
 
+# Refuse oversized uploads before their body is received
+app.add_middleware(
+    RequestBodyLimit,
+    limits={
+        "/api/upload": MAX_FILE_SIZE_MB * 1024 * 1024 + MULTIPART_OVERHEAD,
+        "/api/batch": BATCH_MAX_ARCHIVE_MB * 1024 * 1024 + MULTIPART_OVERHEAD,
+    }
+)
+
 # Configure CORS
 app.add_middleware(
     CORSMiddleware,
@@ -101,20 +465,40 @@ async def health_check():
     """Health check endpoint"""
     return {
         "status": "healthy",
-        "ernie_configured": ernie_analyzer is not None
+        "ernie_configured": ernie_analyzer is not None,
+        "tasks": await execution.run_io(task_store.count_by_status),
+        "queue": job_queue.stats(),
+        "execution": execution.stats(),
+        "completions": ernie_analyzer.governor.stats() if ernie_analyzer else None
+    }
+
+
+@app.get("/api/metrics")
+async def metrics():
+    """Cache, queue, structured-output and token budget metrics"""
+    return {
+        "result_cache": await execution.run_io(result_cache.stats),
+        "text_cache": await execution.run_io(text_cache.stats),
+        "events": {**event_broker.stats(), "result_waiters": result_waiters},
+        "coalescing": single_flight.stats(),
+        "batches": {"feeding": len(batch_feeders), "active_jobs": batch_active_jobs},
+        "queue": job_queue.stats(),
+        "response_format": ernie_analyzer.response_format_stats() if ernie_analyzer else None,
+        "tokens": ernie_analyzer.token_stats() if ernie_analyzer else None
     }
 
 
 @app.post("/api/upload", response_model=UploadResponse)
 async def upload_whitepaper(
-    background_tasks: BackgroundTasks,
-    file: UploadFile = File(...)
+    file: UploadFile = File(...),
+    priority: JobPriority = Query(JobPriority.NORMAL)
 ):
     """
     Upload a PDF whitepaper for analysis
     
     Args:
         file: PDF file upload
+        priority: Priority class of the analysis job
         
     Returns:
         UploadResponse with task_id for tracking
@@ -123,48 +507,65 @@ async def upload_whitepaper(
     if not file.filename.lower().endswith('.pdf'):
         raise HTTPException(status_code=400, detail="Only PDF files are accepted")
     
+    # Reject before reading the body when the queue is already full
+    if not job_queue.has_capacity():
+        raise queue_full_error(job_queue.retry_after())
+    
     # Generate unique task ID
     task_id = str(uuid.uuid4())
     
     # Save uploaded file
     file_path = UPLOAD_DIR / f"{task_id}_{file.filename}"
     
+    max_bytes = MAX_FILE_SIZE_MB * 1024 * 1024
+    
     try:
-        # Save file to disk
-        content = await file.read()
+        # Reject up front when the multipart parser already knows the size
+        if file.size is not None and file.size > max_bytes:
+            raise FileTooLargeError(max_bytes, file.size)
         
-        # Check file size
-        size_mb = len(content) / (1024 * 1024)
-        if size_mb > MAX_FILE_SIZE_MB:
-            raise HTTPException(
-                status_code=400,
-                detail=f"File size ({size_mb:.2f}MB) exceeds maximum allowed size ({MAX_FILE_SIZE_MB}MB)"
-            )
+        # Stream to disk in chunks, hashing the content in the same pass
+        size_bytes, content_hash = await stream_to_disk(file, file_path, max_bytes)
         
-        with open(file_path, "wb") as f:
-            f.write(content)
-        
-        logger.info(f"File uploaded: {file.filename} (Task ID: {task_id})")
+        logger.info(f"File uploaded: {file.filename} (Task ID: {task_id}, sha256 {content_hash[:12]})")
         
         # Initialize task status
-        tasks[task_id] = {
+        await execution.run_io(task_store.create, task_id, {
             "status": TaskStatus.PENDING,
             "filename": file.filename,
             "file_path": str(file_path),
             "progress": 0,
+            "stage": "queued",
             "result": None,
-            "error": None
-        }
+            "error": None,
+            "content_hash": content_hash,
+            "size_bytes": size_bytes,
+            "priority": priority,
+            "timings": {},
+            "owner": PROCESS_OWNER
+        })
         
-        # Start background processing
-        background_tasks.add_task(process_whitepaper, task_id)
+        # Queue for processing, unless the same document is already in flight
+        try:
+            leader = await enqueue_task(task_id, content_hash, priority)
+        except QueueFullError as e:
+            await execution.run_io(task_store.delete, task_id)
+            file_path.unlink(missing_ok=True)
+            raise queue_full_error(e.retry_after)
+        
+        if leader is not None:
+            message = "File uploaded successfully. The same document is already being analyzed; this task will get its result."
+        else:
+            message = "File uploaded successfully. Processing started."
         
         return UploadResponse(
             task_id=task_id,
             filename=file.filename,
-            message="File uploaded successfully. Processing started."
+            message=message
         )
         
+    except FileTooLargeError as e:
+        raise HTTPException(status_code=400, detail=str(e))
     except HTTPException:
         raise
     except Exception as e:
@@ -175,6 +576,72 @@ async def upload_whitepaper(
         raise HTTPException(status_code=500, detail=f"Upload failed: {str(e)}")
 
 
+def queue_full_error(retry_after: int) -> HTTPException:
+    """429 response telling the client when the queue should have room again"""
+    return HTTPException(
+        status_code=429,
+        detail="Analysis queue is full. Please retry later.",
+        headers={"Retry-After": str(retry_after)}
+    )
+
+
+async def extract_full_text(file_path: str) -> Dict[str, Any]:
+    """
+    Extract every page of a PDF, fanning page ranges out across the process pool
+    
+    Documents below PDF_PARALLEL_MIN_PAGES are extracted in a single range.
+    The pages are then normalized (see ``normalize_pages``) unless
+    PDF_NORMALIZE_TEXT is off.
+    
+    Args:
+        file_path: Path to the PDF file
+        
+    Returns:
+        Dictionary with text, pages, page_count, pages_used, complete,
+        extraction, normalization and metadata
+        
+    Raises:
+        ValueError: If the PDF is invalid or yields no meaningful text
+    """
+    document = await execution.run_cpu(
+        PDFProcessor.inspect_document, file_path, MAX_FILE_SIZE_MB
+    )
+    page_count = document["page_count"]
+    shards = PDFProcessor.plan_shards(page_count, PDF_EXTRACT_WORKERS, PDF_PARALLEL_MIN_PAGES)
+    logger.info(f"Extracting {page_count} pages in {len(shards)} shard(s)")
+    
+    results = await asyncio.gather(*(
+        execution.run_cpu(PDFProcessor.extract_page_range, file_path, start, end)
+        for start, end in shards
+    ))
+    records = [record for shard in results for record in shard]
+    pages = [record["text"] for record in records]
+    normalization = None
+    if PDF_NORMALIZE_TEXT:
+        pages, normalization = await execution.run_cpu(normalize_pages, pages)
+    text = "\n".join(page_text for page_text in pages if page_text).strip()
+    
+    if len(text) < 50:
+        raise ValueError("Failed to extract meaningful text from PDF")
+    
+    return {
+        **document,
+        "text": text,
+        "pages": pages,
+        "pages_used": page_count,
+        "complete": True,
+        "extraction": summarize_page_records(records),
+        "normalization": normalization,
+    }
+
+
+def text_cache_key(content_hash: str) -> str:
+    """Text cache key for a document under the current extractor and normalizer"""
+    return TextCache.make_key(
+        content_hash, EXTRACTOR_VERSION, NORMALIZER_VERSION if PDF_NORMALIZE_TEXT else None
+    )
+
+
 async def process_whitepaper(task_id: str):
     """
     Background task to process whitepaper
@@ -182,87 +649,243 @@ async def process_whitepaper(task_id: str):
     Args:
         task_id: Unique task identifier
     """
+    task = await get_task(task_id)
+    if task is None:
+        logger.warning(f"Task {task_id} no longer exists, skipping")
+        await release_followers(task_id)
+        return
+    file_path = task["file_path"]
+    timings = task.get("timings") or {}
+    
     try:
-        task = tasks[task_id]
-        file_path = task["file_path"]
-        
         # Update status to processing
-        task["status"] = TaskStatus.PROCESSING
-        task["progress"] = 10
+        await update_task(task_id, status=TaskStatus.PROCESSING, progress=10, stage="extracting")
         logger.info(f"Processing task {task_id}")
         
-        # Step 1: Validate PDF
-        is_valid, error_msg = pdf_processor.validate_pdf(file_path, MAX_FILE_SIZE_MB)
-        if not is_valid:
-            raise ValueError(error_msg)
+        if not ernie_analyzer:
+            raise ValueError("ERNIE Analyzer not initialized. Check NOVITA_API_KEY.")
         
-        task["progress"] = 20
+        # Step 1: Validate PDF and extract its text from a single parse
+        # (parsing is CPU-bound, keep it off the event loop). Only as many
+        # pages as the analysis prompt can use are extracted. A document
+        # extracted before (a re-run, or the same PDF uploaded again) is
+        # read from the text cache instead.
+        started = time.perf_counter()
+        char_budget = ernie_analyzer.prompt_char_budget
+        content_hash = task.get("content_hash")
+        document = await execution.run_io(
+            text_cache.get_document, text_cache_key(content_hash), char_budget
+        ) if content_hash else None
+        text_cache_hit = document is not None
+        if text_cache_hit:
+            logger.info(f"Using cached text for task {task_id}")
+        else:
+            logger.info(f"Extracting text from PDF: {file_path}")
+            if char_budget is None:
+                # The analysis needs the whole document
+                document = await extract_full_text(file_path)
+            else:
+                document = await execution.run_cpu(
+                    PDFProcessor.process_document,
+                    file_path,
+                    MAX_FILE_SIZE_MB,
+                    char_budget,
+                    PDF_NORMALIZE_TEXT
+                )
+            if content_hash:
+                await execution.run_io(
+                    text_cache.put_document, text_cache_key(content_hash), document, char_budget
+                )
+        text = document["text"]
+        timings["extract"] = round(time.perf_counter() - started, 3)
+        await update_task(
+            task_id,
+            progress=40,
+            stage="analyzing",
+            text_cache_hit=text_cache_hit,
+            page_count=document["page_count"],
+            pages_used=document["pages_used"],
+            extraction=document["extraction"],
+            normalization=document["normalization"],
+            metadata=document["metadata"],
+            timings=timings
+        )
         
-        # Step 2: Extract text from PDF
-        logger.info(f"Extracting text from PDF: {file_path}")
-        text = pdf_processor.extract_text(file_path)
-        task["progress"] = 40
+        # Step 2: Analyze with ERNIE
         
-        # Step 3: Analyze with ERNIE
-        if not ernie_analyzer:
-            raise ValueError("ERNIE Analyzer not initialized. Check NOVITA_API_KEY.")
+        # Serve a previous analysis of the same document, prompt and model,
+        # unless this run was asked for through /api/analyze
+        text_hash = hashlib.sha256(text.encode("utf-8")).hexdigest()
+        cache_key = ResultCache.make_key(
+            task.get("content_hash") or "", text_hash, ernie_analyzer.prompt_version, ernie_analyzer.model
+        )
+        cached_result = None if task.get("refresh") else await execution.run_io(result_cache.get_result, cache_key)
+        if cached_result is not None:
+            await update_task(
+                task_id,
+                status=TaskStatus.COMPLETED,
+                progress=100,
+                stage="completed",
+                result=cached_result,
+                cache_hit=True,
+                timings=timings
+            )
+            logger.info(f"Task {task_id} completed from result cache")
+            return
         
         logger.info(f"Analyzing whitepaper with ERNIE...")
-        task["progress"] = 50
+        await update_task(task_id, progress=50)
         
-        result = ernie_analyzer.analyze_whitepaper(text)
-        task["progress"] = 90
+        started = time.perf_counter()
+        partial_sections: Dict[str, Any] = {}
+        section_write: Optional[asyncio.Task] = None
+        
+        def on_section(name: str, section: Dict[str, Any]) -> None:
+            # Streamed sections are readable from /api/sections before the
+            # analysis finishes; progress moves from 50 towards 95 with them.
+            # Each write waits for the previous one, so they land in order.
+            nonlocal section_write
+            if not partial_sections:
+                timings["first_section"] = round(time.perf_counter() - started, 3)
+            partial_sections[name] = section
+            previous = section_write
+            fields = {
+                "progress": 50 + 45 * len(partial_sections) // len(SECTION_NAMES),
+                "partial_sections": dict(partial_sections),
+            }
+            
+            async def write() -> None:
+                if previous is not None:
+                    await asyncio.wait([previous])
+                await update_task(task_id, **fields)
+            
+            section_write = asyncio.create_task(write())
+        
+        coverage: Dict[str, Any] = {}
+        fallbacks: List[str] = []
+        try:
+            result = await ernie_analyzer.analyze_whitepaper_async(
+                text,
+                timings=timings,
+                on_section=on_section,
+                pages=document.get("pages"),
+                coverage=coverage,
+                fallbacks=fallbacks
+            )
+        finally:
+            # Section writes must not land after the final status
+            if section_write is not None:
+                await asyncio.gather(section_write, return_exceptions=True)
+        timings["analyze"] = round(time.perf_counter() - started, 3)
         
         # Update task with result
-        task["status"] = TaskStatus.COMPLETED
-        task["progress"] = 100
-        task["result"] = result.model_dump()
+        result_dict = result.model_dump()
+        await update_task(
+            task_id,
+            status=TaskStatus.COMPLETED,
+            progress=100,
+            stage="completed",
+            result=result_dict,
+            cache_hit=False,
+            partial_sections=None,
+            coverage=coverage or None,
+            fallback_sections=sorted(fallbacks),
+            refresh=False,
+            timings=timings
+        )
+        # Placeholder sections would be served to every later upload of
+        # the document, so only complete reports are cached
+        if fallbacks:
+            logger.warning(f"Not caching result of task {task_id}: sections {', '.join(sorted(fallbacks))} failed")
+        else:
+            await execution.run_io(result_cache.put_result, cache_key, result_dict)
         
         logger.info(f"Task {task_id} completed successfully")
         
     except Exception as e:
         logger.error(f"Task {task_id} failed: {str(e)}")
-        tasks[task_id]["status"] = TaskStatus.FAILED
-        tasks[task_id]["error"] = str(e)
-        tasks[task_id]["progress"] = 0
+        await update_task(
+            task_id, status=TaskStatus.FAILED, error=str(e), progress=0, stage="failed", timings=timings
+        )
     
     finally:
-        # Clean up uploaded file
-        try:
-            file_path = Path(tasks[task_id]["file_path"])
-            if file_path.exists():
-                file_path.unlink()
-                logger.info(f"Cleaned up file: {file_path}")
-        except Exception as e:
-            logger.error(f"Failed to clean up file: {str(e)}")
+        # Followers received the final state through update_task; their
+        # uploads were only kept in case this task was deleted before running
+        followers = [await get_task(follower) for follower in single_flight.finish(task_id)]
+        
+        # Clean up uploaded files
+        remove_upload(file_path)
+        for follower in followers:
+            remove_upload(follower and follower.get("file_path"))
 
 
 @app.post("/api/analyze/{task_id}")
-async def trigger_analysis(task_id: str, background_tasks: BackgroundTasks):
+async def trigger_analysis(task_id: str, priority: JobPriority = Query(JobPriority.NORMAL)):
     """
     Manually trigger analysis for an uploaded file (alternative endpoint)
     
+    Completed and failed tasks are analyzed again, e.g. after a prompt change
+    or a failed LLM call. The upload is deleted after the first run, so a
+    re-run reads the document text from the text cache.
+    
     Args:
         task_id: Task identifier from upload
+        priority: Priority class of the analysis job
         
     Returns:
         Status message
     """
-    if task_id not in tasks:
+    task = await get_task(task_id)
+    if task is None:
         raise HTTPException(status_code=404, detail="Task not found")
     
-    task = tasks[task_id]
-    
-    if task["status"] != TaskStatus.PENDING:
+    if task["status"] == TaskStatus.PROCESSING:
         raise HTTPException(
             status_code=400,
             detail=f"Task is already {task['status']}"
         )
     
-    # Start processing
-    background_tasks.add_task(process_whitepaper, task_id)
+    if job_queue.position(task_id) is not None or single_flight.leader_of(task_id):
+        raise HTTPException(status_code=400, detail="Task is already queued")
     
-    return {"message": "Analysis started", "task_id": task_id}
+    if task["status"] != TaskStatus.PENDING:
+        content_hash = task.get("content_hash")
+        char_budget = ernie_analyzer.prompt_char_budget if ernie_analyzer else None
+        if not Path(task["file_path"]).exists() and not (
+            content_hash and await execution.run_io(
+                text_cache.get_document, text_cache_key(content_hash), char_budget
+            )
+        ):
+            raise HTTPException(
+                status_code=409,
+                detail="The uploaded file has been removed and its text is no longer cached. Please upload it again."
+            )
+        reset = {
+            "status": TaskStatus.PENDING,
+            "progress": 0,
+            "stage": "queued",
+            "result": None,
+            "error": None,
+            "cache_hit": False,
+            "partial_sections": None,
+            "coverage": None,
+            "fallback_sections": [],
+            "refresh": True,
+        }
+    else:
+        reset = {}
+    # Kept so a refused re-run leaves the previous outcome in place
+    previous = {name: task.get(name) for name in [*reset, "owner"]}
+    await update_task(task_id, owner=PROCESS_OWNER, **reset)
+    
+    # Queue for processing, unless the same document is already in flight
+    try:
+        leader = await enqueue_task(task_id, task.get("content_hash"), priority)
+    except QueueFullError as e:
+        await update_task(task_id, **previous)
+        raise queue_full_error(e.retry_after)
+    
+    return {"message": "Analysis started", "task_id": task_id, "coalesced_with": leader}
 
 
 @app.get("/api/status/{task_id}", response_model=TaskStatusResponse)
@@ -276,34 +899,184 @@ async def get_task_status(task_id: str):
     Returns:
         TaskStatusResponse with current status and progress
     """
-    if task_id not in tasks:
+    task = await get_task(task_id)
+    if task is None:
         raise HTTPException(status_code=404, detail="Task not found")
     
-    task = tasks[task_id]
-    
     return TaskStatusResponse(
         task_id=task_id,
         status=task["status"],
         message=task.get("error") if task["status"] == TaskStatus.FAILED else None,
-        progress=task["progress"]
+        progress=task["progress"],
+        queue_position=queue_position(task_id),
+        cache_hit=task.get("cache_hit", False),
+        stage=task.get("stage")
+    )
+
+
+def task_event(task_id: str, task: Optional[Dict[str, Any]]) -> Tuple[str, Dict[str, Any]]:
+    """
+    Event name and payload describing a task's current state
+    
+    Returns:
+        ("status", progress payload) while the task is pending or running,
+        ("result", final payload) once it has completed or failed, or
+        ("deleted", ...) if the task no longer exists
+    """
+    if task is None:
+        return "deleted", {"task_id": task_id}
+    if task_finished(task):
+        return "result", {
+            "task_id": task_id,
+            "status": task["status"],
+            "result": task.get("result"),
+            "error": task.get("error"),
+            "cache_hit": task.get("cache_hit", False),
+            "coverage": task.get("coverage"),
+            "fallback_sections": task.get("fallback_sections") or [],
+        }
+    return "status", {
+        "task_id": task_id,
+        "status": task["status"],
+        "progress": task["progress"],
+        "stage": task.get("stage"),
+        "queue_position": queue_position(task_id),
+        "sections": list(task.get("partial_sections") or {}),
+    }
+
+
+async def task_event_stream(task_id: str) -> AsyncIterator[str]:
+    """
+    Server-Sent Events for one task, ending after its final result
+    
+    Events are pushed by ``update_task`` through the event broker. The store
+    is also re-read every EVENTS_RECHECK_SECONDS, which picks up updates
+    made by other worker processes and doubles as a keep-alive.
+    """
+    queue = event_broker.subscribe(task_id)
+    try:
+        yield "retry: 3000\n\n"
+        task = await get_task(task_id)
+        last = None
+        while True:
+            name, data = task_event(task_id, task)
+            if data != last:
+                yield f"event: {name}\ndata: {json.dumps(data, default=str)}\n\n"
+                last = data
+            if name != "status":
+                return
+            try:
+                task = await asyncio.wait_for(queue.get(), EVENTS_RECHECK_SECONDS)
+            except asyncio.TimeoutError:
+                yield ": keep-alive\n\n"
+                task = await get_task(task_id)
+    finally:
+        event_broker.unsubscribe(task_id, queue)
+
+
+@app.get("/api/events/{task_id}")
+async def stream_task_events(task_id: str):
+    """
+    Stream a task's progress as Server-Sent Events
+    
+    Pushes a ``status`` event (status, progress, stage, queue position and
+    sections finished so far) whenever the task changes, then a single
+    ``result`` event with the final result or error, and closes. Replaces
+    polling ``/api/status``, which keeps working.
+    
+    Args:
+        task_id: Task identifier
+        
+    Returns:
+        text/event-stream response
+    """
+    if await get_task(task_id) is None:
+        raise HTTPException(status_code=404, detail="Task not found")
+    
+    return StreamingResponse(
+        task_event_stream(task_id),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
     )
 
 
+def task_finished(task: Optional[Dict[str, Any]]) -> bool:
+    """Whether a task has reached a final state (or no longer exists)"""
+    return task is None or task["status"] in (TaskStatus.COMPLETED, TaskStatus.FAILED)
+
+
+async def wait_for_task(task_id: str, timeout: float) -> Optional[Dict[str, Any]]:
+    """
+    Park until a task completes, fails or is deleted, or the timeout passes
+    
+    The waiter sleeps on the task's event broker subscription, so it uses no
+    thread and no CPU while parked. The store is re-read every
+    EVENTS_RECHECK_SECONDS to see completions made by other worker processes.
+    
+    Returns:
+        The task's latest record (None if it was deleted)
+    """
+    queue = event_broker.subscribe(task_id)
+    try:
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + timeout
+        task = await get_task(task_id)
+        while not task_finished(task):
+            remaining = deadline - loop.time()
+            if remaining <= 0:
+                break
+            try:
+                task = await asyncio.wait_for(queue.get(), min(remaining, EVENTS_RECHECK_SECONDS))
+            except asyncio.TimeoutError:
+                task = await get_task(task_id)
+        return task
+    finally:
+        event_broker.unsubscribe(task_id, queue)
+
+
 @app.get("/api/result/{task_id}", response_model=TaskResultResponse)
-async def get_task_result(task_id: str):
+async def get_task_result(
+    task_id: str,
+    response: Response,
+    wait: float = Query(0, ge=0, le=RESULT_MAX_WAIT_SECONDS)
+):
     """
     Get the analysis result for a completed task
     
+    With ``wait``, a request for an unfinished task is held open until the
+    task finishes or ``wait`` seconds pass (long polling). A request still
+    unfinished at the timeout gets 202 with the current status, so the
+    client can simply ask again.
+    
     Args:
         task_id: Task identifier
+        wait: Seconds to wait for the task to finish (0 answers immediately)
         
     Returns:
         TaskResultResponse with analysis results
     """
-    if task_id not in tasks:
+    global result_waiters
+    task = await get_task(task_id)
+    if task is None:
         raise HTTPException(status_code=404, detail="Task not found")
     
-    task = tasks[task_id]
+    if wait and not task_finished(task):
+        if result_waiters >= RESULT_MAX_WAITERS:
+            raise HTTPException(
+                status_code=429,
+                detail="Too many requests are waiting for results. Please retry later.",
+                headers={"Retry-After": "1"}
+            )
+        result_waiters += 1
+        try:
+            task = await wait_for_task(task_id, wait)
+        finally:
+            result_waiters -= 1
+        if task is None:
+            raise HTTPException(status_code=404, detail="Task not found")
+        if not task_finished(task):
+            response.status_code = 202
+            return TaskResultResponse(task_id=task_id, status=task["status"])
     
     if task["status"] == TaskStatus.PENDING or task["status"] == TaskStatus.PROCESSING:
         raise HTTPException(
@@ -319,14 +1092,357 @@ async def get_task_result(task_id: str):
         task_id=task_id,
         status=task["status"],
         result=result,
-        error=task.get("error")
+        error=task.get("error"),
+        cache_hit=task.get("cache_hit", False),
+        coverage=task.get("coverage"),
+        fallback_sections=task.get("fallback_sections") or []
+    )
+
+
+@app.get("/api/sections/{task_id}", response_model=TaskSectionsResponse)
+async def get_task_sections(task_id: str):
+    """
+    Get the analysis sections completed so far
+    
+    While a streamed analysis is running, each report section appears here as
+    soon as the model has finished it; once the task completes, every section
+    of the final result is returned.
+    
+    Args:
+        task_id: Task identifier
+        
+    Returns:
+        TaskSectionsResponse with completed sections and the names still pending
+    """
+    task = await get_task(task_id)
+    if task is None:
+        raise HTTPException(status_code=404, detail="Task not found")
+    
+    if task["status"] == TaskStatus.COMPLETED and task.get("result"):
+        sections = task["result"]
+    else:
+        sections = task.get("partial_sections") or {}
+    
+    return TaskSectionsResponse(
+        task_id=task_id,
+        status=task["status"],
+        progress=task["progress"],
+        sections=sections,
+        pending_sections=[name for name in SECTION_NAMES if name not in sections]
+    )
+
+
+async def save_batch_file(file: UploadFile, batch_id: str, remaining: int) -> List[Dict[str, Any]]:
+    """
+    Write one file of a batch upload to the upload directory
+    
+    A PDF is streamed to disk as in /api/upload. A ZIP archive is streamed to
+    disk, its PDF members are extracted from it in a worker thread, and the
+    archive is removed.
+    
+    Args:
+        file: PDF or ZIP file of the batch
+        batch_id: Batch the file belongs to
+        remaining: PDFs the batch can still accept
+        
+    Returns:
+        Entries as returned by ``extract_zip_pdfs``: path, size_bytes and
+        sha256 for saved PDFs, error for rejected ones
+    """
+    filename = Path(file.filename or "").name
+    max_bytes = MAX_FILE_SIZE_MB * 1024 * 1024
+    
+    if filename.lower().endswith(".pdf"):
+        if remaining <= 0:
+            return [{"filename": filename, "error": f"Batch is limited to {BATCH_MAX_FILES} files"}]
+        file_path = UPLOAD_DIR / f"{uuid.uuid4()}_{filename}"
+        try:
+            size_bytes, content_hash = await stream_to_disk(file, file_path, max_bytes)
+        except FileTooLargeError as e:
+            return [{"filename": filename, "error": str(e)}]
+        return [{"filename": filename, "path": file_path, "size_bytes": size_bytes, "sha256": content_hash}]
+    
+    if filename.lower().endswith(".zip"):
+        archive_path = UPLOAD_DIR / f"{batch_id}_{uuid.uuid4().hex[:8]}.zip"
+        try:
+            await stream_to_disk(file, archive_path, BATCH_MAX_ARCHIVE_MB * 1024 * 1024)
+            return await execution.run_io(
+                extract_zip_pdfs,
+                archive_path,
+                lambda member: UPLOAD_DIR / f"{uuid.uuid4()}_{member}",
+                max_bytes,
+                remaining
+            )
+        except FileTooLargeError as e:
+            return [{"filename": filename, "error": str(e)}]
+        except zipfile.BadZipFile:
+            return [{"filename": filename, "error": "Not a valid ZIP archive"}]
+        finally:
+            archive_path.unlink(missing_ok=True)
+    
+    return [{"filename": filename, "error": "Only PDF files and ZIP archives are accepted"}]
+
+
+async def submit_batch_task(task_id: str) -> bool:
+    """
+    Queue a batch document at low priority, waiting while the queue is full
+    
+    Returns:
+        Whether the task is now queued or running; False if it was deleted
+        or has already finished
+    """
+    while True:
+        task = await get_task(task_id)
+        if task_finished(task):
+            return False
+        if (
+            task["status"] != TaskStatus.PENDING
+            or job_queue.position(task_id) is not None
+            or single_flight.leader_of(task_id)
+        ):
+            # Already submitted, e.g. through /api/analyze
+            return True
+        try:
+            if await enqueue_task(task_id, task.get("content_hash"), JobPriority.LOW) is None:
+                await update_task(task_id, stage="queued")
+            return True
+        except QueueFullError as e:
+            await asyncio.sleep(e.retry_after)
+
+
+async def feed_batch(batch_id: str, task_ids: List[str]) -> None:
+    """
+    Submit the documents of a batch to the job queue a few at a time
+    
+    At most BATCH_CONCURRENCY documents of one batch, and
+    BATCH_MAX_ACTIVE_JOBS documents of all batches together, are queued or
+    running at once. The next document is submitted when one finishes, so a
+    large batch never fills the queue and leaves job workers free for
+    interactive uploads.
+    """
+    global batch_active_jobs
+    own_slots = asyncio.Semaphore(max(1, BATCH_CONCURRENCY))
+    watchers = set()
+    
+    def release() -> None:
+        global batch_active_jobs
+        batch_active_jobs -= 1
+        batch_slots.release()
+        own_slots.release()
+    
+    async def watch(task_id: str) -> None:
+        try:
+            await wait_for_task(task_id, math.inf)
+        finally:
+            release()
+    
+    try:
+        for task_id in task_ids:
+            await own_slots.acquire()
+            try:
+                await batch_slots.acquire()
+            except BaseException:
+                own_slots.release()
+                raise
+            batch_active_jobs += 1
+            try:
+                submitted = await submit_batch_task(task_id)
+            except BaseException:
+                release()
+                raise
+            if not submitted:
+                release()
+                continue
+            watchers.add(asyncio.create_task(watch(task_id)))
+        await asyncio.gather(*watchers)
+        await execution.run_io(batch_store.update, batch_id, status=TaskStatus.COMPLETED)
+        logger.info(f"Batch {batch_id} finished ({len(task_ids)} documents)")
+    finally:
+        for watcher in watchers:
+            watcher.cancel()
+        batch_feeders.pop(batch_id, None)
+
+
+@app.post("/api/batch", response_model=BatchUploadResponse)
+async def upload_batch(files: List[UploadFile] = File(...)):
+    """
+    Upload many PDF whitepapers at once, as files and/or ZIP archives
+    
+    Every PDF becomes a task of its own, analyzed at low priority and a few
+    at a time (see ``feed_batch``). Files that cannot be analyzed (not a PDF,
+    too large, over the batch limit) are reported as rejected instead of
+    failing the whole batch.
+    
+    Args:
+        files: PDF files and ZIP archives of PDF files
+        
+    Returns:
+        BatchUploadResponse with the batch_id and a task_id per document
+    """
+    batch_id = str(uuid.uuid4())
+    entries: List[Dict[str, Any]] = []
+    try:
+        for file in files:
+            accepted = sum(1 for entry in entries if "path" in entry)
+            entries.extend(await save_batch_file(file, batch_id, BATCH_MAX_FILES - accepted))
+    except Exception as e:
+        logger.error(f"Batch upload failed: {str(e)}")
+        for entry in entries:
+            remove_upload(entry.get("path"))
+        raise HTTPException(status_code=500, detail=f"Batch upload failed: {str(e)}")
+    
+    documents: List[Dict[str, str]] = []
+    rejected = [
+        {"filename": entry["filename"], "error": entry["error"]} for entry in entries if "error" in entry
+    ]
+    for entry in entries:
+        if "error" in entry:
+            continue
+        task_id = str(uuid.uuid4())
+        await execution.run_io(task_store.create, task_id, {
+            "status": TaskStatus.PENDING,
+            "filename": entry["filename"],
+            "file_path": str(entry["path"]),
+            "progress": 0,
+            "stage": "batched",
+            "result": None,
+            "error": None,
+            "content_hash": entry["sha256"],
+            "size_bytes": entry["size_bytes"],
+            "priority": JobPriority.LOW,
+            "batch_id": batch_id,
+            "timings": {},
+            "owner": PROCESS_OWNER
+        })
+        documents.append({"task_id": task_id, "filename": entry["filename"]})
+    
+    if not documents:
+        reasons = "; ".join(f"{item['filename']}: {item['error']}" for item in rejected)
+        raise HTTPException(status_code=400, detail=f"No PDF files could be accepted. {reasons}".strip())
+    
+    await execution.run_io(batch_store.create, batch_id, {
+        "status": TaskStatus.PROCESSING,
+        "documents": documents,
+        "rejected": rejected
+    })
+    batch_feeders[batch_id] = asyncio.create_task(
+        feed_batch(batch_id, [document["task_id"] for document in documents])
+    )
+    logger.info(f"Batch {batch_id}: {len(documents)} documents accepted, {len(rejected)} rejected")
+    
+    return BatchUploadResponse(
+        batch_id=batch_id,
+        documents=[
+            BatchDocument(status=TaskStatus.PENDING, stage="batched", **document) for document in documents
+        ],
+        rejected=[RejectedFile(**item) for item in rejected],
+        message=f"{len(documents)} files uploaded. Processing started."
+    )
+
+
+def batch_document(entry: Dict[str, str], task: Optional[Dict[str, Any]], include_result: bool) -> BatchDocument:
+    """Status of one document of a batch; a deleted task is reported as failed"""
+    if task is None:
+        return BatchDocument(**entry, status=TaskStatus.FAILED, error="Task was deleted")
+    result = None
+    if include_result and task["status"] == TaskStatus.COMPLETED and task.get("result"):
+        result = AnalysisResult(**task["result"])
+    return BatchDocument(
+        **entry,
+        status=task["status"],
+        progress=task["progress"],
+        stage=task.get("stage"),
+        error=task.get("error"),
+        cache_hit=task.get("cache_hit", False),
+        coalesced_with=task.get("coalesced_with"),
+        result=result
+    )
+
+
+@app.get("/api/batch/{batch_id}", response_model=BatchStatusResponse)
+async def get_batch_status(batch_id: str, results: bool = Query(True)):
+    """
+    Get the progress of a batch and the results of its finished documents
+    
+    Args:
+        batch_id: Batch identifier from the batch upload
+        results: Include each completed document's analysis result
+        
+    Returns:
+        BatchStatusResponse with per-document status and aggregate progress
+    """
+    batch = await execution.run_io(batch_store.get, batch_id)
+    if batch is None:
+        raise HTTPException(status_code=404, detail="Batch not found")
+    
+    # One store read per document; keep them off the event loop
+    tasks = await execution.run_io(
+        lambda: [task_store.get(entry["task_id"]) for entry in batch["documents"]]
     )
+    documents = [
+        batch_document(entry, task, results) for entry, task in zip(batch["documents"], tasks)
+    ]
+    
+    counts: Dict[str, int] = {}
+    for document in documents:
+        counts[document.status.value] = counts.get(document.status.value, 0) + 1
+    finished = counts.get(TaskStatus.COMPLETED.value, 0) + counts.get(TaskStatus.FAILED.value, 0)
+    if finished == len(documents):
+        status = TaskStatus.COMPLETED if counts.get(TaskStatus.COMPLETED.value) else TaskStatus.FAILED
+    elif counts.get(TaskStatus.PENDING.value, 0) == len(documents):
+        status = TaskStatus.PENDING
+    else:
+        status = TaskStatus.PROCESSING
+    progress = sum(
+        100 if document.status in (TaskStatus.COMPLETED, TaskStatus.FAILED) else document.progress or 0
+        for document in documents
+    ) // len(documents)
+    
+    return BatchStatusResponse(
+        batch_id=batch_id,
+        status=status,
+        progress=progress,
+        total=len(documents),
+        counts=counts,
+        documents=documents,
+        rejected=[RejectedFile(**item) for item in batch.get("rejected", [])]
+    )
+
+
+async def cancel_work(task_id: str, task: Dict[str, Any]) -> None:
+    """
+    Stop the analysis behind a task that is being deleted
+    
+    A queued job is dropped from the queue. A running one is cancelled and
+    awaited (up to TASK_CANCEL_WAIT_SECONDS): the provider request is
+    aborted, its completion slot released and an extraction in a worker
+    process terminated. A leader with coalesced followers is not cancelled;
+    a queued one hands its place to the followers and a running one keeps
+    going for them.
+    """
+    if single_flight.leader_of(task_id):
+        # A follower has no work of its own
+        single_flight.detach(task_id)
+        remove_upload(task.get("file_path"))
+    elif single_flight.followers(task_id):
+        if job_queue.position(task_id) is not None:
+            job_queue.cancel(task_id)
+            await release_followers(task_id)
+            remove_upload(task.get("file_path"))
+    elif job_queue.cancel(task_id):
+        if not await job_queue.wait_stopped(task_id, TASK_CANCEL_WAIT_SECONDS):
+            logger.warning(f"Task {task_id} did not stop within {TASK_CANCEL_WAIT_SECONDS}s of cancellation")
+        single_flight.finish(task_id)
+        remove_upload(task.get("file_path"))
+    else:
+        # Finished already, or still waiting for its batch to submit it
+        remove_upload(task.get("file_path"))
 
 
 @app.delete("/api/task/{task_id}")
 async def delete_task(task_id: str):
     """
-    Delete a task and its data
+    Delete a task and its data, cancelling its analysis if it is queued or running
     
     Args:
         task_id: Task identifier
@@ -334,10 +1450,13 @@ async def delete_task(task_id: str):
     Returns:
         Deletion confirmation
     """
-    if task_id not in tasks:
+    task = await get_task(task_id)
+    if task is None:
         raise HTTPException(status_code=404, detail="Task not found")
     
-    del tasks[task_id]
+    await cancel_work(task_id, task)
+    await execution.run_io(task_store.delete, task_id)
+    event_broker.publish(task_id, None)
     
     return {"message": "Task deleted successfully", "task_id": task_id}
 
@@ -10,6 +10,12 @@ class TaskStatus(str, Enum):
     FAILED = "failed"
 
 
+class JobPriority(str, Enum):
+    HIGH = "high"
+    NORMAL = "normal"
+    LOW = "low"
+
+
 class UploadResponse(BaseModel):
     task_id: str
     filename: str
@@ -265,6 +271,9 @@ class TaskStatusResponse(BaseModel):
     status: TaskStatus
     message: Optional[str] = None
     progress: Optional[int] = Field(default=0, ge=0, le=100)
+    queue_position: Optional[int] = None
+    cache_hit: bool = False
+    stage: Optional[str] = None
 
 
 class TaskResultResponse(BaseModel):
@@ -272,3 +281,50 @@ class TaskResultResponse(BaseModel):
     status: TaskStatus
     result: Optional[AnalysisResult] = None
     error: Optional[str] = None
+    cache_hit: bool = False
+    # Map-reduce mode: pages that fed each section
+    coverage: Optional[Dict[str, Any]] = None
+    # Sections the model never returned valid, holding placeholder content
+    fallback_sections: List[str] = Field(default_factory=list)
+
+
+class TaskSectionsResponse(BaseModel):
+    task_id: str
+    status: TaskStatus
+    progress: Optional[int] = Field(default=0, ge=0, le=100)
+    sections: Dict[str, Any] = Field(default_factory=dict)
+    pending_sections: List[str] = Field(default_factory=list)
+
+
+class BatchDocument(BaseModel):
+    task_id: str
+    filename: str
+    status: TaskStatus
+    progress: Optional[int] = Field(default=0, ge=0, le=100)
+    stage: Optional[str] = None
+    error: Optional[str] = None
+    cache_hit: bool = False
+    coalesced_with: Optional[str] = None
+    result: Optional[AnalysisResult] = None
+
+
+class RejectedFile(BaseModel):
+    filename: str
+    error: str
+
+
+class BatchUploadResponse(BaseModel):
+    batch_id: str
+    documents: List[BatchDocument] = Field(default_factory=list)
+    rejected: List[RejectedFile] = Field(default_factory=list)
+    message: str
+
+
+class BatchStatusResponse(BaseModel):
+    batch_id: str
+    status: TaskStatus
+    progress: int = Field(default=0, ge=0, le=100)
+    total: int = 0
+    counts: Dict[str, int] = Field(default_factory=dict)
+    documents: List[BatchDocument] = Field(default_factory=list)
+    rejected: List[RejectedFile] = Field(default_factory=list)
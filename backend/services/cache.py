@@ -0,0 +1,229 @@
+import hashlib
+import json
+import logging
+import sqlite3
+import threading
+import time
+import zlib
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Sequence
+
+logger = logging.getLogger(__name__)
+
+
+class DiskLRUCache:
+    """
+    Persistent key/value cache in a single SQLite file.
+
+    Values are zlib-compressed bytes. Entries expire ``ttl_seconds`` after
+    they were written, and the least recently read entries are evicted once
+    the compressed total exceeds ``max_bytes``. Hit/miss counters are kept in
+    the database too, so metrics cover every worker sharing the file.
+    """
+
+    def __init__(self, path: str, max_bytes: int, ttl_seconds: Optional[float] = None):
+        self.path = str(path)
+        self.max_bytes = max_bytes
+        self.ttl_seconds = ttl_seconds
+        Path(self.path).parent.mkdir(parents=True, exist_ok=True)
+        self._local = threading.local()
+        conn = self._connection()
+        conn.execute(
+            """CREATE TABLE IF NOT EXISTS entries (
+                key TEXT PRIMARY KEY,
+                value BLOB NOT NULL,
+                size INTEGER NOT NULL,
+                created_at REAL NOT NULL,
+                accessed_at REAL NOT NULL
+            )"""
+        )
+        conn.execute("CREATE INDEX IF NOT EXISTS idx_entries_accessed_at ON entries(accessed_at)")
+        conn.execute("CREATE TABLE IF NOT EXISTS counters (name TEXT PRIMARY KEY, value INTEGER NOT NULL)")
+        conn.execute("INSERT OR IGNORE INTO counters (name, value) VALUES ('hits', 0), ('misses', 0)")
+
+    def _connection(self) -> sqlite3.Connection:
+        """One connection per thread; sqlite3 connections are not thread-safe"""
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=10.0, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    def _count(self, conn: sqlite3.Connection, name: str) -> None:
+        conn.execute("UPDATE counters SET value = value + 1 WHERE name = ?", (name,))
+
+    def get(self, key: str) -> Optional[bytes]:
+        """Return the cached value, or None on a miss or expired entry"""
+        conn = self._connection()
+        row = conn.execute(
+            "SELECT value, created_at FROM entries WHERE key = ?", (key,)
+        ).fetchone()
+        now = time.time()
+        if row is not None and self.ttl_seconds and row[1] < now - self.ttl_seconds:
+            conn.execute("DELETE FROM entries WHERE key = ?", (key,))
+            row = None
+        if row is None:
+            self._count(conn, "misses")
+            return None
+        conn.execute("UPDATE entries SET accessed_at = ? WHERE key = ?", (now, key))
+        self._count(conn, "hits")
+        return zlib.decompress(row[0])
+
+    def put(self, key: str, value: bytes) -> None:
+        """Store a value, evicting least recently used entries if over budget"""
+        blob = zlib.compress(value, 6)
+        if len(blob) > self.max_bytes:
+            logger.warning(f"Cache value for {key[:12]} exceeds cache size, not stored")
+            return
+        now = time.time()
+        conn = self._connection()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            conn.execute(
+                "INSERT OR REPLACE INTO entries (key, value, size, created_at, accessed_at) "
+                "VALUES (?, ?, ?, ?, ?)",
+                (key, blob, len(blob), now, now),
+            )
+            self._evict(conn)
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+
+    def _evict(self, conn: sqlite3.Connection) -> None:
+        if self.ttl_seconds:
+            conn.execute("DELETE FROM entries WHERE created_at < ?", (time.time() - self.ttl_seconds,))
+        total = conn.execute("SELECT COALESCE(SUM(size), 0) FROM entries").fetchone()[0]
+        if total <= self.max_bytes:
+            return
+        evicted = 0
+        for key, size in conn.execute(
+            "SELECT key, size FROM entries ORDER BY accessed_at ASC"
+        ).fetchall():
+            conn.execute("DELETE FROM entries WHERE key = ?", (key,))
+            total -= size
+            evicted += 1
+            if total <= self.max_bytes:
+                break
+        logger.info(f"Evicted {evicted} cache entries from {self.path}")
+
+    def delete(self, key: str) -> None:
+        self._connection().execute("DELETE FROM entries WHERE key = ?", (key,))
+
+    def stats(self) -> Dict[str, Any]:
+        """Entry count, bytes stored and hit rate"""
+        conn = self._connection()
+        entries, size = conn.execute(
+            "SELECT COUNT(*), COALESCE(SUM(size), 0) FROM entries"
+        ).fetchone()
+        counters = dict(conn.execute("SELECT name, value FROM counters").fetchall())
+        lookups = counters["hits"] + counters["misses"]
+        return {
+            "entries": entries,
+            "bytes_stored": size,
+            "max_bytes": self.max_bytes,
+            "hits": counters["hits"],
+            "misses": counters["misses"],
+            "hit_rate": round(counters["hits"] / lookups, 4) if lookups else None,
+        }
+
+
+class ResultCache(DiskLRUCache):
+    """
+    Analysis results keyed by everything that determines them: the PDF bytes,
+    the extracted text, the prompt template version and the model.
+    """
+
+    @staticmethod
+    def make_key(pdf_hash: str, text_hash: str, prompt_version: str, model: str) -> str:
+        raw = "\n".join([pdf_hash, text_hash, prompt_version, model])
+        return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+    def get_result(self, key: str) -> Optional[Dict[str, Any]]:
+        value = self.get(key)
+        return json.loads(value) if value is not None else None
+
+    def put_result(self, key: str, result: Dict[str, Any]) -> None:
+        self.put(key, json.dumps(result, separators=(",", ":")).encode("utf-8"))
+
+
+def _page_offsets(text: str, pages: Sequence[str]) -> Optional[List[List[int]]]:
+    """[start, end] of each page's text within text, or None if a page is not found"""
+    offsets = []
+    cursor = 0
+    for page in pages:
+        body = (page or "").strip()
+        start = text.find(body, cursor) if body else cursor
+        if start < 0:
+            return None
+        cursor = start + len(body)
+        offsets.append([start, cursor])
+    return offsets
+
+
+class TextCache(DiskLRUCache):
+    """
+    Extracted (and normalized) document text keyed by the PDF bytes and the
+    extractor and normalizer versions, so re-analyzing a document skips
+    parsing it again.
+
+    Pages are stored as offsets into the document text rather than a second
+    copy of it. A stored document also records the character budget it was
+    extracted under (None for the whole document).
+    """
+
+    @staticmethod
+    def make_key(pdf_hash: str, extractor_version: str, normalizer_version: Optional[str]) -> str:
+        raw = "\n".join([pdf_hash, extractor_version, normalizer_version or "raw"])
+        return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+    def get_document(self, key: str, char_budget: Optional[int] = None) -> Optional[Dict[str, Any]]:
+        """
+        Return a cached document covering the request, or None
+
+        Args:
+            key: Cache key from ``make_key``
+            char_budget: Characters the caller needs (None for the whole document)
+
+        Returns:
+            Document dict with text and pages, or None on a miss or when the
+            cached extraction stopped short of what the caller needs
+        """
+        value = self.get(key)
+        if value is None:
+            return None
+        document = json.loads(value)
+        if not document["complete"]:
+            cached_budget = document.get("char_budget")
+            if char_budget is None or cached_budget is None or cached_budget < char_budget:
+                return None
+        offsets = document.pop("page_offsets", None)
+        if offsets is not None:
+            text = document["text"]
+            document["pages"] = [text[start:end] for start, end in offsets]
+        return document
+
+    def put_document(self, key: str, document: Dict[str, Any], char_budget: Optional[int] = None) -> None:
+        """
+        Store an extracted document
+
+        Args:
+            key: Cache key from ``make_key``
+            document: Dict with text, pages, page_count, pages_used,
+                complete, extraction, normalization and metadata
+            char_budget: Budget the text was extracted under (None for all pages)
+        """
+        pages = document.get("pages") or []
+        offsets = _page_offsets(document["text"], pages)
+        entry = {
+            name: value for name, value in document.items()
+            if name not in ("pages", "parse_count")
+        }
+        entry["char_budget"] = char_budget
+        if offsets is None:
+            entry["pages"] = pages
+        else:
+            entry["page_offsets"] = offsets
+        self.put(key, json.dumps(entry, separators=(",", ":")).encode("utf-8"))
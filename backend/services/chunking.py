@@ -0,0 +1,81 @@
+import logging
+from typing import Any, Dict, List, Sequence
+
+logger = logging.getLogger(__name__)
+
+# Boundaries an oversized page is split on, coarsest first
+_SEPARATORS = ("\n\n", "\n", " ")
+
+
+def split_text(text: str, max_chars: int) -> List[str]:
+    """Split text longer than max_chars on paragraph, line, then word boundaries"""
+    if len(text) <= max_chars:
+        return [text]
+    for separator in _SEPARATORS:
+        parts = text.split(separator)
+        if len(parts) > 1:
+            break
+    else:
+        return [text[i:i + max_chars] for i in range(0, len(text), max_chars)]
+
+    pieces: List[str] = []
+    current = ""
+    for part in parts:
+        for piece in split_text(part, max_chars):
+            candidate = f"{current}{separator}{piece}" if current else piece
+            if len(candidate) <= max_chars:
+                current = candidate
+                continue
+            if current:
+                pieces.append(current)
+            current = piece
+    if current:
+        pieces.append(current)
+    return pieces
+
+
+def chunk_pages(pages: Sequence[str], max_chars: int) -> List[Dict[str, Any]]:
+    """
+    Group consecutive pages into chunks of at most max_chars characters
+
+    Every page is prefixed with a ``[Page N]`` marker so facts pulled from a
+    chunk can cite their page. Pages are never split unless a single page is
+    larger than a chunk, in which case it is cut on paragraph boundaries.
+    Empty pages are skipped.
+
+    Args:
+        pages: Text of each page, in order (page numbers start at 1)
+        max_chars: Maximum characters per chunk, markers included
+
+    Returns:
+        List of dicts with start_page, end_page and text
+    """
+    chunks: List[Dict[str, Any]] = []
+    blocks: List[str] = []
+    start = end = 0
+    size = 0
+
+    def flush() -> None:
+        nonlocal blocks, size
+        if blocks:
+            chunks.append({"start_page": start, "end_page": end, "text": "\n\n".join(blocks)})
+        blocks, size = [], 0
+
+    for number, page_text in enumerate(pages, 1):
+        page_text = (page_text or "").strip()
+        if not page_text:
+            continue
+        marker = f"[Page {number}]\n"
+        for piece in split_text(page_text, max(1, max_chars - len(marker))):
+            block = marker + piece
+            if blocks and size + 2 + len(block) > max_chars:
+                flush()
+            if not blocks:
+                start = number
+            blocks.append(block)
+            size += len(block) + (2 if size else 0)
+            end = number
+    flush()
+
+    logger.info(f"Split {len(pages)} pages into {len(chunks)} chunks of up to {max_chars} characters")
+    return chunks
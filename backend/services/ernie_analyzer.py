@@ -1,11 +1,240 @@
+import asyncio
+import contextlib
 import json
 import logging
-from openai import OpenAI
-from typing import Dict, Any
+import time
+import httpx
+from openai import OpenAI, AsyncOpenAI, DefaultAsyncHttpxClient, BadRequestError
+from typing import Dict, Any, Callable, List, Optional, Sequence
 from models.schemas import AnalysisResult
+from services.chunking import chunk_pages
+from services.execution import CompletionGovernor, ExecutionLayer
+from services.json_scanner import SectionStreamParser, extract_json_object
+from services.passage_index import PassageIndex, section_query
+from services.token_budget import CHARS_PER_TOKEN, TokenBudgeter, create_tokenizer
 
 logger = logging.getLogger(__name__)
 
+# Called with (section name, validated section dict) as streamed sections complete
+SectionCallback = Callable[[str, Dict[str, Any]], None]
+
+NOVITA_BASE_URL = "https://api.novita.ai/openai"
+
+# Bump whenever the prompts or response post-processing change, so cached
+# analyses produced by the previous version are no longer served
+PROMPT_VERSION = "2025.2"
+
+# Tokens of whitepaper text included in the analysis prompt
+PROMPT_TEXT_TOKENS = 4500
+
+# Where the whitepaper excerpt goes in the analysis prompt template
+_TEXT_SLOT = "\x00WHITEPAPER\x00"
+
+SYSTEM_PROMPT = """You are a senior blockchain analyst with 10+ years of experience in crypto investments, technical due diligence, and market research. 
+
+CRITICAL INSTRUCTIONS:
+1. DEPTH: Provide institutional-grade analysis with 3-5+ sentences per field
+2. CURRENT DATA: Always search the web for latest 2025-2026 information (prices, market caps, partnerships, developments)
+3. SPECIFICITY: Include concrete numbers, metrics, dates, and examples
+4. RESEARCH: Use CoinGecko, CoinMarketCap, GitHub, Twitter, official websites, news articles
+5. FORMAT: Return ONLY valid JSON with ALL property names in double quotes - NO markdown, NO code blocks, NO tool calls, JUST the raw JSON object starting with {
+6. COMPLETENESS: Never truncate - complete every single field thoroughly
+
+DO NOT use tool calls or function calls. Return the JSON directly in your response.
+Your analysis will be used for investment decisions - be thorough, critical, and data-driven."""
+
+# JSON template of each report section, in AnalysisResult order. The full
+# prompt uses all of them; sectioned analysis sends one group per request.
+SECTION_TEMPLATES: Dict[str, str] = {
+    "executive_analysis": """{
+    "project_name": "Full project name",
+    "tagline": "Compelling 1-sentence description", 
+    "core_value_proposition": "DETAILED 3-5 sentences explaining unique value, target users, key benefits, and why it matters. Include specific use cases and quantifiable advantages.",
+    "target_problem": "DETAILED 3-5 sentences describing the problem, its scale ($X market, Y users affected), current pain points, and why existing solutions fail. Include market research data from 2024-2025.",
+    "solution_approach": "DETAILED 3-5 sentences explaining the technical solution, how it works, key innovations, and implementation strategy. Include architecture overview and differentiation.",
+    "market_positioning": "DETAILED 3-5 sentences on target market segments, competitive positioning, pricing strategy, and go-to-market approach. Include current market share data (2025) if available.",
+    "competitive_moat": "DETAILED 3-5 sentences on sustainable competitive advantages: network effects, technical barriers, partnerships, brand, etc. Explain why competitors can't easily replicate."
+  }""",
+    "technical_deep_dive": """{
+    "architecture_overview": "DETAILED 4-6 sentences explaining the complete technical architecture: layers, components, data flow, and how they interact. Include diagrams concepts and specific technologies used.",
+    "design_patterns": ["List 3-5 specific design patterns with brief explanations: e.g., 'Microservices architecture for modular scalability'"],
+    "consensus_mechanism": "Name of consensus (PoW/PoS/DPoS/BFT/etc.)",
+    "consensus_details": "DETAILED 3-5 sentences explaining how the consensus works, its parameters (block time, validator count, stake requirements), strengths, and tradeoffs vs alternatives.", 
+    "smart_contract_functionality": "DETAILED 3-5 sentences on smart contract capabilities, supported languages, VM used, gas model, and key contract features. Include examples of what can be built.",
+    "smart_contract_limitations": "DETAILED 2-4 sentences on current limitations: gas costs, throughput, complexity constraints, security considerations. Include specific numbers if available.",
+    "scalability_solutions": ["List 3-5 scalability approaches with details: e.g., 'Layer 2 rollups processing 10,000+ TPS', 'Sharding for parallel processing'"],
+    "security_measures": ["List 4-6 security features with specifics: e.g., 'Multi-signature treasury with 5/9 threshold', 'Bug bounty program: $500K max payout'"],
+    "audit_status": "DETAILED status: which firms (CertiK, Trail of Bits, etc.), when (Q4 2024), findings (X critical, Y high), remediation status. Include links if available.",
+    "interoperability": "DETAILED 3-4 sentences on cross-chain capabilities, bridges, supported chains, and integration standards (IBC, LayerZero, etc.). Include current bridge TVL if available.",
+    "technical_innovation_score": 7,
+    "innovation_justification": "DETAILED 3-5 sentences justifying the score: what's innovative, what's standard, comparisons to state-of-art, and potential impact."
+  }""",
+    "tokenomics": """{
+    "token_name": "Full token name",
+    "token_symbol": "TICKER", 
+    "total_supply": "X tokens (or 'Uncapped' with inflation rate). Search for current circulating supply and market cap as of Dec 2024/Jan 2025.",
+    "utility": ["List 4-6 utilities with specifics: e.g., 'Governance: 1 token = 1 vote on protocol upgrades', 'Staking: Earn 8-12% APY', 'Fee discounts: 25% reduction'"],
+    "distribution": [{"category": "Team", "percentage": "20%", "vesting": "4-year linear vest, 1-year cliff starting Jan 2024"}],
+    "inflation_mechanism": "DETAILED 2-3 sentences: Emission schedule, annual inflation rate %, distribution of new tokens, how it changes over time. Include current inflation rate (2025).",
+    "deflation_mechanism": "DETAILED 2-3 sentences: Token burn mechanisms (% of fees burned, buyback programs), actual burn amounts to date, impact on supply. Search for latest burn data (2024-2025).",
+    "economic_sustainability": "DETAILED 3-4 sentences: Long-term token economics viability, balance of inflation/deflation, value capture mechanisms, alignment of incentives. Analysis of whether tokenomics supports growth.",
+    "flow_nodes": [{"id": "node1", "label": "Users", "type": "participant"}, {"id": "node2", "label": "Staking Pool", "type": "contract"}],
+    "flow_connections": [{"source": "node1", "target": "node2", "label": "Stake tokens for 10% APY"}]
+  }""",
+    "risk_analysis": """{
+    "technical_risks": [{"risk": "string", "description": "string", "severity": "High", "probability": "Medium"}],
+    "market_risks": [{"risk": "string", "description": "string", "severity": "Medium", "probability": "High"}],
+    "team_execution_risks": [{"risk": "string", "description": "string", "severity": "Low", "probability": "Medium"}],
+    "overall_risk_level": "Medium"
+  }""",
+    "competitive_landscape": """{
+    "direct_competitors": [{"name": "Competitor name", "description": "2-3 sentences with current 2025 metrics: market cap, TVL, users, TPS", "strengths": ["3-5 specific strengths with data"], "weaknesses": ["3-5 specific weaknesses with data"]}],
+    "feature_comparisons": [{"feature": "Transaction speed", "project_score": "5000 TPS", "competitor_scores": {"Ethereum": "15 TPS", "Solana": "65000 TPS", "Arbitrum": "40000 TPS"}}],
+    "technology_differentiation": "DETAILED 4-5 sentences explaining unique technical advantages vs competitors. Include specific architectural differences, performance benchmarks, and why it matters to users. Use 2025 comparison data.",
+    "alternative_approaches": ["List 3-4 alternative approaches competitors take: e.g., 'Optimistic rollups (Optimism) vs ZK-rollups (zkSync) for Layer 2 scaling'"]
+  }""",
+    "technology_alternatives": """{
+    "current_tech_stack": ["array"],
+    "why_chosen": "string",
+    "alternatives": ["array"], 
+    "tradeoffs": "string",
+    "emerging_disruptions": ["array"],
+    "is_optimal": true,
+    "optimization_reasoning": "string"
+  }""",
+    "roadmap": """{
+    "past_achievements": [{"phase": "Phase name (e.g., 'Mainnet Launch')", "title": "Milestone title", "description": "2-3 sentences with specifics and impact", "timeline": "Q3 2023 or specific date", "status": "Completed/Delayed/etc."}],
+    "current_phase": "DETAILED 2-3 sentences: What's being built right now (Dec 2024 - Q1 2025), progress %, blockers, expected completion. Search for latest development updates.",
+    "future_milestones": [{"phase": "Future phase", "title": "Upcoming milestone", "description": "2-3 sentences on goals, requirements, expected impact", "timeline": "Q2 2025, Q3 2025, etc.", "status": "Planned/In Progress"}],
+    "critical_path": ["List 3-5 critical milestones that determine project success: e.g., 'Mainnet launch Q2 2025', 'Secure 3 tier-1 exchange listings by Q3 2025'"],
+    "roadmap_risk": "DETAILED 3-4 sentences: Likelihood of delays, dependencies, resource constraints, market timing risks. Reference past delivery track record. Search for GitHub/blog updates on progress."
+  }""",
+    "team_partnerships": """{
+    "team_members": [{"name": "Full name", "role": "Title/Position", "experience": "2-3 sentences: Previous companies (Google, Meta, etc.), years of experience, notable achievements, relevant expertise", "linkedin": "URL if found via search"}],
+    "advisors": [{"name": "Full name", "role": "Advisor type", "experience": "2-3 sentences: Credentials, other projects advised, industry reputation", "linkedin": "URL if found"}],
+    "partnerships": [{"partner": "Company/Protocol name", "type": "Strategic/Technical/Marketing/etc.", "significance": "2-3 sentences: What the partnership enables, expected impact, announcement date. Search for 2024-2025 partnership announcements."}],
+    "community_size": "DETAILED with current 2025 numbers: Twitter followers (X), Discord members (Y), Telegram (Z), GitHub stars (W). Search social media for latest counts.",
+    "community_engagement": "DETAILED 2-3 sentences: Activity levels, engagement rates, community-led initiatives, sentiment analysis. Include recent metrics like daily active Discord users, GitHub contributions/month."
+  }""",
+    "use_cases_adoption": """{
+    "primary_use_cases": [{"title": "Use case name", "description": "3-4 sentences explaining the use case, who it serves, how it works, and value delivered", "example": "Real example: 'Acme Corp uses this for X, processing Y transactions/day, saving Z%'"}],
+    "target_segments": ["List 3-5 specific user segments with size estimates: e.g., 'DeFi traders (5M+ globally)', 'NFT creators ($40B market)'"],
+    "adoption_barriers": ["List 4-6 specific barriers with context: e.g., 'High gas fees: $50+ per transaction vs $0.50 on competitors', 'Steep learning curve: 6+ hours to onboard'"],
+    "network_effects": "DETAILED 3-4 sentences: Types of network effects (direct, indirect, data), current network size, tipping points, moat strength. Explain how growth accelerates with adoption.",
+    "traction_evidence": ["List 5-8 concrete metrics from 2024-2025: e.g., '50,000 daily active users (up 300% YoY)', '$500M TVL as of Dec 2024', '200+ dApps built', 'Listed on Binance, Coinbase'"]
+  }""",
+    "financial_analysis": """{
+    "funding_raised": "DETAILED: Total amount raised, rounds (Seed: $X in DATE, Series A: $Y in DATE), investors (name tier-1 VCs), current valuation if known. Search for latest 2024-2025 funding news.",
+    "funding_allocation": {"Development": "40%", "Marketing": "25%", "Operations": "20%", "Reserves": "15%"},
+    "revenue_model": "DETAILED 3-5 sentences: How does the project generate revenue? (transaction fees, subscriptions, token burns, etc.) Include specific fee structures, current revenue (ARR/MRR if available), and projections. Search for 2025 financial disclosures.",
+    "token_value_drivers": ["List 4-6 specific drivers: e.g., 'Staking yields: 8-12% APY', 'Token burns: 2% of tx fees', 'Governance rights over $50M treasury'"],
+    "bull_case": "DETAILED 4-6 sentences: Best-case scenario with specific targets: market adoption (X users by 2026), token price ($Y with Z market cap), partnerships, technological breakthroughs. Include probability and catalysts. Use current 2025 metrics as baseline.",
+    "bear_case": "DETAILED 4-6 sentences: Worst-case scenario: competition risks, regulatory threats, technological failures, market conditions. Include potential price impact and probability. Reference 2024-2025 market context."
+  }""",
+    "visualization_data": """{
+    "tech_stack_nodes": [{"id": "string", "label": "string", "type": "string"}],
+    "tech_stack_connections": [{"source": "string", "target": "string", "label": "string"}],
+    "risk_radar": [{"dimension": "string", "score": 7}],
+    "competitive_matrix_x_axis": "string", 
+    "competitive_matrix_y_axis": "string",
+    "competitive_plots": [{"name": "string", "x": 7, "y": 8}]
+  }""",
+    "overall_assessment": """{
+    "innovation_score": 7,
+    "technical_viability": 8,
+    "team_capability": 6,
+    "market_opportunity": 7,
+    "risk_adjusted_rating": 6,
+    "investment_recommendation": "Strong Buy",
+    "recommendation_justification": "DETAILED 5-7 sentences: Comprehensive investment thesis considering: technical innovation, team execution, market timing (2025 context), competitive position, tokenomics, risk/reward profile, and catalysts. Include price targets if relevant (e.g., 'potential 3-5x in 12-18 months if mainnet delivers'). Reference current market conditions (Dec 2024/Jan 2025)."
+  }""",
+}
+
+SECTION_NAMES = list(SECTION_TEMPLATES)
+
+# Field names of each section, used to tell the map step what to look for
+SECTION_FIELDS = {name: list(json.loads(template)) for name, template in SECTION_TEMPLATES.items()}
+
+# Passage index query per section in sectioned mode
+SECTION_QUERIES = {name: section_query(name, fields) for name, fields in SECTION_FIELDS.items()}
+
+ANALYSIS_MODES = ("monolithic", "sectioned", "map_reduce")
+
+# Sections requested together in sectioned mode. Related sections share a
+# completion so the model keeps them consistent with each other.
+SECTION_GROUPS = [
+    ("executive_analysis", "use_cases_adoption"),
+    ("technical_deep_dive", "technology_alternatives"),
+    ("tokenomics", "financial_analysis"),
+    ("risk_analysis", "roadmap"),
+    ("competitive_landscape", "team_partnerships"),
+    ("visualization_data", "overall_assessment"),
+]
+
+# Structured-output modes, strongest first. "auto" starts at json_schema and
+# steps down whenever the provider rejects a mode.
+RESPONSE_FORMATS = ("json_schema", "json_object", "none")
+
+# Words in a 400 error that tie it to the requested response format
+RESPONSE_FORMAT_ERROR_TERMS = ("response_format", "json_schema", "json_object", "structured output")
+
+# Output reservation for the full report, one section group and one map chunk
+MAX_TOKENS = 32000
+SECTION_MAX_TOKENS = 8000
+MAP_MAX_TOKENS = 4000
+
+# Characters of whitepaper text per map-reduce chunk
+MAP_CHUNK_CHARS = 12000
+
+
+class ResponseFormatStats:
+    """
+    Per response-format counters of how completions parsed.
+
+    ``clean`` responses parsed as-is, ``repaired`` ones needed the JSON repair
+    passes and ``unparseable`` ones could not be repaired; ``retries`` counts
+    completions re-requested because of that, and ``rejected`` counts
+    requests the provider refused for the format.
+    """
+
+    OUTCOMES = ("clean", "repaired", "unparseable", "retries", "rejected")
+
+    def __init__(self):
+        self.counts: Dict[str, Dict[str, int]] = {
+            mode: dict.fromkeys(self.OUTCOMES, 0) for mode in RESPONSE_FORMATS
+        }
+
+    def record(self, mode: str, outcome: str) -> None:
+        self.counts[mode][outcome] += 1
+
+    def snapshot(self) -> Dict[str, Dict[str, Any]]:
+        """Counters per mode with repair and retry rates over parsed completions"""
+        modes = {}
+        for mode, counts in self.counts.items():
+            parsed = counts["clean"] + counts["repaired"] + counts["unparseable"]
+            modes[mode] = {
+                **counts,
+                "completions": parsed,
+                "repair_rate": round(counts["repaired"] / parsed, 4) if parsed else None,
+                "retry_rate": round(counts["retries"] / parsed, 4) if parsed else None,
+            }
+        return modes
+
+
+def _rejects_response_format(error: BadRequestError) -> bool:
+    """Whether a 400 from the provider refuses the requested response format"""
+    if getattr(error, "param", None) == "response_format":
+        return True
+    details = f"{error.message} {error.body}".lower()
+    return any(term in details for term in RESPONSE_FORMAT_ERROR_TERMS)
+
+
+def _json_structure(sections: Sequence[str]) -> str:
+    """JSON template covering the given top-level sections"""
+    return "{\n" + ",\n".join(
+        f'  "{name}": {SECTION_TEMPLATES[name]}' for name in sections
+    ) + "\n}"
+
 
 def _get_json_schema() -> dict:
     """Get the JSON schema for structured AI responses"""
@@ -119,23 +348,116 @@ def _get_json_schema() -> dict:
 class ERNIEAnalyzer:
     """Service for analyzing whitepapers using ERNIE AI via Novita AI API"""
     
-    def __init__(self, api_key: str):
+    def __init__(
+        self,
+        api_key: str,
+        max_concurrent_completions: int = 8,
+        max_connections: int = 20,
+        max_keepalive_connections: int = 10,
+        analysis_mode: str = "monolithic",
+        section_concurrency: int = 6,
+        response_format: str = "auto",
+        stream: bool = False,
+        chunk_chars: int = MAP_CHUNK_CHARS,
+        map_concurrency: int = 6,
+        context_window: int = 131072,
+        tokenizer: str = "approx",
+        input_tokens: int = PROMPT_TEXT_TOKENS,
+        retrieval_top_k: int = 8,
+        execution: Optional[ExecutionLayer] = None,
+    ):
+        if analysis_mode not in ANALYSIS_MODES:
+            raise ValueError(f"Unknown analysis mode: {analysis_mode}")
+        if response_format != "auto" and response_format not in RESPONSE_FORMATS:
+            raise ValueError(f"Unknown response format: {response_format}")
         self.client = OpenAI(
             api_key=api_key,
-            base_url="https://api.novita.ai/openai"
+            base_url=NOVITA_BASE_URL
         )
+        # Async client sharing one keep-alive connection pool across analyses
+        self.async_client = AsyncOpenAI(
+            api_key=api_key,
+            base_url=NOVITA_BASE_URL,
+            http_client=DefaultAsyncHttpxClient(
+                limits=httpx.Limits(
+                    max_connections=max_connections,
+                    max_keepalive_connections=max_keepalive_connections,
+                    keepalive_expiry=30.0,
+                )
+            ),
+        )
+        self.governor = CompletionGovernor(max_concurrent_completions)
         self.model = "baidu/ernie-4.5-vl-28b-a3b-thinking"
         self.json_schema = self._get_json_schema()
+        self.analysis_mode = analysis_mode
+        # Prompt and output sizes in tokens of the model's context window
+        self.budgeter = TokenBudgeter(context_window, create_tokenizer(tokenizer))
+        # Whitepaper tokens per prompt; map-reduce reads the whole document
+        self.input_tokens = None if analysis_mode == "map_reduce" else input_tokens
+        # Passages per section query in sectioned mode (0 sends the leading text)
+        self.retrieval_top_k = max(0, retrieval_top_k)
+        # Text beyond this can never fit, so extraction can stop once it has
+        # this much. Map-reduce and retrieval read the whole document.
+        if self.input_tokens is None or self.uses_retrieval:
+            self.prompt_char_budget = None
+        else:
+            self.prompt_char_budget = self.input_tokens * CHARS_PER_TOKEN
+        # Section groups requested at once by one sectioned analysis
+        self.section_concurrency = max(1, section_concurrency)
+        # Structured output requested from the provider; downgraded for the
+        # life of the analyzer if the provider rejects it
+        self.response_format = response_format
+        self.active_response_format = RESPONSE_FORMATS[0] if response_format == "auto" else response_format
+        self.format_stats = ResponseFormatStats()
+        # Stream async completions so sections can be surfaced as they close
+        self.stream = stream
+        # Map-reduce chunk size and chunks read at once
+        self.chunk_chars = max(1000, chunk_chars)
+        self.map_concurrency = max(1, map_concurrency)
+        # Pools for CPU-bound work such as indexing a document for retrieval
+        # (a worker thread is used when the analyzer runs standalone)
+        self.execution = execution
+    
+    @property
+    def prompt_version(self) -> str:
+        """Version of the prompts in use, part of the result cache key"""
+        if self.analysis_mode == "monolithic":
+            return PROMPT_VERSION
+        if self.uses_retrieval:
+            return f"{PROMPT_VERSION}/{self.analysis_mode}/bm25-{self.retrieval_top_k}"
+        return f"{PROMPT_VERSION}/{self.analysis_mode}"
+    
+    @property
+    def uses_retrieval(self) -> bool:
+        """Whether section prompts get passages retrieved for them"""
+        return self.analysis_mode == "sectioned" and self.retrieval_top_k > 0
     
     def _get_json_schema(self) -> dict:
         """Get the JSON schema for structured AI responses"""
         return _get_json_schema()
     
-    def _create_analysis_prompt(self, whitepaper_text: str) -> str:
+    def _create_analysis_prompt(
+        self,
+        whitepaper_text: str,
+        sections: Optional[Sequence[str]] = None
+    ) -> str:
+        """
+        Build the analysis prompt
+        
+        Args:
+            whitepaper_text: Extracted whitepaper text
+            sections: Top-level sections to request (None for the full report)
+        """
+        ceiling = MAX_TOKENS if sections is None else SECTION_MAX_TOKENS
+        sections = list(sections or SECTION_NAMES)
+        structure = _json_structure(sections)
+        scope = ""
+        if len(sections) < len(SECTION_NAMES):
+            scope = f"This request covers ONLY these sections: {', '.join(sections)}. Return exactly these top-level keys.\n"
         prompt = f"""Analyze this crypto whitepaper comprehensively and return ONLY valid JSON. Use web research to find the LATEST 2025-2026 information.
 
 WHITEPAPER:
-{whitepaper_text[:18000]}
+{_TEXT_SLOT}
 
 CRITICAL REQUIREMENTS:
 1. DETAILED ANSWERS: Each text field must be 3-5+ sentences with specific data, metrics, and examples
@@ -146,110 +468,7 @@ CRITICAL REQUIREMENTS:
 6. Property names MUST be in double quotes. Do NOT truncate any section.
 
 REQUIRED JSON STRUCTURE (expand each field to 3-5+ detailed sentences with metrics):
-{{
-  "executive_analysis": {{
-    "project_name": "Full project name",
-    "tagline": "Compelling 1-sentence description", 
-    "core_value_proposition": "DETAILED 3-5 sentences explaining unique value, target users, key benefits, and why it matters. Include specific use cases and quantifiable advantages.",
-    "target_problem": "DETAILED 3-5 sentences describing the problem, its scale ($X market, Y users affected), current pain points, and why existing solutions fail. Include market research data from 2024-2025.",
-    "solution_approach": "DETAILED 3-5 sentences explaining the technical solution, how it works, key innovations, and implementation strategy. Include architecture overview and differentiation.",
-    "market_positioning": "DETAILED 3-5 sentences on target market segments, competitive positioning, pricing strategy, and go-to-market approach. Include current market share data (2025) if available.",
-    "competitive_moat": "DETAILED 3-5 sentences on sustainable competitive advantages: network effects, technical barriers, partnerships, brand, etc. Explain why competitors can't easily replicate."
-  }},
-  "technical_deep_dive": {{
-    "architecture_overview": "DETAILED 4-6 sentences explaining the complete technical architecture: layers, components, data flow, and how they interact. Include diagrams concepts and specific technologies used.",
-    "design_patterns": ["List 3-5 specific design patterns with brief explanations: e.g., 'Microservices architecture for modular scalability'"],
-    "consensus_mechanism": "Name of consensus (PoW/PoS/DPoS/BFT/etc.)",
-    "consensus_details": "DETAILED 3-5 sentences explaining how the consensus works, its parameters (block time, validator count, stake requirements), strengths, and tradeoffs vs alternatives.", 
-    "smart_contract_functionality": "DETAILED 3-5 sentences on smart contract capabilities, supported languages, VM used, gas model, and key contract features. Include examples of what can be built.",
-    "smart_contract_limitations": "DETAILED 2-4 sentences on current limitations: gas costs, throughput, complexity constraints, security considerations. Include specific numbers if available.",
-    "scalability_solutions": ["List 3-5 scalability approaches with details: e.g., 'Layer 2 rollups processing 10,000+ TPS', 'Sharding for parallel processing'"],
-    "security_measures": ["List 4-6 security features with specifics: e.g., 'Multi-signature treasury with 5/9 threshold', 'Bug bounty program: $500K max payout'"],
-    "audit_status": "DETAILED status: which firms (CertiK, Trail of Bits, etc.), when (Q4 2024), findings (X critical, Y high), remediation status. Include links if available.",
-    "interoperability": "DETAILED 3-4 sentences on cross-chain capabilities, bridges, supported chains, and integration standards (IBC, LayerZero, etc.). Include current bridge TVL if available.",
-    "technical_innovation_score": 7,
-    "innovation_justification": "DETAILED 3-5 sentences justifying the score: what's innovative, what's standard, comparisons to state-of-art, and potential impact."
-  }},
-  "tokenomics": {{
-    "token_name": "Full token name",
-    "token_symbol": "TICKER", 
-    "total_supply": "X tokens (or 'Uncapped' with inflation rate). Search for current circulating supply and market cap as of Dec 2024/Jan 2025.",
-    "utility": ["List 4-6 utilities with specifics: e.g., 'Governance: 1 token = 1 vote on protocol upgrades', 'Staking: Earn 8-12% APY', 'Fee discounts: 25% reduction'"],
-    "distribution": [{{"category": "Team", "percentage": "20%", "vesting": "4-year linear vest, 1-year cliff starting Jan 2024"}}],
-    "inflation_mechanism": "DETAILED 2-3 sentences: Emission schedule, annual inflation rate %, distribution of new tokens, how it changes over time. Include current inflation rate (2025).",
-    "deflation_mechanism": "DETAILED 2-3 sentences: Token burn mechanisms (% of fees burned, buyback programs), actual burn amounts to date, impact on supply. Search for latest burn data (2024-2025).",
-    "economic_sustainability": "DETAILED 3-4 sentences: Long-term token economics viability, balance of inflation/deflation, value capture mechanisms, alignment of incentives. Analysis of whether tokenomics supports growth.",
-    "flow_nodes": [{{"id": "node1", "label": "Users", "type": "participant"}}, {{"id": "node2", "label": "Staking Pool", "type": "contract"}}],
-    "flow_connections": [{{"source": "node1", "target": "node2", "label": "Stake tokens for 10% APY"}}]
-  }},
-  "risk_analysis": {{
-    "technical_risks": [{{"risk": "string", "description": "string", "severity": "High", "probability": "Medium"}}],
-    "market_risks": [{{"risk": "string", "description": "string", "severity": "Medium", "probability": "High"}}],
-    "team_execution_risks": [{{"risk": "string", "description": "string", "severity": "Low", "probability": "Medium"}}],
-    "overall_risk_level": "Medium"
-  }},
-  "competitive_landscape": {{
-    "direct_competitors": [{{"name": "Competitor name", "description": "2-3 sentences with current 2025 metrics: market cap, TVL, users, TPS", "strengths": ["3-5 specific strengths with data"], "weaknesses": ["3-5 specific weaknesses with data"]}}],
-    "feature_comparisons": [{{"feature": "Transaction speed", "project_score": "5000 TPS", "competitor_scores": {{"Ethereum": "15 TPS", "Solana": "65000 TPS", "Arbitrum": "40000 TPS"}}}}],
-    "technology_differentiation": "DETAILED 4-5 sentences explaining unique technical advantages vs competitors. Include specific architectural differences, performance benchmarks, and why it matters to users. Use 2025 comparison data.",
-    "alternative_approaches": ["List 3-4 alternative approaches competitors take: e.g., 'Optimistic rollups (Optimism) vs ZK-rollups (zkSync) for Layer 2 scaling'"]
-  }},
-  "technology_alternatives": {{
-    "current_tech_stack": ["array"],
-    "why_chosen": "string",
-    "alternatives": ["array"], 
-    "tradeoffs": "string",
-    "emerging_disruptions": ["array"],
-    "is_optimal": true,
-    "optimization_reasoning": "string"
-  }},
-  "roadmap": {{
-    "past_achievements": [{{"phase": "Phase name (e.g., 'Mainnet Launch')", "title": "Milestone title", "description": "2-3 sentences with specifics and impact", "timeline": "Q3 2023 or specific date", "status": "Completed/Delayed/etc."}}],
-    "current_phase": "DETAILED 2-3 sentences: What's being built right now (Dec 2024 - Q1 2025), progress %, blockers, expected completion. Search for latest development updates.",
-    "future_milestones": [{{"phase": "Future phase", "title": "Upcoming milestone", "description": "2-3 sentences on goals, requirements, expected impact", "timeline": "Q2 2025, Q3 2025, etc.", "status": "Planned/In Progress"}}],
-    "critical_path": ["List 3-5 critical milestones that determine project success: e.g., 'Mainnet launch Q2 2025', 'Secure 3 tier-1 exchange listings by Q3 2025'"],
-    "roadmap_risk": "DETAILED 3-4 sentences: Likelihood of delays, dependencies, resource constraints, market timing risks. Reference past delivery track record. Search for GitHub/blog updates on progress."
-  }},
-  "team_partnerships": {{
-    "team_members": [{{"name": "Full name", "role": "Title/Position", "experience": "2-3 sentences: Previous companies (Google, Meta, etc.), years of experience, notable achievements, relevant expertise", "linkedin": "URL if found via search"}}],
-    "advisors": [{{"name": "Full name", "role": "Advisor type", "experience": "2-3 sentences: Credentials, other projects advised, industry reputation", "linkedin": "URL if found"}}],
-    "partnerships": [{{"partner": "Company/Protocol name", "type": "Strategic/Technical/Marketing/etc.", "significance": "2-3 sentences: What the partnership enables, expected impact, announcement date. Search for 2024-2025 partnership announcements."}}],
-    "community_size": "DETAILED with current 2025 numbers: Twitter followers (X), Discord members (Y), Telegram (Z), GitHub stars (W). Search social media for latest counts.",
-    "community_engagement": "DETAILED 2-3 sentences: Activity levels, engagement rates, community-led initiatives, sentiment analysis. Include recent metrics like daily active Discord users, GitHub contributions/month."
-  }},
-  "use_cases_adoption": {{
-    "primary_use_cases": [{{"title": "Use case name", "description": "3-4 sentences explaining the use case, who it serves, how it works, and value delivered", "example": "Real example: 'Acme Corp uses this for X, processing Y transactions/day, saving Z%'"}}],
-    "target_segments": ["List 3-5 specific user segments with size estimates: e.g., 'DeFi traders (5M+ globally)', 'NFT creators ($40B market)'"],
-    "adoption_barriers": ["List 4-6 specific barriers with context: e.g., 'High gas fees: $50+ per transaction vs $0.50 on competitors', 'Steep learning curve: 6+ hours to onboard'"],
-    "network_effects": "DETAILED 3-4 sentences: Types of network effects (direct, indirect, data), current network size, tipping points, moat strength. Explain how growth accelerates with adoption.",
-    "traction_evidence": ["List 5-8 concrete metrics from 2024-2025: e.g., '50,000 daily active users (up 300% YoY)', '$500M TVL as of Dec 2024', '200+ dApps built', 'Listed on Binance, Coinbase'"]
-  }},
-  "financial_analysis": {{
-    "funding_raised": "DETAILED: Total amount raised, rounds (Seed: $X in DATE, Series A: $Y in DATE), investors (name tier-1 VCs), current valuation if known. Search for latest 2024-2025 funding news.",
-    "funding_allocation": {{"Development": "40%", "Marketing": "25%", "Operations": "20%", "Reserves": "15%"}},
-    "revenue_model": "DETAILED 3-5 sentences: How does the project generate revenue? (transaction fees, subscriptions, token burns, etc.) Include specific fee structures, current revenue (ARR/MRR if available), and projections. Search for 2025 financial disclosures.",
-    "token_value_drivers": ["List 4-6 specific drivers: e.g., 'Staking yields: 8-12% APY', 'Token burns: 2% of tx fees', 'Governance rights over $50M treasury'"],
-    "bull_case": "DETAILED 4-6 sentences: Best-case scenario with specific targets: market adoption (X users by 2026), token price ($Y with Z market cap), partnerships, technological breakthroughs. Include probability and catalysts. Use current 2025 metrics as baseline.",
-    "bear_case": "DETAILED 4-6 sentences: Worst-case scenario: competition risks, regulatory threats, technological failures, market conditions. Include potential price impact and probability. Reference 2024-2025 market context."
-  }},
-  "visualization_data": {{
-    "tech_stack_nodes": [{{"id": "string", "label": "string", "type": "string"}}],
-    "tech_stack_connections": [{{"source": "string", "target": "string", "label": "string"}}],
-    "risk_radar": [{{"dimension": "string", "score": 7}}],
-    "competitive_matrix_x_axis": "string", 
-    "competitive_matrix_y_axis": "string",
-    "competitive_plots": [{{"name": "string", "x": 7, "y": 8}}]
-  }},
-  "overall_assessment": {{
-    "innovation_score": 7,
-    "technical_viability": 8,
-    "team_capability": 6,
-    "market_opportunity": 7,
-    "risk_adjusted_rating": 6,
-    "investment_recommendation": "Strong Buy",
-    "recommendation_justification": "DETAILED 5-7 sentences: Comprehensive investment thesis considering: technical innovation, team execution, market timing (2025 context), competitive position, tokenomics, risk/reward profile, and catalysts. Include price targets if relevant (e.g., 'potential 3-5x in 12-18 months if mainnet delivers'). Reference current market conditions (Dec 2024/Jan 2025)."
-  }}
-}}
+{scope}{structure}
 
 MANDATORY RULES:
 1. DETAIL LEVEL: Every string field MUST contain 3-5+ complete sentences with:
@@ -285,237 +504,869 @@ MANDATORY RULES:
 
 Return the complete, comprehensive JSON now:"""
         
-        return prompt
+        # The excerpt gets the input budget, or whatever the context window
+        # leaves after the instructions and the largest output reservation
+        overhead = self.budgeter.count(SYSTEM_PROMPT) + self.budgeter.count(prompt)
+        room = self.budgeter.context_window - overhead - ceiling
+        limit = room if self.input_tokens is None else min(self.input_tokens, room)
+        return prompt.replace(_TEXT_SLOT, self.budgeter.fit_text(whitepaper_text, limit))
     
-    def analyze_whitepaper(self, whitepaper_text: str, max_retries: int = 2) -> AnalysisResult:
-        """Analyze whitepaper using ERNIE AI with retry logic"""
-        last_error = None
+    def _response_schema(self, sections: Optional[Sequence[str]] = None) -> dict:
+        """JSON schema for a full report or for the given sections only"""
+        if sections is None:
+            return self.json_schema
+        properties = self.json_schema["properties"]
+        return {
+            "type": "object",
+            "properties": {name: properties.get(name, {"type": "object"}) for name in sections},
+            "required": list(sections),
+        }
+    
+    def _build_completion_request(
+        self,
+        whitepaper_text: str,
+        sections: Optional[Sequence[str]] = None,
+        response_format: str = "none"
+    ) -> Dict[str, Any]:
+        """Build the chat completion arguments shared by the sync and async paths"""
+        prompt = self._create_analysis_prompt(whitepaper_text, sections)
         
-        for attempt in range(max_retries + 1):
-            try:
-                logger.info(f"Sending whitepaper to ERNIE for comprehensive analysis (attempt {attempt + 1}/{max_retries + 1})...")
-                
-                prompt = self._create_analysis_prompt(whitepaper_text)
-                
-                response = self.client.chat.completions.create(
-                    model=self.model,
-                    messages=[
-                        {
-                            "role": "system",
-                            "content": """You are a senior blockchain analyst with 10+ years of experience in crypto investments, technical due diligence, and market research. 
+        request = {
+            "model": self.model,
+            "messages": [
+                {
+                    "role": "system",
+                    "content": SYSTEM_PROMPT
+                },
+                {
+                    "role": "user",
+                    "content": prompt
+                }
+            ],
+            "temperature": 0.3,
+        }
+        request["max_tokens"] = self.budgeter.max_tokens(
+            self._request_kind(sections),
+            self._prompt_tokens(request["messages"]),
+            MAX_TOKENS if sections is None else SECTION_MAX_TOKENS
+        )
+        if response_format == "json_schema":
+            request["response_format"] = {
+                "type": "json_schema",
+                "json_schema": {
+                    "name": "whitepaper_analysis",
+                    "schema": self._response_schema(sections),
+                },
+            }
+        elif response_format == "json_object":
+            request["response_format"] = {"type": "json_object"}
+        return request
+    
+    def _create_map_prompt(self, chunk: Dict[str, Any], page_count: int) -> str:
+        """
+        Build the prompt pulling section-relevant facts out of one chunk
+        
+        Args:
+            chunk: Chunk from ``chunk_pages`` (text carries [Page N] markers)
+            page_count: Pages in the whole document
+        """
+        fields = "\n".join(
+            f"- {name}: {', '.join(field.replace('_', ' ') for field in SECTION_FIELDS[name])}"
+            for name in SECTION_NAMES
+        )
+        return f"""You are reading pages {chunk['start_page']}-{chunk['end_page']} of a {page_count}-page crypto whitepaper. Other pages are read separately, and a later step writes the full analysis from the facts you extract.
 
-CRITICAL INSTRUCTIONS:
-1. DEPTH: Provide institutional-grade analysis with 3-5+ sentences per field
-2. CURRENT DATA: Always search the web for latest 2025-2026 information (prices, market caps, partnerships, developments)
-3. SPECIFICITY: Include concrete numbers, metrics, dates, and examples
-4. RESEARCH: Use CoinGecko, CoinMarketCap, GitHub, Twitter, official websites, news articles
-5. FORMAT: Return ONLY valid JSON with ALL property names in double quotes - NO markdown, NO code blocks, NO tool calls, JUST the raw JSON object starting with {
-6. COMPLETENESS: Never truncate - complete every single field thoroughly
+Extract every concrete fact on these pages that is relevant to a report section: numbers, percentages, dates, names, mechanisms, allocations, milestones, partners, risks and claims. Quote figures exactly. Do not analyze, speculate or add outside information.
 
-DO NOT use tool calls or function calls. Return the JSON directly in your response.
-Your analysis will be used for investment decisions - be thorough, critical, and data-driven."""
-                        },
-                        {
-                            "role": "user",
-                            "content": prompt
-                        }
-                    ],
-                    temperature=0.3,
-                    max_tokens=32000,
-                )
-                
-                analysis_text = response.choices[0].message.content
-                logger.info(f"Received response from ERNIE: {len(analysis_text)} characters")
-                
-                # Clean XML/tool call tags that the model might add
-                if "<tool_call>" in analysis_text or "</tool_call>" in analysis_text:
-                    # Remove tool call wrappers
-                    import re
-                    analysis_text = re.sub(r'<tool_call>.*?</tool_call>', '', analysis_text, flags=re.DOTALL)
-                    analysis_text = re.sub(r'<tool_call>.*', '', analysis_text, flags=re.DOTALL)
-                    logger.warning("Removed tool_call tags from response")
-                
-                # Clean JSON from markdown
-                if "```json" in analysis_text:
-                    analysis_text = analysis_text.split("```json")[1].split("```")[0].strip()
-                elif "```" in analysis_text:
-                    analysis_text = analysis_text.split("```")[1].split("```")[0].strip()
-                
-                # Additional cleaning - remove any trailing text after the JSON
-                analysis_text = analysis_text.strip()
-                
-                # Find the JSON boundaries more carefully
-                if analysis_text.startswith('{'):
-                    # Find the matching closing brace
-                    brace_count = 0
-                    json_end = -1
-                    for i, char in enumerate(analysis_text):
-                        if char == '{':
-                            brace_count += 1
-                        elif char == '}':
-                            brace_count -= 1
-                            if brace_count == 0:
-                                json_end = i + 1
-                                break
-                    
-                    if json_end > 0:
-                        analysis_text = analysis_text[:json_end]
-                
-                logger.info(f"Cleaned JSON length: {len(analysis_text)} characters")
-                
-                try:
-                    analysis_dict = json.loads(analysis_text)
-                except json.JSONDecodeError as e:
-                    logger.error(f"JSON parsing failed at position {e.pos}")
-                    logger.error(f"Context around error: {analysis_text[max(0, e.pos-100):e.pos+100]}")
-                    
-                    # Try to fix common JSON issues
-                    try:
-                        analysis_text = self._fix_common_json_issues(analysis_text)
-                        analysis_dict = json.loads(analysis_text)
-                    except json.JSONDecodeError as e2:
-                        logger.error(f"JSON still malformed after fix attempt: {str(e2)}")
-                        
-                        # Try more aggressive JSON repair
-                        try:
-                            analysis_text = self._aggressive_json_repair(analysis_text)
-                            analysis_dict = json.loads(analysis_text)
-                        except json.JSONDecodeError as e3:
-                            logger.error(f"JSON still malformed after aggressive repair: {str(e3)}")
-                            if attempt < max_retries:
-                                logger.info(f"Retrying analysis due to JSON parsing error (attempt {attempt + 1})")
-                                last_error = e3
-                                continue
-                            else:
-                                # If JSON is completely broken on final attempt, return a minimal valid structure
-                                logger.warning("Returning minimal analysis structure due to JSON parsing failure")
-                                analysis_dict = self._get_minimal_analysis_structure()
-                
-                # Ensure all required fields exist with defaults
-                analysis_dict = self._ensure_defaults(analysis_dict)
-                
-                # Validate the analysis result before creating the Pydantic model
-                analysis_dict = self._validate_analysis_completeness(analysis_dict)
-                
-                result = AnalysisResult(**analysis_dict)
-                
-                logger.info("Successfully parsed comprehensive analysis result")
-                return result
-                
-            except json.JSONDecodeError as e:
-                last_error = e
+REPORT SECTIONS (and what they cover):
+{fields}
+
+Return ONLY a JSON object whose keys are section names from the list above and whose values are arrays of {{"fact": "...", "page": <page number from the [Page N] marker>}}. Leave out sections with nothing relevant on these pages.
+
+PAGES:
+{chunk['text']}"""
+    
+    def _map_schema(self) -> dict:
+        """JSON schema of a map step response"""
+        fact = {
+            "type": "object",
+            "properties": {"fact": {"type": "string"}, "page": {"type": "integer"}},
+            "required": ["fact", "page"],
+        }
+        return {
+            "type": "object",
+            "properties": {name: {"type": "array", "items": fact} for name in SECTION_NAMES},
+        }
+    
+    def _build_map_request(
+        self,
+        chunk: Dict[str, Any],
+        page_count: int,
+        response_format: str = "none"
+    ) -> Dict[str, Any]:
+        """Build the chat completion arguments for one map step"""
+        request = {
+            "model": self.model,
+            "messages": [
+                {"role": "system", "content": SYSTEM_PROMPT},
+                {"role": "user", "content": self._create_map_prompt(chunk, page_count)},
+            ],
+            "temperature": 0.3,
+        }
+        request["max_tokens"] = self.budgeter.max_tokens(
+            "map", self._prompt_tokens(request["messages"]), MAP_MAX_TOKENS
+        )
+        if response_format == "json_schema":
+            request["response_format"] = {
+                "type": "json_schema",
+                "json_schema": {"name": "whitepaper_facts", "schema": self._map_schema()},
+            }
+        elif response_format == "json_object":
+            request["response_format"] = {"type": "json_object"}
+        return request
+    
+    def _request_kind(
+        self,
+        sections: Optional[Sequence[str]] = None,
+        build_request: Optional[Callable[[str], Dict[str, Any]]] = None
+    ) -> str:
+        """Kind of request, each with its own output reservation"""
+        if build_request is not None:
+            return "map"
+        return "report" if sections is None else "sections"
+    
+    def _prompt_tokens(self, messages: List[Dict[str, str]]) -> int:
+        """Predicted prompt tokens, with a few tokens of framing per message"""
+        return sum(self.budgeter.count(message["content"]) + 4 for message in messages)
+    
+    def _record_usage(self, kind: str, request: Dict[str, Any], usage: Any) -> None:
+        """Log predicted against actual usage and feed it back into the budgeter"""
+        self.budgeter.record(kind, self._prompt_tokens(request["messages"]), request["max_tokens"], usage)
+    
+    def token_stats(self) -> Dict[str, Any]:
+        """Token prediction accuracy and output reservations per request kind"""
+        return self.budgeter.stats()
+    
+    def _downgrade_response_format(self, rejected: str, error: Exception) -> None:
+        """Step down to the next response format after the provider rejected one"""
+        self.format_stats.record(rejected, "rejected")
+        # Concurrent requests may hit the same rejection; step down only once
+        if self.active_response_format == rejected:
+            self.active_response_format = RESPONSE_FORMATS[RESPONSE_FORMATS.index(rejected) + 1]
+            logger.warning(
+                f"Provider rejected response_format={rejected}, "
+                f"falling back to {self.active_response_format}: {str(error)}"
+            )
+    
+    def _create_completion(
+        self,
+        whitepaper_text: str,
+        sections: Optional[Sequence[str]] = None
+    ) -> tuple[str, str]:
+        """
+        Request a completion with the strongest response format the provider accepts
+        
+        Returns:
+            Tuple of (message content, response format used)
+        """
+        while True:
+            response_format = self.active_response_format
+            request = self._build_completion_request(whitepaper_text, sections, response_format)
+            try:
+                response = self.client.chat.completions.create(**request)
+                self._record_usage(self._request_kind(sections), request, response.usage)
+                return response.choices[0].message.content, response_format
+            except BadRequestError as e:
+                # Other 400s (context length, bad parameters) fail the same
+                # way in every format
+                if response_format == "none" or not _rejects_response_format(e):
+                    raise
+                self._downgrade_response_format(response_format, e)
+    
+    async def _create_completion_async(
+        self,
+        whitepaper_text: str,
+        sections: Optional[Sequence[str]] = None,
+        on_section: Optional[SectionCallback] = None,
+        build_request: Optional[Callable[[str], Dict[str, Any]]] = None
+    ) -> tuple[str, str]:
+        """
+        Async version of ``_create_completion``
+        
+        When streaming, ``on_section`` is called for every top-level section
+        that closes and validates while the completion is still running.
+        ``build_request`` replaces the analysis request with another one
+        built for a given response format (e.g. a map step).
+        """
+        while True:
+            response_format = self.active_response_format
+            if build_request is not None:
+                request = build_request(response_format)
+            else:
+                request = self._build_completion_request(whitepaper_text, sections, response_format)
+            try:
+                if self.stream:
+                    # Usage only arrives on a streamed reply's last chunk if asked for
+                    stream = await self.async_client.chat.completions.create(
+                        **request, stream=True, stream_options={"include_usage": True}
+                    )
+                    content, usage = await self._read_stream(stream, on_section)
+                else:
+                    response = await self.async_client.chat.completions.create(**request)
+                    content, usage = response.choices[0].message.content, response.usage
+                self._record_usage(self._request_kind(sections, build_request), request, usage)
+                return content, response_format
+            except BadRequestError as e:
+                # Other 400s (context length, bad parameters) fail the same
+                # way in every format
+                if response_format == "none" or not _rejects_response_format(e):
+                    raise
+                self._downgrade_response_format(response_format, e)
+    
+    async def _read_stream(
+        self,
+        stream: Any,
+        on_section: Optional[SectionCallback]
+    ) -> tuple[str, Any]:
+        """
+        Consume a streamed completion, surfacing sections as they close
+        
+        Returns:
+            Tuple of (full text, usage if the provider sent it on a chunk)
+        """
+        parser = SectionStreamParser()
+        usage = None
+        try:
+            async for chunk in stream:
+                usage = getattr(chunk, "usage", None) or usage
+                if not chunk.choices or not chunk.choices[0].delta.content:
+                    continue
+                for name, value in parser.feed(chunk.choices[0].delta.content):
+                    if on_section is None or name not in SECTION_TEMPLATES or not isinstance(value, dict):
+                        continue
+                    section = self._validate_section(name, value)
+                    if section is not None:
+                        on_section(name, section)
+        finally:
+            await stream.close()
+        return parser.text, usage
+    
+    def _validate_section(self, name: str, value: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+        """Normalize and validate one section against its model, or None if invalid"""
+        model = AnalysisResult.model_fields[name].annotation
+        try:
+            normalized = self._validate_analysis_completeness(self._ensure_defaults({name: value}))
+            return model.model_validate(normalized[name]).model_dump()
+        except Exception as e:
+            logger.warning(f"Section {name} failed validation: {str(e)}")
+            return None
+    
+    def response_format_stats(self) -> Dict[str, Any]:
+        """Configured and active response format with per-format parse counters"""
+        return {
+            "configured": self.response_format,
+            "active": self.active_response_format,
+            "modes": self.format_stats.snapshot(),
+        }
+    
+    def _parse_json_response(
+        self,
+        analysis_text: str,
+        final_attempt: bool,
+        response_format: str = "none"
+    ) -> Optional[Dict[str, Any]]:
+        """
+        Clean and parse a raw model response into a dict
+        
+        Args:
+            analysis_text: Raw message content returned by the model
+            final_attempt: Whether the caller has retries left
+            response_format: Response format the completion was requested with
+            
+        Returns:
+            Parsed JSON object, or None if it cannot be repaired on the final attempt
+            
+        Raises:
+            json.JSONDecodeError: If the JSON cannot be repaired and retries remain
+        """
+        logger.info(f"Received response from ERNIE: {len(analysis_text)} characters")
+        
+        # Strip wrappers, find the outermost object and repair it in one pass
+        json_text, repaired = extract_json_object(analysis_text)
+        if repaired:
+            logger.warning("Repaired malformed JSON in response")
+        logger.info(f"Cleaned JSON length: {len(json_text)} characters")
+        
+        try:
+            # strict=False accepts raw newlines and tabs inside strings
+            analysis_dict = json.loads(json_text, strict=False)
+        except json.JSONDecodeError as e:
+            logger.error(f"JSON parsing failed at position {e.pos}")
+            logger.error(f"Context around error: {json_text[max(0, e.pos-100):e.pos+100]}")
+            
+            # Last resort: line-by-line repair
+            try:
+                analysis_dict = json.loads(self._aggressive_json_repair(json_text or analysis_text))
+            except json.JSONDecodeError as e2:
+                logger.error(f"JSON still malformed after aggressive repair: {str(e2)}")
+                self.format_stats.record(response_format, "unparseable")
+                if not final_attempt:
+                    raise
+                return None
+            repaired = True
+        
+        self.format_stats.record(response_format, "repaired" if repaired else "clean")
+        return analysis_dict
+    
+    def _build_result(self, analysis_dict: Dict[str, Any]) -> AnalysisResult:
+        """Fill defaults, validate and build the AnalysisResult model"""
+        # Ensure all required fields exist with defaults
+        analysis_dict = self._ensure_defaults(analysis_dict)
+        
+        # Validate the analysis result before creating the Pydantic model
+        analysis_dict = self._validate_analysis_completeness(analysis_dict)
+        
+        return AnalysisResult(**analysis_dict)
+    
+    def _parse_section_response(
+        self,
+        analysis_text: str,
+        sections: Sequence[str],
+        response_format: str = "none"
+    ) -> tuple[Dict[str, Any], List[str]]:
+        """
+        Parse a response and keep the requested sections that validate
+        
+        Returns:
+            Tuple of (valid sections, names of sections still needed)
+        """
+        parsed = self._parse_json_response(analysis_text, final_attempt=True, response_format=response_format)
+        if not isinstance(parsed, dict):
+            parsed = {}
+        # A single-section request may come back without its wrapping key
+        if parsed and len(sections) == 1 and sections[0] not in parsed:
+            parsed = {sections[0]: parsed}
+        
+        properties = self.json_schema["properties"]
+        valid: Dict[str, Any] = {}
+        for name in sections:
+            value = parsed.get(name)
+            if not isinstance(value, dict) or not value:
+                continue
+            # A truncated response can close a section before its required fields
+            required = properties.get(name, {}).get("required", [])
+            if all(field in value for field in required) and self._validate_section(name, value) is not None:
+                valid[name] = value
+        missing = [name for name in sections if name not in valid]
+        if missing:
+            logger.warning(f"Response lacks usable sections: {', '.join(missing)}")
+        return valid, missing
+    
+    def _fill_failed_sections(
+        self,
+        analysis_dict: Dict[str, Any],
+        failed: Sequence[str],
+        fallbacks: Optional[List[str]] = None
+    ) -> None:
+        """
+        Give sections that never came back valid the minimal analysis structure
+        
+        Args:
+            analysis_dict: Sections collected so far, filled in place
+            failed: Names of the sections that failed
+            fallbacks: Optional list the failed section names are appended to
+        """
+        if not failed:
+            return
+        logger.warning(f"Using minimal structure for sections {', '.join(failed)}")
+        minimal = self._get_minimal_analysis_structure()
+        for name in failed:
+            analysis_dict[name] = minimal[name]
+        if fallbacks is not None:
+            fallbacks.extend(failed)
+    
+    def _request_sections(
+        self,
+        whitepaper_text: str,
+        sections: Optional[Sequence[str]] = None,
+        max_retries: int = 2
+    ) -> Dict[str, Any]:
+        """
+        Request report sections, salvaging whatever each response got right
+        
+        The first completion asks for ``sections`` (the whole report if
+        None). Every section that comes back valid is kept and follow-up
+        completions ask only for the ones still missing or invalid, until
+        the retry budget is spent. Sections that still fail get the minimal
+        analysis structure. A request that fails outright is retried as is.
+        
+        Args:
+            whitepaper_text: Extracted whitepaper text
+            sections: Sections to request, or None for the whole report
+            max_retries: Completions allowed after the first one
+            
+        Returns:
+            Dictionary with every requested section
+            
+        Raises:
+            Exception: If every request failed and nothing was salvaged
+        """
+        label = f"sections {'+'.join(sections)}" if sections else "whitepaper"
+        analysis_dict: Dict[str, Any] = {}
+        missing = list(sections or SECTION_NAMES)
+        request = sections
+        
+        for attempt in range(max_retries + 1):
+            logger.info(f"Sending {label} to ERNIE (attempt {attempt + 1}/{max_retries + 1}, {len(missing)} sections)...")
+            try:
+                content, response_format = self._create_completion(whitepaper_text, request)
+            except Exception as e:
                 if attempt < max_retries:
-                    logger.warning(f"JSON parsing failed on attempt {attempt + 1}, retrying...")
+                    logger.warning(f"Request for {label} failed on attempt {attempt + 1}, retrying: {str(e)}")
                     continue
-                else:
-                    logger.error(f"Failed to parse JSON response after {max_retries + 1} attempts: {str(e)}")
-                    logger.error(f"Final response text: {analysis_text[:1000] if 'analysis_text' in locals() else 'No response'}")
-                    raise Exception(f"Failed to parse AI response as JSON after {max_retries + 1} attempts: {str(e)}")
+                if not analysis_dict:
+                    logger.error(f"Request for {label} failed after {max_retries + 1} attempts: {str(e)}")
+                    raise Exception(f"Failed to analyze {label} after {max_retries + 1} attempts: {str(e)}")
+                logger.error(f"Follow-up request for {', '.join(missing)} failed: {str(e)}")
+                break
             
+            recovered, missing = self._parse_section_response(content, missing, response_format)
+            analysis_dict.update(recovered)
+            if not missing:
+                break
+            if attempt < max_retries:
+                self.format_stats.record(response_format, "retries")
+            # Ask again only for what is still needed once anything was salvaged
+            request = missing if analysis_dict else sections
+        
+        self._fill_failed_sections(analysis_dict, missing)
+        return analysis_dict
+    
+    async def _request_sections_async(
+        self,
+        whitepaper_text: str,
+        sections: Optional[Sequence[str]] = None,
+        max_retries: int = 2,
+        on_section: Optional[SectionCallback] = None,
+        limit: Optional[asyncio.Semaphore] = None,
+        fallbacks: Optional[List[str]] = None
+    ) -> tuple[Dict[str, Any], float]:
+        """
+        Async version of ``_request_sections``
+        
+        Each completion holds a governor slot, and ``limit`` too if given.
+        Sections that get the minimal structure are appended to ``fallbacks``.
+        
+        Returns:
+            Tuple of (sections dict, seconds spent in completions)
+        """
+        label = f"sections {'+'.join(sections)}" if sections else "whitepaper"
+        analysis_dict: Dict[str, Any] = {}
+        missing = list(sections or SECTION_NAMES)
+        request = sections
+        seconds = 0.0
+        
+        for attempt in range(max_retries + 1):
+            logger.info(f"Sending {label} to ERNIE (attempt {attempt + 1}/{max_retries + 1}, {len(missing)} sections)...")
+            try:
+                async with limit or contextlib.nullcontext(), self.governor.slot():
+                    started = time.perf_counter()
+                    try:
+                        content, response_format = await self._create_completion_async(
+                            whitepaper_text, request, on_section
+                        )
+                    finally:
+                        seconds += time.perf_counter() - started
             except Exception as e:
-                last_error = e
                 if attempt < max_retries:
-                    logger.warning(f"Analysis failed on attempt {attempt + 1}, retrying: {str(e)}")
+                    logger.warning(f"Request for {label} failed on attempt {attempt + 1}, retrying: {str(e)}")
                     continue
-                else:
-                    logger.error(f"Analysis failed after {max_retries + 1} attempts: {str(e)}")
-                    raise Exception(f"Failed to analyze whitepaper after {max_retries + 1} attempts: {str(e)}")
+                if not analysis_dict:
+                    logger.error(f"Request for {label} failed after {max_retries + 1} attempts: {str(e)}")
+                    raise Exception(f"Failed to analyze {label} after {max_retries + 1} attempts: {str(e)}")
+                logger.error(f"Follow-up request for {', '.join(missing)} failed: {str(e)}")
+                break
+            
+            recovered, missing = self._parse_section_response(content, missing, response_format)
+            analysis_dict.update(recovered)
+            if not missing:
+                break
+            if attempt < max_retries:
+                self.format_stats.record(response_format, "retries")
+            # Ask again only for what is still needed once anything was salvaged
+            request = missing if analysis_dict else sections
         
-        # This should never be reached, but just in case
-        raise Exception(f"Failed to analyze whitepaper: {str(last_error)}")
+        self._fill_failed_sections(analysis_dict, missing, fallbacks)
+        return analysis_dict, seconds
     
-    def _fix_common_json_issues(self, json_text: str) -> str:
-        """Fix common JSON formatting issues"""
-        import re
+    def analyze_whitepaper(self, whitepaper_text: str, max_retries: int = 2) -> AnalysisResult:
+        """Analyze whitepaper using ERNIE AI, re-requesting only sections that fail"""
+        analysis_dict = self._request_sections(whitepaper_text, max_retries=max_retries)
+        result = self._build_result(analysis_dict)
+        logger.info("Successfully parsed comprehensive analysis result")
+        return result
+    
+    async def analyze_whitepaper_async(
+        self,
+        whitepaper_text: str,
+        max_retries: int = 2,
+        timings: Optional[Dict[str, Any]] = None,
+        on_section: Optional[SectionCallback] = None,
+        pages: Optional[Sequence[str]] = None,
+        coverage: Optional[Dict[str, Any]] = None,
+        fallbacks: Optional[List[str]] = None
+    ) -> AnalysisResult:
+        """
+        Analyze whitepaper on the event loop using the pooled async client
+        
+        Each completion holds a governor slot for its duration, so the number
+        of in-flight provider requests per process never exceeds
+        ``max_concurrent_completions`` no matter how many analyses are running.
+        In sectioned and map-reduce mode the report is produced by
+        ``analyze_whitepaper_sectioned_async`` or
+        ``analyze_whitepaper_map_reduce_async`` instead.
+        
+        Args:
+            whitepaper_text: Extracted whitepaper text
+            max_retries: Follow-up completions allowed for a failed request
+                or for sections missing from the response
+            timings: Optional dict receiving per-section timings (sectioned mode)
+            on_section: Called with each section as soon as it is complete
+                and valid, when streaming is enabled
+            pages: Text of each page, used for chunking in map-reduce mode
+            coverage: Optional dict receiving the map-reduce coverage report
+            fallbacks: Optional list receiving the names of sections that
+                never came back valid and hold the minimal structure instead
+        """
+        if self.analysis_mode == "sectioned":
+            return await self.analyze_whitepaper_sectioned_async(
+                whitepaper_text, max_retries, timings, on_section, pages, fallbacks
+            )
+        if self.analysis_mode == "map_reduce":
+            return await self.analyze_whitepaper_map_reduce_async(
+                whitepaper_text, pages, max_retries, timings, on_section, coverage, fallbacks
+            )
+        
+        analysis_dict, _ = await self._request_sections_async(
+            whitepaper_text, max_retries=max_retries, on_section=on_section, fallbacks=fallbacks
+        )
+        result = self._build_result(analysis_dict)
+        logger.info("Successfully parsed comprehensive analysis result")
+        return result
+    
+    async def analyze_whitepaper_sectioned_async(
+        self,
+        whitepaper_text: str,
+        max_retries: int = 2,
+        timings: Optional[Dict[str, Any]] = None,
+        on_section: Optional[SectionCallback] = None,
+        pages: Optional[Sequence[str]] = None,
+        fallbacks: Optional[List[str]] = None
+    ) -> AnalysisResult:
+        """
+        Analyze whitepaper as concurrent completions, one per section group
+        
+        Every group in SECTION_GROUPS is requested with a smaller output
+        reservation, and sections a group gets wrong are re-requested on
+        their own. Up to ``section_concurrency`` groups run at once (each
+        also holds a governor slot), so wall-clock time approaches the
+        slowest group instead of the whole report.
         
-        # Remove any trailing commas before closing braces/brackets
-        json_text = re.sub(r',(\s*[}\]])', r'\1', json_text)
-        
-        # Fix incomplete JSON by finding the last complete object
-        if json_text.count('{') > json_text.count('}'):
-            # Find the last complete closing brace
-            brace_count = 0
-            last_complete = -1
-            for i, char in enumerate(json_text):
-                if char == '{':
-                    brace_count += 1
-                elif char == '}':
-                    brace_count -= 1
-                    if brace_count == 0:
-                        last_complete = i + 1
+        With retrieval enabled, the document is indexed once and each group
+        is sent the passages its sections' queries rank highest instead of
+        the leading text.
+        
+        Args:
+            whitepaper_text: Extracted whitepaper text
+            max_retries: Retries per section group
+            timings: Optional dict receiving "sections" (seconds per group),
+                "sections_sum" (what the groups would take back to back) and,
+                with retrieval, "index_build" and "index_query" seconds
+            on_section: Called with each section as soon as it is complete
+                and valid, when streaming is enabled
+            pages: Text of each page, indexed for retrieval (the whole text
+                is indexed as one page if not given)
+            fallbacks: Optional list receiving the names of sections that
+                hold the minimal structure
             
-            if last_complete > 0:
-                json_text = json_text[:last_complete]
-            else:
-                # No complete objects found, try to close what we have
-                missing_braces = json_text.count('{') - json_text.count('}')
-                if missing_braces > 0:
-                    json_text += '}' * missing_braces
+        Returns:
+            AnalysisResult merged from every group
+        """
+        limit = asyncio.Semaphore(self.section_concurrency)
+        started = time.perf_counter()
         
-        # Fix incomplete arrays by closing them properly
-        if json_text.count('[') > json_text.count(']'):
-            missing_brackets = json_text.count('[') - json_text.count(']')
-            json_text += ']' * missing_brackets
+        excerpts = {group: whitepaper_text for group in SECTION_GROUPS}
+        if self.uses_retrieval:
+            index = await self._build_index(list(pages or [whitepaper_text]))
+            built = time.perf_counter()
+            for group in SECTION_GROUPS:
+                excerpts[group] = self._retrieve_passages(index, group) or whitepaper_text
+            queried = time.perf_counter()
+            logger.info(
+                f"Indexed {index.stats()['passages']} passages in {built - started:.3f}s, "
+                f"queried {len(SECTION_NAMES)} sections in {queried - built:.3f}s"
+            )
+            if timings is not None:
+                timings["index_build"] = round(built - started, 4)
+                timings["index_query"] = round(queried - built, 4)
         
-        # Fix truncated strings by closing them
-        lines = json_text.split('\n')
-        fixed_lines = []
+        logger.info(f"Sending whitepaper to ERNIE as {len(SECTION_GROUPS)} section requests...")
+        requests = [
+            asyncio.ensure_future(
+                self._request_sections_async(
+                    excerpts[group], group, max_retries, on_section, limit, fallbacks
+                )
+            )
+            for group in SECTION_GROUPS
+        ]
+        try:
+            parts = await asyncio.gather(*requests)
+        except BaseException:
+            # One group failed for good; stop paying for the others
+            for request in requests:
+                request.cancel()
+            raise
         
-        for line in lines:
-            # Check for unclosed strings (odd number of quotes)
-            # Count unescaped quotes only
-            escaped_line = line.replace('\\"', '')  # Remove escaped quotes for counting
-            quote_count = escaped_line.count('"')
+        analysis_dict: Dict[str, Any] = {}
+        durations: Dict[str, float] = {}
+        for group, (sections, seconds) in zip(SECTION_GROUPS, parts):
+            analysis_dict.update(sections)
+            durations["+".join(group)] = round(seconds, 3)
+        
+        elapsed = time.perf_counter() - started
+        total = sum(durations.values())
+        logger.info(f"Sectioned analysis took {elapsed:.1f}s (sections back to back: {total:.1f}s)")
+        if timings is not None:
+            timings["sections"] = durations
+            timings["sections_sum"] = round(total, 3)
+        
+        return self._build_result(analysis_dict)
+    
+    async def _build_index(self, pages: List[str]) -> PassageIndex:
+        """Index the document's passages off the event loop, in the CPU pool if there is one"""
+        if self.execution is None:
+            return await asyncio.to_thread(PassageIndex.from_pages, pages)
+        return await self.execution.run_cpu(PassageIndex.from_pages, pages)
+    
+    def _retrieve_passages(self, index: PassageIndex, sections: Sequence[str]) -> str:
+        """
+        Best passages for a section group, within the prompt's input budget
+        
+        The sections' rankings are interleaved so each gets its best
+        passages in before any gets its k-th; passages that would overflow
+        the budget are skipped. The result is in document order with page
+        markers, or empty if no passage matched.
+        """
+        rankings = [index.search(SECTION_QUERIES[name], self.retrieval_top_k) for name in sections]
+        chosen: List[int] = []
+        used = 0
+        for rank in range(self.retrieval_top_k):
+            for ranking in rankings:
+                if rank >= len(ranking) or ranking[rank][1] in chosen:
+                    continue
+                position = ranking[rank][1]
+                cost = self.budgeter.count(index.passages[position]["text"]) + 8
+                if used + cost <= self.input_tokens:
+                    chosen.append(position)
+                    used += cost
+        return "\n\n".join(
+            f"[Page {index.passages[position]['page']}]\n{index.passages[position]['text']}"
+            for position in sorted(chosen)
+        )
+    
+    async def _map_chunk(
+        self,
+        chunk: Dict[str, Any],
+        page_count: int,
+        max_retries: int,
+        limit: asyncio.Semaphore
+    ) -> tuple[Optional[Dict[str, List[Dict[str, Any]]]], float]:
+        """
+        Pull section-relevant facts out of one chunk
+        
+        Returns:
+            Tuple of (facts per section, or None if every attempt failed,
+            seconds spent in completions)
+        """
+        label = f"pages {chunk['start_page']}-{chunk['end_page']}"
+        seconds = 0.0
+        
+        for attempt in range(max_retries + 1):
+            try:
+                async with limit, self.governor.slot():
+                    started = time.perf_counter()
+                    try:
+                        content, response_format = await self._create_completion_async(
+                            chunk["text"],
+                            build_request=lambda fmt: self._build_map_request(chunk, page_count, fmt)
+                        )
+                    finally:
+                        seconds += time.perf_counter() - started
+            except Exception as e:
+                logger.warning(f"Map step for {label} failed on attempt {attempt + 1}: {str(e)}")
+                continue
             
-            if quote_count % 2 != 0 and ':' in line:
-                # If line has unclosed string, try to close it
-                line_stripped = line.rstrip()
-                if line_stripped.endswith(','):
-                    line = line_stripped[:-1] + '",'
-                elif line_stripped.endswith('}') or line_stripped.endswith(']'):
-                    line = line_stripped[:-1] + '"' + line_stripped[-1]
+            parsed = self._parse_json_response(content, final_attempt=True, response_format=response_format)
+            if isinstance(parsed, dict):
+                return self._collect_facts(parsed, chunk), seconds
+            if attempt < max_retries:
+                self.format_stats.record(response_format, "retries")
+        
+        logger.error(f"Map step for {label} failed after {max_retries + 1} attempts")
+        return None, seconds
+    
+    def _collect_facts(
+        self,
+        parsed: Dict[str, Any],
+        chunk: Dict[str, Any]
+    ) -> Dict[str, List[Dict[str, Any]]]:
+        """
+        Keep well-formed facts for known sections from a map step response
+        
+        A fact citing a page outside its chunk (or none) is credited to
+        every page of the chunk.
+        """
+        chunk_range = list(range(chunk["start_page"], chunk["end_page"] + 1))
+        facts: Dict[str, List[Dict[str, Any]]] = {}
+        for name in SECTION_NAMES:
+            items = parsed.get(name)
+            if not isinstance(items, list):
+                continue
+            for item in items:
+                if isinstance(item, dict):
+                    text, page = item.get("fact"), item.get("page")
                 else:
-                    line = line_stripped + '"'
+                    text, page = item, None
+                if not isinstance(text, str) or not text.strip():
+                    continue
+                pages = [page] if isinstance(page, int) and page in chunk_range else chunk_range
+                facts.setdefault(name, []).append({"fact": text.strip(), "pages": pages})
+        return facts
+    
+    def _build_digest(
+        self,
+        facts: Dict[str, List[Dict[str, Any]]],
+        page_count: int
+    ) -> str:
+        """Reduce step input: every extracted fact, grouped by section with page references"""
+        lines = [
+            f"NOTES EXTRACTED FROM ALL {page_count} PAGES OF THE WHITEPAPER, "
+            f"grouped by report section. Page numbers are in brackets."
+        ]
+        for name in SECTION_NAMES:
+            if not facts.get(name):
+                continue
+            lines.append(f"\n## {name}")
+            seen = set()
+            for item in facts[name]:
+                key = item["fact"].lower()
+                if key in seen:
+                    continue
+                seen.add(key)
+                pages = item["pages"]
+                where = f"p. {pages[0]}" if len(pages) == 1 else f"pp. {pages[0]}-{pages[-1]}"
+                lines.append(f"- [{where}] {item['fact']}")
+        return "\n".join(lines)
+    
+    async def analyze_whitepaper_map_reduce_async(
+        self,
+        whitepaper_text: str,
+        pages: Optional[Sequence[str]] = None,
+        max_retries: int = 2,
+        timings: Optional[Dict[str, Any]] = None,
+        on_section: Optional[SectionCallback] = None,
+        coverage: Optional[Dict[str, Any]] = None,
+        fallbacks: Optional[List[str]] = None
+    ) -> AnalysisResult:
+        """
+        Analyze the whole whitepaper by map-reduce instead of truncating it
+        
+        The pages are grouped into chunks of ``chunk_chars`` characters. Map
+        steps, up to ``map_concurrency`` at once, pull the facts relevant to
+        each report section out of one chunk; a final reduce completion
+        writes the report from all of them. A chunk whose map step keeps
+        failing is left out (and listed in the coverage report) rather than
+        failing the analysis.
+        
+        Args:
+            whitepaper_text: Extracted whitepaper text, used as a single page
+                when ``pages`` is not given
+            pages: Text of each page
+            max_retries: Retries per map step and for the reduce step
+            timings: Optional dict receiving "map" (wall-clock), "map_sum"
+                (map steps back to back) and "reduce" seconds
+            on_section: Called with each section of the reduce step as soon
+                as it is complete and valid, when streaming is enabled
+            coverage: Optional dict receiving, per chunk, its pages, fact
+                count and time, the pages that fed each section, and the
+                non-empty pages no fact came from
+            fallbacks: Optional list receiving the names of sections that
+                hold the minimal structure
             
-            # Fix unescaped quotes in strings
-            if ':' in line and '"' in line:
-                # Split on colon to separate key from value
-                parts = line.split(':', 1)
-                if len(parts) == 2:
-                    key_part = parts[0]
-                    value_part = parts[1].strip()
-                    
-                    # If value starts and ends with quotes but has unescaped quotes inside
-                    if (value_part.startswith('"') and 
-                        value_part.rstrip(',').endswith('"') and 
-                        value_part.count('"') > 2):
-                        # Extract the content between quotes
-                        content = value_part[1:value_part.rstrip(',').rfind('"')]
-                        # Escape internal quotes
-                        content = content.replace('"', '\\"')
-                        # Reconstruct the line
-                        trailing_comma = ',' if value_part.rstrip().endswith(',') else ''
-                        line = f'{key_part}: "{content}"{trailing_comma}'
+        Returns:
+            AnalysisResult written from the facts of every chunk
             
-            fixed_lines.append(line)
+        Raises:
+            Exception: If no chunk yielded any facts
+        """
+        pages = list(pages) if pages else [whitepaper_text]
+        chunks = chunk_pages(pages, self.chunk_chars)
+        if not chunks:
+            raise Exception("Whitepaper has no text to analyze")
+        limit = asyncio.Semaphore(self.map_concurrency)
+        started = time.perf_counter()
+        logger.info(f"Mapping {len(pages)} pages as {len(chunks)} chunks...")
         
-        json_text = '\n'.join(fixed_lines)
+        results = await asyncio.gather(*(
+            self._map_chunk(chunk, len(pages), max_retries, limit) for chunk in chunks
+        ))
+        map_elapsed = time.perf_counter() - started
         
-        # Remove any remaining trailing commas
-        json_text = re.sub(r',(\s*[}\]])', r'\1', json_text)
+        facts: Dict[str, List[Dict[str, Any]]] = {}
+        chunk_report = []
+        for chunk, (chunk_facts, seconds) in zip(chunks, results):
+            chunk_report.append({
+                "pages": [chunk["start_page"], chunk["end_page"]],
+                "facts": sum(len(items) for items in (chunk_facts or {}).values()),
+                "seconds": round(seconds, 3),
+                "failed": chunk_facts is None,
+            })
+            for name, items in (chunk_facts or {}).items():
+                facts.setdefault(name, []).extend(items)
+        if not facts:
+            raise Exception(f"No facts could be extracted from any of {len(chunks)} chunks")
         
-        # Ensure the JSON ends properly
-        json_text = json_text.strip()
-        if not json_text.endswith('}') and json_text.startswith('{'):
-            # Count braces to see how many we need to close
-            open_braces = json_text.count('{')
-            close_braces = json_text.count('}')
-            missing_braces = open_braces - close_braces
-            
-            if missing_braces > 0:
-                json_text += '}' * missing_braces
+        section_pages = {
+            name: sorted({page for item in facts.get(name, []) for page in item["pages"]})
+            for name in SECTION_NAMES
+        }
+        cited = {page for covered in section_pages.values() for page in covered}
+        non_empty = [number for number, page_text in enumerate(pages, 1) if page_text and page_text.strip()]
+        if coverage is not None:
+            coverage["chunks"] = chunk_report
+            coverage["sections"] = section_pages
+            coverage["pages_without_facts"] = [page for page in non_empty if page not in cited]
         
-        return json_text
+        digest = self._build_digest(facts, len(pages))
+        logger.info(
+            f"Map step took {map_elapsed:.1f}s: {sum(c['facts'] for c in chunk_report)} facts "
+            f"from {len(cited)}/{len(non_empty)} pages, reducing {len(digest)} characters"
+        )
+        
+        reduce_started = time.perf_counter()
+        analysis_dict, _ = await self._request_sections_async(
+            digest, max_retries=max_retries, on_section=on_section, fallbacks=fallbacks
+        )
+        if timings is not None:
+            timings["map"] = round(map_elapsed, 3)
+            timings["map_sum"] = round(sum(c["seconds"] for c in chunk_report), 3)
+            timings["reduce"] = round(time.perf_counter() - reduce_started, 3)
+        
+        return self._build_result(analysis_dict)
+    
+    async def aclose(self) -> None:
+        """Close pooled HTTP connections held by the async client"""
+        await self.async_client.close()
     
     def _aggressive_json_repair(self, json_text: str) -> str:
         """More aggressive JSON repair for severely malformed JSON"""
@@ -663,15 +1514,14 @@ Your analysis will be used for investment decisions - be thorough, critical, and
         ]
         
         for field in score_fields:
-            print(f"DEBUG: Checking field {field}, current value: {oa.get(field)}, type: {type(oa.get(field))}")
             if field in oa:
                 # If it's a string or not a valid integer, set default score
                 current_value = oa[field]
                 if not isinstance(current_value, int) or current_value < 1 or current_value > 10:
-                    print(f"DEBUG: Setting {field} to 5")
+                    logger.debug(f"Score {field} is {current_value!r}, setting to 5")
                     oa[field] = 5  # Default middle score
             else:
-                print(f"DEBUG: Field {field} missing, setting to 5")
+                logger.debug(f"Score {field} missing, setting to 5")
                 oa[field] = 5  # Default if missing
         
         # Ensure recommendation is valid
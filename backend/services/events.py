@@ -0,0 +1,86 @@
+import asyncio
+import logging
+from typing import Any, Dict, Optional, Set
+
+logger = logging.getLogger(__name__)
+
+
+class EventBroker:
+    """
+    In-process pub/sub of task snapshots for streaming clients.
+
+    Each subscriber gets a small queue. Publishing to a task with no
+    subscribers costs nothing, so callers can check ``has_subscribers``
+    before building an event. Only the latest state of a task matters to a
+    watcher, so when a slow subscriber's queue is full its oldest snapshot
+    is dropped instead of blocking the publisher.
+
+    Subscribers only see updates made in this process; with several uvicorn
+    workers, streams also re-read the task store periodically.
+    """
+
+    def __init__(self, queue_size: int = 16):
+        self.queue_size = max(1, queue_size)
+        self._subscribers: Dict[str, Set[asyncio.Queue]] = {}
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._published = 0
+        self._delivered = 0
+        self._dropped = 0
+
+    def subscribe(self, task_id: str) -> asyncio.Queue:
+        """Register a subscriber for a task; must be called from the running loop"""
+        self._loop = asyncio.get_running_loop()
+        queue: asyncio.Queue = asyncio.Queue(maxsize=self.queue_size)
+        self._subscribers.setdefault(task_id, set()).add(queue)
+        return queue
+
+    def unsubscribe(self, task_id: str, queue: asyncio.Queue) -> None:
+        subscribers = self._subscribers.get(task_id)
+        if subscribers is None:
+            return
+        subscribers.discard(queue)
+        if not subscribers:
+            del self._subscribers[task_id]
+
+    def has_subscribers(self, task_id: str) -> bool:
+        return task_id in self._subscribers
+
+    def publish(self, task_id: str, snapshot: Optional[Dict[str, Any]]) -> None:
+        """
+        Deliver a task snapshot to every subscriber of the task
+
+        Safe to call from worker threads; delivery then happens on the loop.
+
+        Args:
+            task_id: Task the snapshot belongs to
+            snapshot: Task record, or None if the task was deleted
+        """
+        if self._loop is None or task_id not in self._subscribers:
+            return
+        try:
+            on_loop = asyncio.get_running_loop() is self._loop
+        except RuntimeError:
+            on_loop = False
+        if on_loop:
+            self._deliver(task_id, snapshot)
+        else:
+            self._loop.call_soon_threadsafe(self._deliver, task_id, snapshot)
+
+    def _deliver(self, task_id: str, snapshot: Optional[Dict[str, Any]]) -> None:
+        self._published += 1
+        for queue in self._subscribers.get(task_id, ()):
+            if queue.full():
+                queue.get_nowait()
+                self._dropped += 1
+            queue.put_nowait(snapshot)
+            self._delivered += 1
+
+    def stats(self) -> Dict[str, int]:
+        """Open subscriptions and delivery counters"""
+        return {
+            "tasks_watched": len(self._subscribers),
+            "subscribers": sum(len(queues) for queues in self._subscribers.values()),
+            "published": self._published,
+            "delivered": self._delivered,
+            "dropped": self._dropped,
+        }
@@ -0,0 +1,174 @@
+import asyncio
+import functools
+import logging
+from contextlib import asynccontextmanager
+from concurrent.futures import Executor, ThreadPoolExecutor, ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import Any, AsyncIterator, Callable, Optional
+
+logger = logging.getLogger(__name__)
+
+
+class ExecutionLayer:
+    """
+    Runs blocking work off the event loop.
+
+    CPU-bound work (PDF parsing) goes to a process pool so it neither blocks
+    the loop nor contends for the GIL; blocking I/O (synchronous HTTP clients)
+    goes to a thread pool. Setting ``cpu_workers`` to 0 routes CPU work to the
+    thread pool instead, which is useful on hosts where forking is undesirable.
+    """
+
+    def __init__(self, io_workers: int = 32, cpu_workers: int = 2):
+        self.io_workers = max(1, io_workers)
+        self.cpu_workers = max(0, cpu_workers)
+        self._thread_pool: Optional[ThreadPoolExecutor] = None
+        self._process_pool: Optional[ProcessPoolExecutor] = None
+        self.pool_recycles = 0
+
+    @property
+    def thread_pool(self) -> ThreadPoolExecutor:
+        """Thread pool for blocking I/O, created on first use"""
+        if self._thread_pool is None:
+            self._thread_pool = ThreadPoolExecutor(
+                max_workers=self.io_workers,
+                thread_name_prefix="io-worker"
+            )
+        return self._thread_pool
+
+    @property
+    def cpu_pool(self) -> Executor:
+        """Executor for CPU-bound work, created on first use"""
+        if self.cpu_workers == 0:
+            return self.thread_pool
+        if self._process_pool is None:
+            self._process_pool = ProcessPoolExecutor(max_workers=self.cpu_workers)
+        return self._process_pool
+
+    async def run_io(self, func: Callable[..., Any], *args, **kwargs) -> Any:
+        """
+        Run a blocking I/O-bound callable in the thread pool
+
+        Args:
+            func: Callable to run
+            *args, **kwargs: Arguments forwarded to the callable
+
+        Returns:
+            The callable's return value
+        """
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(
+            self.thread_pool, functools.partial(func, *args, **kwargs)
+        )
+
+    async def run_cpu(self, func: Callable[..., Any], *args, **kwargs) -> Any:
+        """
+        Run a CPU-bound callable in the process pool
+
+        The callable and its arguments must be picklable (module-level
+        functions or static/class methods, plain data arguments).
+
+        If the caller is cancelled while the callable is already running in
+        a worker process, the process pool is recycled: its processes are
+        terminated and a new pool is started. Only the cancelled caller's
+        work is dropped; jobs of other callers that were queued or running
+        in the old pool fail with BrokenProcessPool and are resubmitted to
+        the new one.
+
+        Args:
+            func: Callable to run
+            *args, **kwargs: Arguments forwarded to the callable
+
+        Returns:
+            The callable's return value
+        """
+        call = functools.partial(func, *args, **kwargs)
+        while True:
+            pool = self.cpu_pool
+            future = pool.submit(call)
+            try:
+                return await asyncio.wrap_future(future)
+            except asyncio.CancelledError:
+                # Work still waiting in the pool is simply dropped; work already
+                # handed to a worker process can only be stopped with it
+                if isinstance(pool, ProcessPoolExecutor) and not future.cancel() and not future.done():
+                    self.recycle_process_pool(pool)
+                raise
+            except BrokenProcessPool:
+                # A pool that is still current broke on its own (e.g. a worker
+                # was killed by the OS); one that was recycled is retried
+                if pool is self._process_pool:
+                    raise
+                logger.warning("Process pool was recycled while this job was pending, resubmitting")
+
+    def recycle_process_pool(self, pool: ProcessPoolExecutor) -> None:
+        """
+        Terminate a process pool's workers; the next CPU job starts a new pool
+
+        Pending futures are not cancelled: the pool marks them broken once
+        its workers are gone, and ``run_cpu`` resubmits them.
+        """
+        if self._process_pool is pool:
+            self._process_pool = None
+        self.pool_recycles += 1
+        for process in list((getattr(pool, "_processes", None) or {}).values()):
+            process.terminate()
+        pool.shutdown(wait=False)
+        logger.info("Terminated CPU worker processes of a cancelled job")
+
+    def stats(self) -> dict:
+        """Pool configuration for health reporting"""
+        return {
+            "io_workers": self.io_workers,
+            "cpu_workers": self.cpu_workers,
+            "cpu_mode": "process" if self.cpu_workers else "thread",
+            "pool_recycles": self.pool_recycles,
+        }
+
+    def shutdown(self, wait: bool = True) -> None:
+        """Shut down both pools, cancelling work that has not started"""
+        if self._process_pool is not None:
+            self._process_pool.shutdown(wait=wait, cancel_futures=True)
+            self._process_pool = None
+        if self._thread_pool is not None:
+            self._thread_pool.shutdown(wait=wait, cancel_futures=True)
+            self._thread_pool = None
+        logger.info("Execution pools shut down")
+
+
+class CompletionGovernor:
+    """
+    Caps the number of in-flight LLM completions in this process.
+
+    Callers wait on an asyncio semaphore rather than a thread, so dozens of
+    analyses can queue for a slot at the cost of a suspended coroutine each.
+    """
+
+    def __init__(self, max_in_flight: int = 8):
+        self.capacity = max(1, max_in_flight)
+        self._semaphore = asyncio.Semaphore(self.capacity)
+        self.in_flight = 0
+        self.waiting = 0
+
+    @asynccontextmanager
+    async def slot(self) -> AsyncIterator[None]:
+        """Hold one completion slot for the duration of the block"""
+        self.waiting += 1
+        try:
+            await self._semaphore.acquire()
+        finally:
+            self.waiting -= 1
+        self.in_flight += 1
+        try:
+            yield
+        finally:
+            self.in_flight -= 1
+            self._semaphore.release()
+
+    def stats(self) -> dict:
+        """Current slot usage for health reporting"""
+        return {
+            "capacity": self.capacity,
+            "in_flight": self.in_flight,
+            "waiting": self.waiting,
+        }
@@ -0,0 +1,215 @@
+import hashlib
+import logging
+import zipfile
+from pathlib import Path, PurePosixPath
+from typing import Any, Callable, Dict, List, Optional, Protocol, Tuple
+
+import aiofiles
+from starlette.exceptions import HTTPException
+from starlette.responses import JSONResponse
+
+logger = logging.getLogger(__name__)
+
+UPLOAD_CHUNK_SIZE = 1024 * 1024
+# Room for multipart boundaries and part headers on top of the file itself
+MULTIPART_OVERHEAD = 64 * 1024
+
+
+class AsyncReadable(Protocol):
+    async def read(self, size: int = -1) -> bytes: ...
+
+
+class FileTooLargeError(Exception):
+    """Raised when an upload crosses the size limit while being written"""
+
+    def __init__(self, max_bytes: int, size_bytes: Optional[int] = None):
+        self.max_bytes = max_bytes
+        self.size_bytes = size_bytes
+        max_mb = max_bytes / (1024 * 1024)
+        if size_bytes is not None:
+            message = (
+                f"File size ({size_bytes / (1024 * 1024):.2f}MB) exceeds maximum "
+                f"allowed size ({max_mb:g}MB)"
+            )
+        else:
+            message = f"File exceeds maximum allowed size ({max_mb:g}MB)"
+        super().__init__(message)
+
+
+async def stream_to_disk(
+    source: AsyncReadable,
+    dest: Path,
+    max_bytes: int,
+    chunk_size: int = UPLOAD_CHUNK_SIZE
+) -> Tuple[int, str]:
+    """
+    Copy an async byte stream to disk in chunks, hashing it on the way
+
+    Only one chunk is held in memory at a time. The copy stops as soon as the
+    size limit is crossed and the partial file is removed.
+
+    Args:
+        source: Object with an async ``read(size)`` method (e.g. UploadFile)
+        dest: Destination path
+        max_bytes: Maximum number of bytes accepted
+        chunk_size: Bytes read per iteration
+
+    Returns:
+        Tuple of (size_bytes, sha256_hex)
+
+    Raises:
+        FileTooLargeError: If the stream is larger than max_bytes
+    """
+    digest = hashlib.sha256()
+    size = 0
+    try:
+        async with aiofiles.open(dest, "wb") as out:
+            while True:
+                chunk = await source.read(chunk_size)
+                if not chunk:
+                    break
+                size += len(chunk)
+                if size > max_bytes:
+                    raise FileTooLargeError(max_bytes)
+                digest.update(chunk)
+                await out.write(chunk)
+    except BaseException:
+        Path(dest).unlink(missing_ok=True)
+        raise
+    return size, digest.hexdigest()
+
+
+class RequestBodyLimit:
+    """
+    ASGI middleware capping the request body size of upload endpoints.
+
+    Starlette spools a multipart body to disk before the endpoint runs, so
+    checking the file size inside the endpoint only happens after the whole
+    body was received. This middleware answers a declared Content-Length
+    over the limit with 413 before reading any of the body, and cuts off a
+    body without one (chunked transfer) as soon as it crosses the limit.
+    """
+
+    def __init__(self, app, limits: Dict[str, int]):
+        """
+        Args:
+            app: ASGI application to wrap
+            limits: Maximum body bytes by request path
+        """
+        self.app = app
+        self.limits = limits
+
+    async def __call__(self, scope, receive, send):
+        limit = self.limits.get(scope.get("path")) if scope["type"] == "http" else None
+        if limit is None:
+            await self.app(scope, receive, send)
+            return
+
+        detail = f"Request body exceeds the maximum allowed size ({limit / (1024 * 1024):.0f}MB)"
+        declared = dict(scope.get("headers") or []).get(b"content-length")
+        if declared is not None and declared.isdigit() and int(declared) > limit:
+            logger.info(f"Rejected {scope['path']} request of {int(declared)} bytes before reading it")
+            await JSONResponse({"detail": detail}, status_code=413)(scope, receive, send)
+            return
+
+        received = 0
+
+        async def limited_receive():
+            nonlocal received
+            message = await receive()
+            if message["type"] == "http.request":
+                received += len(message.get("body", b""))
+                if received > limit:
+                    logger.info(f"Cut off {scope['path']} request body at {received} bytes")
+                    raise HTTPException(status_code=413, detail=detail)
+            return message
+
+        await self.app(scope, limited_receive, send)
+
+
+def _member_filename(name: str) -> str:
+    """Base name of an archive member, ignoring the directories it sits in"""
+    return PurePosixPath(name.replace("\\", "/")).name
+
+
+def extract_zip_pdfs(
+    archive_path: Path,
+    dest_for: Callable[[str], Path],
+    max_member_bytes: int,
+    max_members: int,
+    chunk_size: int = UPLOAD_CHUNK_SIZE
+) -> List[Dict[str, Any]]:
+    """
+    Copy the PDF members of a ZIP archive to disk, one chunk at a time
+
+    Members are decompressed straight into their destination file and hashed
+    on the way, so neither the archive nor a member is ever held in memory.
+    The size limit is checked against the bytes actually decompressed, not
+    the size the archive claims. Blocking; run it in a worker thread.
+
+    Args:
+        archive_path: ZIP file on disk
+        dest_for: Returns the destination path for a member's file name
+        max_member_bytes: Maximum decompressed size of one PDF
+        max_members: Maximum number of PDFs accepted; later ones are rejected
+        chunk_size: Bytes decompressed per iteration
+
+    Returns:
+        One dict per PDF member, in archive order: filename, path,
+        size_bytes and sha256 for extracted files, or filename and error
+        for rejected ones. Directories, macOS metadata and other non-PDF
+        members are skipped.
+
+    Raises:
+        zipfile.BadZipFile: If the file is not a readable ZIP archive
+    """
+    entries: List[Dict[str, Any]] = []
+    accepted = 0
+    with zipfile.ZipFile(archive_path) as archive:
+        for info in archive.infolist():
+            filename = _member_filename(info.filename)
+            if (
+                info.is_dir()
+                or info.filename.startswith("__MACOSX/")
+                or filename.startswith(".")
+                or not filename.lower().endswith(".pdf")
+            ):
+                continue
+            if accepted >= max_members:
+                entries.append({"filename": filename, "error": f"Batch is limited to {max_members} files"})
+                continue
+            if info.flag_bits & 0x1:
+                entries.append({"filename": filename, "error": "Encrypted archive members are not supported"})
+                continue
+            if info.file_size > max_member_bytes:
+                entries.append({"filename": filename, "error": str(FileTooLargeError(max_member_bytes, info.file_size))})
+                continue
+
+            dest = dest_for(filename)
+            digest = hashlib.sha256()
+            size = 0
+            try:
+                with archive.open(info) as source, open(dest, "wb") as out:
+                    while True:
+                        chunk = source.read(chunk_size)
+                        if not chunk:
+                            break
+                        size += len(chunk)
+                        if size > max_member_bytes:
+                            raise FileTooLargeError(max_member_bytes)
+                        digest.update(chunk)
+                        out.write(chunk)
+            except Exception as e:
+                Path(dest).unlink(missing_ok=True)
+                logger.warning(f"Rejected archive member {info.filename}: {str(e)}")
+                entries.append({"filename": filename, "error": str(e)})
+                continue
+            accepted += 1
+            entries.append({
+                "filename": filename,
+                "path": dest,
+                "size_bytes": size,
+                "sha256": digest.hexdigest(),
+            })
+    logger.info(f"Extracted {accepted} PDFs from {archive_path}")
+    return entries
@@ -0,0 +1,233 @@
+import asyncio
+import heapq
+import itertools
+import logging
+import math
+import time
+from collections import deque
+from typing import Awaitable, Callable, Dict, List, Optional
+
+from models.schemas import JobPriority
+
+logger = logging.getLogger(__name__)
+
+# Lower rank is served first
+PRIORITY_RANK = {
+    JobPriority.HIGH: 0,
+    JobPriority.NORMAL: 1,
+    JobPriority.LOW: 2,
+}
+
+# Assumed job duration until enough jobs have finished to measure drain rate
+DEFAULT_JOB_SECONDS = 120.0
+
+
+class QueueFullError(Exception):
+    """Raised when a job is submitted to a queue that is at capacity"""
+
+    def __init__(self, retry_after: int):
+        super().__init__(f"Job queue is full, retry after {retry_after}s")
+        self.retry_after = retry_after
+
+
+class JobQueue:
+    """
+    Bounded priority queue drained by a fixed number of worker coroutines.
+
+    Jobs are identified by task_id. At most ``max_depth`` jobs wait in the
+    queue; submitting beyond that raises QueueFullError with a Retry-After
+    estimate derived from the observed drain rate. Within a priority class
+    jobs run in submission order.
+    """
+
+    def __init__(self, max_depth: int = 100, workers: int = 8):
+        self.max_depth = max(1, max_depth)
+        self.workers = max(1, workers)
+        self._heap: List[list] = []
+        self._entries: Dict[str, list] = {}
+        self._counter = itertools.count()
+        self._available: Optional[asyncio.Semaphore] = None
+        self._running: Dict[str, float] = {}
+        self._jobs: Dict[str, asyncio.Task] = {}
+        self._completions: deque = deque(maxlen=50)
+        self._worker_tasks: List[asyncio.Task] = []
+        self._handler: Optional[Callable[[str], Awaitable[None]]] = None
+
+    def start(self, handler: Callable[[str], Awaitable[None]]) -> None:
+        """Start the worker coroutines; must be called from the running loop"""
+        self._handler = handler
+        self._available = asyncio.Semaphore(len(self._heap))
+        self._worker_tasks = [
+            asyncio.create_task(self._worker(index)) for index in range(self.workers)
+        ]
+        logger.info(f"Job queue started: {self.workers} workers, depth {self.max_depth}")
+
+    async def stop(self) -> None:
+        """Cancel the worker coroutines"""
+        for task in self._worker_tasks:
+            task.cancel()
+        await asyncio.gather(*self._worker_tasks, return_exceptions=True)
+        self._worker_tasks = []
+
+    @property
+    def depth(self) -> int:
+        """Number of jobs waiting to run"""
+        return len(self._entries)
+
+    def has_capacity(self, jobs: int = 1) -> bool:
+        """Whether ``jobs`` more jobs can be admitted right now"""
+        return self.depth + jobs <= self.max_depth
+
+    def submit(self, job_id: str, priority: JobPriority = JobPriority.NORMAL) -> int:
+        """
+        Enqueue a job
+
+        Args:
+            job_id: Task identifier passed to the handler
+            priority: Priority class of the job
+
+        Returns:
+            1-based queue position of the job
+
+        Raises:
+            QueueFullError: If the queue is at capacity
+        """
+        if job_id in self._entries or job_id in self._running:
+            return self.position(job_id) or 0
+        if not self.has_capacity():
+            raise QueueFullError(self.retry_after())
+        entry = [PRIORITY_RANK[JobPriority(priority)], next(self._counter), job_id]
+        heapq.heappush(self._heap, entry)
+        self._entries[job_id] = entry
+        if self._available is not None:
+            self._available.release()
+        return self.position(job_id)
+
+    def promote(self, job_id: str, priority: JobPriority) -> bool:
+        """
+        Move a waiting job up to ``priority`` if that is higher than its own
+
+        The job keeps its submission order within the new priority class.
+
+        Returns:
+            True if the job was moved
+        """
+        entry = self._entries.get(job_id)
+        rank = PRIORITY_RANK[JobPriority(priority)]
+        if entry is None or rank >= entry[0]:
+            return False
+        # The old entry is left in the heap and skipped when popped
+        entry[2] = None
+        promoted = [rank, entry[1], job_id]
+        heapq.heappush(self._heap, promoted)
+        self._entries[job_id] = promoted
+        if self._available is not None:
+            self._available.release()
+        return True
+
+    def position(self, job_id: str) -> Optional[int]:
+        """1-based position among waiting jobs, or None if the job is not queued"""
+        entry = self._entries.get(job_id)
+        if entry is None:
+            return None
+        key = (entry[0], entry[1])
+        return 1 + sum(1 for other in self._entries.values() if (other[0], other[1]) < key)
+
+    def is_running(self, job_id: str) -> bool:
+        return job_id in self._running
+
+    def cancel(self, job_id: str) -> bool:
+        """
+        Remove a waiting job, or cancel a running one
+
+        A running job's handler is cancelled at its current await, so
+        ``finally`` blocks and context managers inside it unwind as usual.
+
+        Args:
+            job_id: Task identifier of the job
+
+        Returns:
+            False if the job is neither waiting nor running
+        """
+        entry = self._entries.pop(job_id, None)
+        if entry is not None:
+            # Left in the heap and skipped when popped
+            entry[2] = None
+            logger.info(f"Removed job {job_id} from the queue")
+            return True
+        job = self._jobs.get(job_id)
+        if job is None:
+            return False
+        job.cancel()
+        logger.info(f"Cancelled running job {job_id}")
+        return True
+
+    async def wait_stopped(self, job_id: str, timeout: float) -> bool:
+        """Wait up to ``timeout`` seconds for a running job to finish; True if it has"""
+        job = self._jobs.get(job_id)
+        if job is None:
+            return True
+        done, _ = await asyncio.wait([job], timeout=timeout)
+        return bool(done)
+
+    def drain_rate(self) -> Optional[float]:
+        """Completed jobs per second over the recent window, if measurable"""
+        if len(self._completions) < 2:
+            return None
+        window = self._completions[-1] - self._completions[0]
+        if window <= 0:
+            return None
+        return (len(self._completions) - 1) / window
+
+    def retry_after(self) -> int:
+        """Seconds until a queue slot is expected to free up"""
+        rate = self.drain_rate()
+        if rate:
+            seconds = 1 / rate
+        else:
+            seconds = DEFAULT_JOB_SECONDS / self.workers
+        return max(1, min(3600, math.ceil(seconds)))
+
+    def stats(self) -> dict:
+        """Queue state for health reporting"""
+        rate = self.drain_rate()
+        return {
+            "depth": self.depth,
+            "max_depth": self.max_depth,
+            "running": len(self._running),
+            "workers": self.workers,
+            "drain_rate_per_min": round(rate * 60, 2) if rate else None,
+        }
+
+    async def _next(self) -> str:
+        while True:
+            await self._available.acquire()
+            entry = heapq.heappop(self._heap)
+            job_id = entry[2]
+            if job_id is not None:
+                del self._entries[job_id]
+                return job_id
+
+    async def _worker(self, index: int) -> None:
+        while True:
+            job_id = await self._next()
+            self._running[job_id] = time.monotonic()
+            # The handler runs as its own task so cancel() can stop one job
+            # without stopping the worker
+            job = asyncio.create_task(self._handler(job_id))
+            self._jobs[job_id] = job
+            try:
+                await asyncio.wait([job])
+                if job.cancelled():
+                    logger.info(f"Job {job_id} cancelled in worker {index}")
+                else:
+                    # Only jobs that ran to the end count towards the drain rate
+                    self._completions.append(time.monotonic())
+                    if job.exception() is not None:
+                        logger.error(f"Job {job_id} failed in worker {index}: {str(job.exception())}")
+            except asyncio.CancelledError:
+                job.cancel()
+                raise
+            finally:
+                self._jobs.pop(job_id, None)
+                self._running.pop(job_id, None)
@@ -0,0 +1,273 @@
+import json
+import logging
+import re
+from typing import Any, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+_STRUCTURAL = re.compile(r'[{}\[\],:"]')
+# Rest of a string literal after its opening quote
+_STRING_BODY = re.compile(r'(?:[^"\\]|\\.)*"', re.DOTALL)
+# Escape sequence cut off at the end of a truncated string
+_PARTIAL_ESCAPE = re.compile(r'(?<!\\)((?:\\\\)*)\\(?:u[0-9a-fA-F]{0,3})?$')
+_LITERAL = re.compile(r'-?\d+(?:\.\d+)?(?:[eE][+-]?\d+)?|true|false|null')
+_TOOL_CALL_OPEN = "<tool_call>"
+_TOOL_CALL_CLOSE = "</tool_call>"
+
+
+def _find_object_start(text: str) -> int:
+    """Index of the first '{' outside <tool_call> blocks, or -1"""
+    pos = 0
+    while True:
+        brace = text.find("{", pos)
+        tag = text.find(_TOOL_CALL_OPEN, pos)
+        if brace < 0 or tag < 0 or brace < tag:
+            return brace
+        # An unterminated tool call runs to the end of the response
+        end = text.find(_TOOL_CALL_CLOSE, tag)
+        if end < 0:
+            return -1
+        pos = end + len(_TOOL_CALL_CLOSE)
+
+
+def extract_json_object(text: str) -> Tuple[str, bool]:
+    """
+    Locate and repair the outermost JSON object of a model response in one pass
+
+    Text around the object (prose, code fences, <tool_call> blocks before it)
+    is dropped. Inside the object, string literals are skipped as a whole so
+    braces and commas in them are never miscounted. Trailing commas are
+    removed, mismatched closers are corrected, and a truncated response is
+    completed: an open string is closed, a dangling key is dropped, a key
+    left without a value gets null, and open objects and arrays are closed.
+
+    Args:
+        text: Raw model response
+
+    Returns:
+        Tuple of (json_text, repaired). json_text is empty if the response
+        contains no object; repaired is True if anything inside the object
+        had to be changed.
+    """
+    start = _find_object_start(text)
+    if start < 0:
+        return "", False
+
+    out: List[str] = []
+    stack: List[str] = []
+    repaired = False
+    pending_comma = False
+    expect_key = False
+    awaiting_value = False
+    key_mark = -1          # output length before a key still waiting for its colon
+    pos = start
+    tail = ""
+
+    while True:
+        match = _STRUCTURAL.search(text, pos)
+        if match is None:
+            tail = text[pos:]
+            break
+        index = match.start()
+        char = text[index]
+        between = text[pos:index]
+        mark = len(out)
+        bare = between.strip()
+
+        if pending_comma:
+            if bare or char not in "}]":
+                out.append(",")
+            else:
+                repaired = True
+            pending_comma = False
+        out.append(between)
+        if bare:
+            awaiting_value = False
+        pos = index + 1
+
+        if char == '"':
+            body = _STRING_BODY.match(text, pos)
+            if expect_key and stack and stack[-1] == "{":
+                key_mark = mark
+                expect_key = False
+            else:
+                awaiting_value = False
+            if body is None:
+                # Truncated inside a string: drop a half-written escape, then close it
+                out.append(_PARTIAL_ESCAPE.sub(r"\1", text[index:]))
+                out.append('"')
+                pos = len(text)
+                break
+            out.append(text[index:body.end()])
+            pos = body.end()
+        elif char == ":":
+            out.append(":")
+            key_mark = -1
+            awaiting_value = True
+        elif char in "{[":
+            out.append(char)
+            stack.append(char)
+            expect_key = char == "{"
+            awaiting_value = False
+        elif char in "}]":
+            opener = "{" if char == "}" else "["
+            if opener not in stack:
+                repaired = True
+                continue
+            while stack[-1] != opener:
+                out.append("}" if stack.pop() == "{" else "]")
+                repaired = True
+            stack.pop()
+            out.append(char)
+            expect_key = False
+            if not stack:
+                return "".join(out), repaired
+        else:  # ","
+            pending_comma = True
+            expect_key = bool(stack) and stack[-1] == "{"
+
+    # The response ended before the outermost object closed
+    repaired = True
+    bare = tail.strip()
+    if bare and _LITERAL.fullmatch(bare):
+        if pending_comma:
+            out.append(",")
+        out.append(bare)
+        awaiting_value = False
+    if key_mark >= 0:
+        # A key with no colon: drop it (and the comma before it)
+        del out[key_mark:]
+    elif awaiting_value:
+        out.append("null")
+    for opener in reversed(stack):
+        out.append("}" if opener == "{" else "]")
+    return "".join(out), repaired
+
+
+class SectionStreamParser:
+    """
+    Incremental scanner over a streamed JSON object.
+
+    Text is fed chunk by chunk as it arrives from the provider. Every
+    top-level member of the outermost object is decoded and returned as soon
+    as its value closes, so ``{"a": {...}, "b": {...}}`` yields ``a`` while
+    ``b`` is still being generated. Each character is scanned once; quotes
+    and escapes are tracked so braces inside strings are ignored. Anything
+    before the first ``{`` (code fences, stray prose) is skipped.
+    """
+
+    def __init__(self):
+        self._chunks: List[str] = []
+        self._depth = 0
+        self._in_string = False
+        self._escape = False
+        self._started = False
+        self._done = False
+        # Top-level member being scanned; only the key or value currently
+        # being read is kept, as the pieces of it seen so far
+        self._expect_key = False
+        self._key: Optional[str] = None
+        self._in_key = False
+        self._in_value = False
+        self._captured: List[str] = []
+
+    @property
+    def text(self) -> str:
+        """Everything fed so far"""
+        if len(self._chunks) > 1:
+            self._chunks = ["".join(self._chunks)]
+        return self._chunks[0] if self._chunks else ""
+
+    @property
+    def done(self) -> bool:
+        """Whether the outermost object has closed"""
+        return self._done
+
+    def feed(self, chunk: str) -> List[Tuple[str, Any]]:
+        """
+        Scan the next chunk of the response
+
+        Only the new chunk is scanned, so feeding a response costs time
+        linear in its length however finely it is split.
+
+        Args:
+            chunk: Newly received text
+
+        Returns:
+            (key, value) pairs for top-level members completed by this chunk.
+            Members whose value is not valid JSON are skipped.
+        """
+        self._chunks.append(chunk)
+        completed: List[Tuple[str, Any]] = []
+        # Where the key or value being read starts within this chunk
+        start = 0
+        for index, char in enumerate(chunk):
+            if self._done:
+                break
+            if self._in_string:
+                if self._escape:
+                    self._escape = False
+                elif char == "\\":
+                    self._escape = True
+                elif char == '"':
+                    self._in_string = False
+                    if self._in_key:
+                        self._key = self._take(chunk, start, index)
+                        self._in_key = False
+                continue
+            if not self._started:
+                if char == "{":
+                    self._started = True
+                    self._depth = 1
+                    self._expect_key = True
+                continue
+            if char == '"':
+                self._in_string = True
+                if self._depth == 1 and self._expect_key:
+                    self._in_key = True
+                    self._expect_key = False
+                    start = index + 1
+                elif self._depth == 1 and not self._in_value and self._key is not None:
+                    self._in_value = True
+                    start = index
+            elif char in "{[":
+                if self._depth == 1 and not self._in_value and self._key is not None:
+                    self._in_value = True
+                    start = index
+                self._depth += 1
+            elif char in "}]":
+                self._depth -= 1
+                if self._depth == 1 and self._in_value:
+                    self._emit(self._take(chunk, start, index + 1), completed)
+                elif self._depth == 0:
+                    # Closing the outermost object also ends a scalar last member
+                    if self._in_value:
+                        self._emit(self._take(chunk, start, index), completed)
+                    self._done = True
+            elif self._depth == 1:
+                if char == ",":
+                    if self._in_value:
+                        self._emit(self._take(chunk, start, index), completed)
+                    self._expect_key = True
+                elif char == ":":
+                    continue
+                elif not char.isspace() and not self._in_value and self._key is not None:
+                    self._in_value = True
+                    start = index
+        if self._in_key or self._in_value:
+            self._captured.append(chunk[start:])
+        return completed
+
+    def _take(self, chunk: str, start: int, end: int) -> str:
+        """Text of the key or value being read, which ends at ``end`` in ``chunk``"""
+        self._captured.append(chunk[start:end])
+        raw = "".join(self._captured)
+        self._captured = []
+        return raw
+
+    def _emit(self, raw: str, completed: List[Tuple[str, Any]]) -> None:
+        key, self._key, self._in_value = self._key, None, False
+        try:
+            completed.append((key, json.loads(raw)))
+        except json.JSONDecodeError as e:
+            logger.warning(f"Streamed member {key!r} is not valid JSON: {str(e)}")
@@ -0,0 +1,127 @@
+import heapq
+import logging
+import math
+import re
+from collections import Counter
+from typing import Any, Dict, Iterable, List, Sequence, Tuple
+
+from services.chunking import split_text
+
+logger = logging.getLogger(__name__)
+
+# Characters per indexed passage; pages longer than this are split
+PASSAGE_CHARS = 1500
+
+# Latin words and numbers, or single CJK characters
+_TERM = re.compile(r"[a-z0-9]+|[\u3400-\u4dbf\u4e00-\u9fff]")
+_STOPWORDS = frozenset(
+    "a an and are as at be by for from has have in is it its of on or that the this "
+    "to was were will with which we our their they can also".split()
+)
+
+
+def _stem(word: str) -> str:
+    """Fold common plural forms so "milestones" matches "milestone" """
+    if len(word) > 4 and word.endswith("ies"):
+        return word[:-3] + "y"
+    if len(word) > 3 and word.endswith("s") and not word.endswith("ss"):
+        return word[:-1]
+    return word
+
+
+def tokenize(text: str) -> List[str]:
+    """Lowercased, stemmed index terms of text, stopwords removed"""
+    return [_stem(term) for term in _TERM.findall(text.lower()) if term not in _STOPWORDS]
+
+
+class PassageIndex:
+    """
+    In-memory BM25 index over the passages of one document.
+
+    Passages are page text split on paragraph boundaries, so every hit
+    carries its page number. The index is an inverted list of
+    (passage, term frequency) per term; a query only touches the postings
+    of its own terms.
+    """
+
+    def __init__(self, passages: Sequence[Dict[str, Any]], k1: float = 1.5, b: float = 0.75):
+        """
+        Args:
+            passages: Dicts with page and text, in document order
+            k1: Term frequency saturation
+            b: Passage length normalization
+        """
+        self.passages = list(passages)
+        self.k1 = k1
+        self.b = b
+        self._postings: Dict[str, List[Tuple[int, int]]] = {}
+        self._lengths: List[int] = []
+        for position, passage in enumerate(self.passages):
+            terms = tokenize(passage["text"])
+            self._lengths.append(len(terms))
+            for term, frequency in Counter(terms).items():
+                self._postings.setdefault(term, []).append((position, frequency))
+        self._average_length = (sum(self._lengths) / len(self._lengths)) if self._lengths else 0.0
+
+    @classmethod
+    def from_pages(cls, pages: Sequence[str], passage_chars: int = PASSAGE_CHARS) -> "PassageIndex":
+        """Index page texts (page numbers start at 1), skipping empty pages"""
+        passages = [
+            {"page": number, "text": piece}
+            for number, page_text in enumerate(pages, 1)
+            if page_text and page_text.strip()
+            for piece in split_text(page_text.strip(), passage_chars)
+        ]
+        return cls(passages)
+
+    def search(self, query: Iterable[str], k: int) -> List[Tuple[float, int]]:
+        """
+        Top passages for a query
+
+        Args:
+            query: Query terms (tokenized like the passages)
+            k: Number of passages to return
+
+        Returns:
+            (score, passage position) pairs, best first; passages matching
+            no query term are never returned
+        """
+        count = len(self.passages)
+        scores: Dict[int, float] = {}
+        for term in set(tokenize(" ".join(query))):
+            postings = self._postings.get(term)
+            if not postings:
+                continue
+            idf = math.log(1 + (count - len(postings) + 0.5) / (len(postings) + 0.5))
+            for position, frequency in postings:
+                norm = self.k1 * (1 - self.b + self.b * self._lengths[position] / self._average_length)
+                scores[position] = scores.get(position, 0.0) + idf * frequency * (self.k1 + 1) / (frequency + norm)
+        return heapq.nlargest(k, ((score, position) for position, score in scores.items()))
+
+    def stats(self) -> Dict[str, int]:
+        return {"passages": len(self.passages), "terms": len(self._postings)}
+
+
+# Field name words that say nothing about where in a whitepaper to look
+_GENERIC_FIELD_TERMS = frozenset(
+    "overview details score justification data axis x y nodes connections plots is why "
+    "optimal reasoning current overall level primary direct past future critical path "
+    "name evidence analysis".split()
+)
+
+
+def section_query(name: str, fields: Sequence[str]) -> List[str]:
+    """
+    Query terms for a report section, derived from its schema field names
+
+    ``tokenomics`` with fields ``total_supply``, ``distribution`` and
+    ``inflation_mechanism`` becomes tokenomics, total, supply, distribution,
+    inflation, mechanism; words that fit any section (score, overview,
+    details...) are dropped.
+    """
+    words = []
+    for part in [name, *fields]:
+        for word in part.split("_"):
+            if word not in _GENERIC_FIELD_TERMS and word not in words:
+                words.append(word)
+    return words
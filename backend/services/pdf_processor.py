@@ -1,11 +1,350 @@
+import io
+import time
 import PyPDF2
 import pdfplumber
 from pathlib import Path
-from typing import Optional
+from typing import Optional, Dict, Any, Iterator, List, Tuple
 import logging
 
+from services.text_normalizer import normalize_pages
+
 logger = logging.getLogger(__name__)
 
+# Quality thresholds for PyPDF2 page text; pages failing any of them are
+# re-extracted with pdfplumber
+MIN_CHARS_PER_KILO_POINT = 0.25   # non-space characters per 1000 pt² of page area
+MAX_AVG_WORD_LENGTH = 10          # prose averages 5-7; longer means words ran together
+MAX_SINGLE_CHAR_WORD_RATIO = 0.5  # higher means letters were spaced apart
+MIN_WORDS_FOR_SPACING_CHECK = 20
+
+# Extra text read under a character budget when it will be normalized, since
+# stripping headers, footers and page numbers removes 10-20% of it
+NORMALIZE_HEADROOM = 1.25
+
+# Bump when extraction output changes, so cached document text is not reused
+EXTRACTOR_VERSION = "hybrid-1"
+
+
+def _metadata_value(value: Any) -> str:
+    """Normalize a raw PDF info value (bytes, PSLiteral, ...) to a string"""
+    if value is None:
+        return "Unknown"
+    if isinstance(value, bytes):
+        value = value.decode("utf-8", errors="ignore")
+    value = str(value).strip()
+    return value or "Unknown"
+
+
+def page_text_issue(text: str, width: float = 0, height: float = 0) -> Optional[str]:
+    """
+    Check extracted page text for signs of a poor extraction
+    
+    Args:
+        text: Text extracted from the page
+        width: Page width in points (0 skips the density check)
+        height: Page height in points
+        
+    Returns:
+        "empty", "low_density" or "broken_spacing", or None if the text looks fine
+    """
+    words = text.split()
+    if not words:
+        return "empty"
+    chars = sum(len(word) for word in words)
+    area = width * height
+    if area > 0 and chars / (area / 1000) < MIN_CHARS_PER_KILO_POINT:
+        return "low_density"
+    if len(words) >= MIN_WORDS_FOR_SPACING_CHECK:
+        if chars / len(words) > MAX_AVG_WORD_LENGTH:
+            return "broken_spacing"
+        single = sum(1 for word in words if len(word) == 1)
+        if single / len(words) > MAX_SINGLE_CHAR_WORD_RATIO:
+            return "broken_spacing"
+    return None
+
+
+def summarize_page_records(records: List[Dict[str, Any]]) -> Dict[str, Any]:
+    """
+    Summarize per-page extraction records for the task record
+    
+    Returns:
+        Dictionary with page counts per extractor, escalation reasons, total
+        seconds and one entry per page (page, extractor, reason, seconds)
+    """
+    extractors: Dict[str, int] = {}
+    reasons: Dict[str, int] = {}
+    for record in records:
+        extractors[record["extractor"]] = extractors.get(record["extractor"], 0) + 1
+        if record["reason"]:
+            reasons[record["reason"]] = reasons.get(record["reason"], 0) + 1
+    return {
+        "extractors": extractors,
+        "escalations": reasons,
+        "seconds": round(sum(record["seconds"] for record in records), 3),
+        "pages": [
+            {key: record[key] for key in ("page", "extractor", "reason", "seconds")}
+            for record in records
+        ],
+    }
+
+
+class PDFDocument:
+    """
+    One open PDF serving validation, metadata, page count and text extraction.
+
+    The file is read from disk once and parsed lazily: PyPDF2's parse answers
+    every question and extracts each page first, and pdfplumber only parses
+    the same bytes when a page's PyPDF2 text fails the quality checks in
+    ``page_text_issue``. ``parse_count`` records how many parsers were
+    actually built.
+    """
+    
+    def __init__(self, pdf_path: str):
+        self.path = Path(pdf_path)
+        self._data: Optional[bytes] = None
+        self._plumber = None
+        self._reader = None
+        self.parse_count = 0
+    
+    def __enter__(self) -> "PDFDocument":
+        return self
+    
+    def __exit__(self, *exc) -> None:
+        self.close()
+    
+    def _bytes(self) -> bytes:
+        if self._data is None:
+            self._data = self.path.read_bytes()
+        return self._data
+    
+    @property
+    def plumber(self):
+        """pdfplumber parse of the document, built on first use"""
+        if self._plumber is None:
+            self._plumber = pdfplumber.open(io.BytesIO(self._bytes()))
+            self.parse_count += 1
+        return self._plumber
+    
+    @property
+    def reader(self) -> PyPDF2.PdfReader:
+        """PyPDF2 parse of the document, built on first use"""
+        if self._reader is None:
+            self._reader = PyPDF2.PdfReader(io.BytesIO(self._bytes()))
+            self.parse_count += 1
+        return self._reader
+    
+    @property
+    def page_count(self) -> int:
+        return len(self.reader.pages)
+    
+    @property
+    def metadata(self) -> Dict[str, Any]:
+        """Title, author, creator and page count from the document info"""
+        info = self.reader.metadata or {}
+        return {
+            "title": _metadata_value(info.get("/Title")),
+            "author": _metadata_value(info.get("/Author")),
+            "pages": self.page_count,
+            "creator": _metadata_value(info.get("/Creator")),
+        }
+    
+    def validate(self, max_size_mb: int = 10) -> tuple[bool, Optional[str]]:
+        """
+        Validate the file, parsing it as a side effect for later calls
+        
+        Args:
+            max_size_mb: Maximum allowed file size in MB
+            
+        Returns:
+            Tuple of (is_valid, error_message)
+        """
+        # Check if file exists
+        if not self.path.exists():
+            return False, "File does not exist"
+        
+        # Check file extension
+        if self.path.suffix.lower() != '.pdf':
+            return False, "File must be a PDF"
+        
+        # Check file size
+        size_mb = self.path.stat().st_size / (1024 * 1024)
+        if size_mb > max_size_mb:
+            return False, f"File size ({size_mb:.2f}MB) exceeds maximum allowed size ({max_size_mb}MB)"
+        
+        # Parse the PDF; the parse is kept for extraction
+        try:
+            self.reader.pages
+        except Exception as e:
+            return False, f"Invalid or corrupted PDF file: {str(e)}"
+        
+        return True, None
+    
+    def extract_text_pdfplumber(self) -> str:
+        try:
+            text = ""
+            for page in self.plumber.pages:
+                page_text = page.extract_text()
+                if page_text:
+                    text += page_text + "\n"
+            return text.strip()
+        except Exception as e:
+            logger.error(f"pdfplumber extraction failed: {str(e)}")
+            return ""
+    
+    def extract_text_pypdf2(self) -> str:
+        try:
+            text = ""
+            for page in self.reader.pages:
+                page_text = page.extract_text()
+                if page_text:
+                    text += page_text + "\n"
+            return text.strip()
+        except Exception as e:
+            logger.error(f"PyPDF2 extraction failed: {str(e)}")
+            return ""
+    
+    def _plumber_page_text(self, index: int) -> str:
+        page = self.plumber.pages[index]
+        try:
+            return page.extract_text() or ""
+        finally:
+            page.close()
+    
+    def iter_page_records(
+        self,
+        method: str = "hybrid",
+        start: int = 0,
+        end: Optional[int] = None
+    ) -> Iterator[Dict[str, Any]]:
+        """
+        Extract pages one at a time, yielding a record per page
+        
+        With the "hybrid" method each page is extracted with PyPDF2 first and
+        re-extracted with pdfplumber only if the text fails ``page_text_issue``,
+        so pdfplumber is never opened for a clean document. Pages are only
+        laid out when requested, so stopping early saves time and memory.
+        
+        Args:
+            method: "hybrid", "pdfplumber" or "pypdf2"
+            start: Index of the first page to extract (0-based)
+            end: Index after the last page to extract (None for the last page)
+            
+        Yields:
+            Dictionary with page (1-based), text, extractor, reason (why the
+            page was escalated, or None) and seconds
+        """
+        stop = self.page_count if end is None else min(end, self.page_count)
+        for index in range(start, stop):
+            started = time.perf_counter()
+            reason = None
+            if method == "pdfplumber":
+                text, extractor = self._plumber_page_text(index), "pdfplumber"
+            else:
+                page = self.reader.pages[index]
+                try:
+                    text = page.extract_text() or ""
+                except Exception as e:
+                    if method == "pypdf2":
+                        raise
+                    logger.warning(f"PyPDF2 failed on page {index + 1}: {str(e)}")
+                    text, reason = "", "error"
+                extractor = "pypdf2"
+                if method == "hybrid":
+                    box = page.mediabox
+                    reason = reason or page_text_issue(text, float(box.width), float(box.height))
+                    if reason:
+                        escalated = self._plumber_page_text(index)
+                        # Keep PyPDF2's text if pdfplumber finds nothing either
+                        if escalated.strip():
+                            text, extractor = escalated, "pdfplumber"
+            yield {
+                "page": index + 1,
+                "text": text,
+                "extractor": extractor,
+                "reason": reason,
+                "seconds": round(time.perf_counter() - started, 4),
+            }
+    
+    def iter_pages(
+        self,
+        method: str = "hybrid",
+        start: int = 0,
+        end: Optional[int] = None
+    ) -> Iterator[Tuple[int, str]]:
+        """Yield (page_number, text) one page at a time; see ``iter_page_records``"""
+        for record in self.iter_page_records(method, start, end):
+            yield record["page"], record["text"]
+    
+    def _collect_pages(
+        self,
+        method: str,
+        char_budget: Optional[int]
+    ) -> Tuple[str, List[Dict[str, Any]]]:
+        parts = []
+        records = []
+        length = 0
+        try:
+            for record in self.iter_page_records(method):
+                records.append(record)
+                if record["text"]:
+                    parts.append(record["text"])
+                    length += len(record["text"]) + 1
+                if char_budget is not None and length >= char_budget:
+                    break
+        except Exception as e:
+            logger.error(f"{method} extraction failed: {str(e)}")
+        return "\n".join(parts).strip(), records
+    
+    def extract_text_budgeted(self, char_budget: Optional[int]) -> Dict[str, Any]:
+        """
+        Extract pages in order until ``char_budget`` characters are collected
+        
+        Args:
+            char_budget: Characters the caller can use, or None for the whole document
+            
+        Returns:
+            Dictionary with text, pages (text of each page read), pages_used,
+            complete (all pages read) and extraction (per-page extractor
+            choice and timing)
+            
+        Raises:
+            ValueError: If text extraction fails with all methods
+        """
+        text, records = self._collect_pages("hybrid", char_budget)
+        
+        if not text or len(text) < 50:
+            raise ValueError("Failed to extract meaningful text from PDF")
+        
+        pages_used = len(records)
+        extraction = summarize_page_records(records)
+        logger.info(
+            f"Extracted {len(text)} characters from {pages_used}/{self.page_count} pages "
+            f"(extractors: {extraction['extractors']})"
+        )
+        return {
+            "text": text,
+            "pages": [record["text"] for record in records],
+            "pages_used": pages_used,
+            "complete": pages_used >= self.page_count,
+            "extraction": extraction,
+        }
+    
+    def extract_text(self) -> str:
+        """
+        Extract the text of every page, escalating poor pages to pdfplumber
+        
+        Raises:
+            ValueError: If text extraction fails with all methods
+        """
+        return self.extract_text_budgeted(None)["text"]
+    
+    def close(self) -> None:
+        if self._plumber is not None:
+            self._plumber.close()
+            self._plumber = None
+        self._reader = None
+        self._data = None
+
 
 class PDFProcessor:
     """Service for extracting text and metadata from PDF files"""
@@ -55,19 +394,124 @@ class PDFProcessor:
         Raises:
             ValueError: If text extraction fails with all methods
         """
-        # Try pdfplumber first (better quality)
-        text = cls.extract_text_pdfplumber(pdf_path)
+        with PDFDocument(pdf_path) as doc:
+            return doc.extract_text()
+    
+    @staticmethod
+    def process_document(
+        pdf_path: str,
+        max_size_mb: int = 10,
+        char_budget: Optional[int] = None,
+        normalize: bool = True
+    ) -> Dict[str, Any]:
+        """
+        Validate, read metadata and extract text from a single parse
         
-        # Fallback to PyPDF2 if pdfplumber fails
-        if not text or len(text) < 100:
-            logger.warning("pdfplumber extraction insufficient, trying PyPDF2")
-            text = cls.extract_text_pypdf2(pdf_path)
+        Args:
+            pdf_path: Path to the PDF file
+            max_size_mb: Maximum allowed file size in MB
+            char_budget: Stop extracting once this many characters are
+                collected (None extracts every page)
+            normalize: Strip repeated headers/footers, page numbers,
+                hyphenated line breaks and extra whitespace
+            
+        Returns:
+            Dictionary with text, pages, page_count, pages_used, complete,
+            extraction, normalization (stats, None if not normalized),
+            metadata and parse_count
+            
+        Raises:
+            ValueError: If the PDF is invalid or yields no meaningful text
+        """
+        with PDFDocument(pdf_path) as doc:
+            is_valid, error_msg = doc.validate(max_size_mb)
+            if not is_valid:
+                raise ValueError(error_msg)
+            if normalize and char_budget is not None:
+                char_budget = int(char_budget * NORMALIZE_HEADROOM)
+            extracted = doc.extract_text_budgeted(char_budget)
+            extracted["normalization"] = None
+            if normalize:
+                pages, extracted["normalization"] = normalize_pages(extracted["pages"])
+                extracted["pages"] = pages
+                extracted["text"] = "\n".join(page for page in pages if page)
+                if len(extracted["text"]) < 50:
+                    raise ValueError("Failed to extract meaningful text from PDF")
+            return {
+                **extracted,
+                "page_count": doc.page_count,
+                "metadata": doc.metadata,
+                "parse_count": doc.parse_count,
+            }
+    
+    @staticmethod
+    def inspect_document(pdf_path: str, max_size_mb: int = 10) -> Dict[str, Any]:
+        """
+        Validate a PDF and read its page count and metadata without extracting text
         
-        if not text or len(text) < 50:
-            raise ValueError("Failed to extract meaningful text from PDF")
+        Raises:
+            ValueError: If the PDF is invalid
+        """
+        with PDFDocument(pdf_path) as doc:
+            is_valid, error_msg = doc.validate(max_size_mb)
+            if not is_valid:
+                raise ValueError(error_msg)
+            return {
+                "page_count": doc.page_count,
+                "metadata": doc.metadata,
+            }
+    
+    @staticmethod
+    def plan_shards(page_count: int, workers: int, serial_threshold: int) -> List[Tuple[int, int]]:
+        """
+        Split a document into contiguous page ranges, one per worker
         
-        logger.info(f"Successfully extracted {len(text)} characters from PDF")
-        return text
+        Args:
+            page_count: Number of pages in the document
+            workers: Number of parallel extraction workers
+            serial_threshold: Documents with fewer pages stay in one range
+            
+        Returns:
+            List of (start, end) page index ranges covering the document in order
+        """
+        if workers <= 1 or page_count < max(serial_threshold, 2):
+            return [(0, page_count)]
+        shards = min(workers, page_count)
+        size, extra = divmod(page_count, shards)
+        ranges = []
+        start = 0
+        for index in range(shards):
+            end = start + size + (1 if index < extra else 0)
+            ranges.append((start, end))
+            start = end
+        return ranges
+    
+    @staticmethod
+    def extract_page_range(
+        pdf_path: str,
+        start: int,
+        end: int,
+        method: str = "hybrid"
+    ) -> List[Dict[str, Any]]:
+        """
+        Extract pages [start, end) in a worker process
+        
+        Returns:
+            One record per page, in page order (see ``PDFDocument.iter_page_records``)
+        """
+        with PDFDocument(pdf_path) as doc:
+            records = []
+            try:
+                records.extend(doc.iter_page_records(method, start, end))
+            except Exception as e:
+                logger.error(f"{method} extraction of pages {start + 1}-{end} failed: {str(e)}")
+            # Pad pages that could not be read so page numbers stay aligned
+            for index in range(start + len(records), end):
+                records.append({
+                    "page": index + 1, "text": "", "extractor": method,
+                    "reason": "error", "seconds": 0.0,
+                })
+            return records
     
     @staticmethod
     def get_pdf_metadata(pdf_path: str) -> dict:
@@ -81,16 +525,8 @@ class PDFProcessor:
             Dictionary containing PDF metadata
         """
         try:
-            with open(pdf_path, 'rb') as file:
-                pdf_reader = PyPDF2.PdfReader(file)
-                metadata = pdf_reader.metadata
-                
-                return {
-                    "title": metadata.get("/Title", "Unknown"),
-                    "author": metadata.get("/Author", "Unknown"),
-                    "pages": len(pdf_reader.pages),
-                    "creator": metadata.get("/Creator", "Unknown"),
-                }
+            with PDFDocument(pdf_path) as doc:
+                return doc.metadata
         except Exception as e:
             logger.error(f"Metadata extraction failed: {str(e)}")
             return {
@@ -112,27 +548,6 @@ class PDFProcessor:
         Returns:
             Tuple of (is_valid, error_message)
         """
-        path = Path(pdf_path)
-        
-        # Check if file exists
-        if not path.exists():
-            return False, "File does not exist"
-        
-        # Check file extension
-        if path.suffix.lower() != '.pdf':
-            return False, "File must be a PDF"
-        
-        # Check file size
-        size_mb = path.stat().st_size / (1024 * 1024)
-        if size_mb > max_size_mb:
-            return False, f"File size ({size_mb:.2f}MB) exceeds maximum allowed size ({max_size_mb}MB)"
-        
-        # Try to open the PDF
-        try:
-            with open(pdf_path, 'rb') as file:
-                PyPDF2.PdfReader(file)
-        except Exception as e:
-            return False, f"Invalid or corrupted PDF file: {str(e)}"
-        
-        return True, None
+        with PDFDocument(pdf_path) as doc:
+            return doc.validate(max_size_mb)
 
@@ -0,0 +1,84 @@
+import logging
+from typing import Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+
+class SingleFlight:
+    """
+    Coalesces identical jobs: one leader runs, followers wait for its result.
+
+    Jobs are keyed by content (the PDF's SHA-256). The first task for a key
+    becomes the leader and is processed; tasks for the same key arriving
+    while it is queued or running attach to it as followers instead of being
+    queued themselves. Tracking is per process, like the job queue.
+    """
+
+    def __init__(self):
+        self._leaders: Dict[str, str] = {}
+        self._keys: Dict[str, str] = {}
+        self._followers: Dict[str, List[str]] = {}
+        self._leader_of: Dict[str, str] = {}
+        self._coalesced = 0
+
+    def attach(self, key: str, task_id: str) -> Optional[str]:
+        """
+        Register a task for a key
+
+        Args:
+            key: Content key of the job
+            task_id: Task that wants the job done
+
+        Returns:
+            The leader's task_id if the task was attached as a follower, or
+            None if it is now the leader and must be processed
+        """
+        leader = self._leaders.get(key)
+        if leader is None or leader == task_id:
+            self._leaders[key] = task_id
+            self._keys[task_id] = key
+            return None
+        self._followers.setdefault(leader, []).append(task_id)
+        self._leader_of[task_id] = leader
+        self._coalesced += 1
+        logger.info(f"Task {task_id} attached to in-flight task {leader}")
+        return leader
+
+    def followers(self, task_id: str) -> List[str]:
+        """Followers attached to a leader (empty for any other task)"""
+        return list(self._followers.get(task_id, ()))
+
+    def leader_of(self, task_id: str) -> Optional[str]:
+        """Leader a follower is attached to, or None"""
+        return self._leader_of.get(task_id)
+
+    def detach(self, task_id: str) -> None:
+        """Remove a follower from its leader"""
+        leader = self._leader_of.pop(task_id, None)
+        if leader is not None:
+            self._followers[leader].remove(task_id)
+            if not self._followers[leader]:
+                del self._followers[leader]
+
+    def finish(self, task_id: str) -> List[str]:
+        """
+        Release a leader once its job is over
+
+        Returns:
+            The followers that were attached to it
+        """
+        key = self._keys.pop(task_id, None)
+        if key is not None and self._leaders.get(key) == task_id:
+            del self._leaders[key]
+        followers = self._followers.pop(task_id, [])
+        for follower in followers:
+            self._leader_of.pop(follower, None)
+        return followers
+
+    def stats(self) -> Dict[str, int]:
+        """In-flight leaders, attached followers and tasks coalesced so far"""
+        return {
+            "in_flight": len(self._leaders),
+            "followers": len(self._leader_of),
+            "coalesced": self._coalesced,
+        }
@@ -0,0 +1,313 @@
+import copy
+import json
+import sqlite3
+import threading
+import time
+import logging
+from abc import ABC, abstractmethod
+from pathlib import Path
+from typing import Dict, Any, Optional, Sequence
+
+logger = logging.getLogger(__name__)
+
+
+def _status_value(status: Any) -> str:
+    """Store TaskStatus members by value so every worker reads plain strings"""
+    return getattr(status, "value", status)
+
+
+class TaskStore(ABC):
+    """
+    Storage for task records.
+
+    Records are plain dicts. ``get`` returns a snapshot: mutating it does not
+    change the stored task, so every change must go through ``update``.
+    """
+
+    @abstractmethod
+    def create(self, task_id: str, record: Dict[str, Any]) -> None:
+        """Insert a new task record"""
+
+    @abstractmethod
+    def get(self, task_id: str) -> Optional[Dict[str, Any]]:
+        """Return a snapshot of the task record, or None if it does not exist"""
+
+    @abstractmethod
+    def update(self, task_id: str, **fields: Any) -> bool:
+        """
+        Merge fields into a task record and persist them immediately
+
+        Returns:
+            False if the task does not exist (e.g. it was deleted meanwhile)
+        """
+
+    @abstractmethod
+    def update_if(self, task_id: str, expected: Dict[str, Any], **fields: Any) -> bool:
+        """
+        Merge fields into a task record only if it still holds the expected values
+
+        The check and the write are atomic across worker processes, so two
+        processes racing for the same task cannot both succeed.
+
+        Returns:
+            False if the task does not exist or a field differs from expected
+        """
+
+    @abstractmethod
+    def delete(self, task_id: str) -> bool:
+        """Delete a task record, returning whether it existed"""
+
+    @abstractmethod
+    def purge(self, older_than_seconds: float) -> int:
+        """Delete records created more than the given number of seconds ago"""
+
+    @abstractmethod
+    def count_by_status(self) -> Dict[str, int]:
+        """Number of tasks per status"""
+
+    @abstractmethod
+    def find_by_status(self, statuses: Sequence[Any]) -> Dict[str, Dict[str, Any]]:
+        """Snapshots of the tasks in any of the given statuses, by task_id"""
+
+    def __contains__(self, task_id: str) -> bool:
+        return self.get(task_id) is not None
+
+    def close(self) -> None:
+        """Release any resources held by the store"""
+
+
+class InMemoryTaskStore(TaskStore):
+    """Process-local store, for tests and single-worker development"""
+
+    def __init__(self):
+        self._tasks: Dict[str, Dict[str, Any]] = {}
+        self._lock = threading.Lock()
+
+    def create(self, task_id: str, record: Dict[str, Any]) -> None:
+        now = time.time()
+        record = copy.deepcopy(record)
+        record["status"] = _status_value(record.get("status"))
+        record.setdefault("created_at", now)
+        record["updated_at"] = now
+        with self._lock:
+            self._tasks[task_id] = record
+
+    def get(self, task_id: str) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            record = self._tasks.get(task_id)
+            return copy.deepcopy(record) if record is not None else None
+
+    def update(self, task_id: str, **fields: Any) -> bool:
+        return self.update_if(task_id, {}, **fields)
+
+    def update_if(self, task_id: str, expected: Dict[str, Any], **fields: Any) -> bool:
+        if "status" in fields:
+            fields["status"] = _status_value(fields["status"])
+        fields = copy.deepcopy(fields)
+        with self._lock:
+            record = self._tasks.get(task_id)
+            if record is None:
+                return False
+            if any(record.get(key) != _status_value(value) for key, value in expected.items()):
+                return False
+            record.update(fields)
+            record["updated_at"] = time.time()
+            return True
+
+    def delete(self, task_id: str) -> bool:
+        with self._lock:
+            return self._tasks.pop(task_id, None) is not None
+
+    def purge(self, older_than_seconds: float) -> int:
+        cutoff = time.time() - older_than_seconds
+        with self._lock:
+            expired = [
+                task_id for task_id, record in self._tasks.items()
+                if record["created_at"] < cutoff
+            ]
+            for task_id in expired:
+                del self._tasks[task_id]
+        return len(expired)
+
+    def count_by_status(self) -> Dict[str, int]:
+        counts: Dict[str, int] = {}
+        with self._lock:
+            for record in self._tasks.values():
+                counts[record["status"]] = counts.get(record["status"], 0) + 1
+        return counts
+
+    def find_by_status(self, statuses: Sequence[Any]) -> Dict[str, Dict[str, Any]]:
+        wanted = {_status_value(status) for status in statuses}
+        with self._lock:
+            return {
+                task_id: copy.deepcopy(record)
+                for task_id, record in self._tasks.items()
+                if record["status"] in wanted
+            }
+
+
+class SQLiteTaskStore(TaskStore):
+    """
+    Durable store shared by every uvicorn worker on the host.
+
+    The database runs in WAL mode so status polls from one worker never block
+    on progress writes from another. Status, progress and timestamps live in
+    their own columns (status and created_at are indexed); everything else is
+    kept in a JSON ``data`` column so new task fields need no migration.
+    """
+
+    _COLUMNS = ("status", "progress", "created_at", "updated_at")
+
+    def __init__(self, path: str):
+        self.path = str(path)
+        Path(self.path).parent.mkdir(parents=True, exist_ok=True)
+        self._local = threading.local()
+        conn = self._connection()
+        with conn:
+            conn.execute(
+                """CREATE TABLE IF NOT EXISTS tasks (
+                    task_id TEXT PRIMARY KEY,
+                    status TEXT NOT NULL,
+                    progress INTEGER NOT NULL DEFAULT 0,
+                    created_at REAL NOT NULL,
+                    updated_at REAL NOT NULL,
+                    data TEXT NOT NULL
+                )"""
+            )
+            conn.execute("CREATE INDEX IF NOT EXISTS idx_tasks_status ON tasks(status)")
+            conn.execute("CREATE INDEX IF NOT EXISTS idx_tasks_created_at ON tasks(created_at)")
+
+    def _connection(self) -> sqlite3.Connection:
+        """One connection per thread; sqlite3 connections are not thread-safe"""
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=10.0, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    @staticmethod
+    def _encode_data(record: Dict[str, Any]) -> str:
+        data = {k: v for k, v in record.items() if k not in SQLiteTaskStore._COLUMNS}
+        return json.dumps(data, default=str)
+
+    def create(self, task_id: str, record: Dict[str, Any]) -> None:
+        now = time.time()
+        self._connection().execute(
+            "INSERT INTO tasks (task_id, status, progress, created_at, updated_at, data) "
+            "VALUES (?, ?, ?, ?, ?, ?)",
+            (
+                task_id,
+                _status_value(record.get("status")),
+                record.get("progress") or 0,
+                record.get("created_at", now),
+                now,
+                self._encode_data(record),
+            ),
+        )
+
+    def get(self, task_id: str) -> Optional[Dict[str, Any]]:
+        row = self._connection().execute(
+            "SELECT status, progress, created_at, updated_at, data FROM tasks WHERE task_id = ?",
+            (task_id,),
+        ).fetchone()
+        if row is None:
+            return None
+        record = json.loads(row[4])
+        record.update(zip(self._COLUMNS, row[:4]))
+        return record
+
+    def update(self, task_id: str, **fields: Any) -> bool:
+        return self.update_if(task_id, {}, **fields)
+
+    def update_if(self, task_id: str, expected: Dict[str, Any], **fields: Any) -> bool:
+        conn = self._connection()
+        # BEGIN IMMEDIATE takes the write lock up front so concurrent
+        # read-modify-write cycles from other workers cannot interleave
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            row = conn.execute(
+                "SELECT status, progress, data FROM tasks WHERE task_id = ?", (task_id,)
+            ).fetchone()
+            if row is None:
+                conn.execute("ROLLBACK")
+                return False
+            status, progress, data = row[0], row[1], json.loads(row[2])
+            current = {**data, "status": status, "progress": progress}
+            if any(current.get(key) != _status_value(value) for key, value in expected.items()):
+                conn.execute("ROLLBACK")
+                return False
+            for key, value in fields.items():
+                if key == "status":
+                    status = _status_value(value)
+                elif key == "progress":
+                    progress = value or 0
+                elif key not in self._COLUMNS:
+                    data[key] = value
+            conn.execute(
+                "UPDATE tasks SET status = ?, progress = ?, updated_at = ?, data = ? WHERE task_id = ?",
+                (status, progress, time.time(), json.dumps(data, default=str), task_id),
+            )
+            conn.execute("COMMIT")
+            return True
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+
+    def delete(self, task_id: str) -> bool:
+        cursor = self._connection().execute("DELETE FROM tasks WHERE task_id = ?", (task_id,))
+        return cursor.rowcount > 0
+
+    def purge(self, older_than_seconds: float) -> int:
+        cursor = self._connection().execute(
+            "DELETE FROM tasks WHERE created_at < ?", (time.time() - older_than_seconds,)
+        )
+        return cursor.rowcount
+
+    def count_by_status(self) -> Dict[str, int]:
+        rows = self._connection().execute(
+            "SELECT status, COUNT(*) FROM tasks GROUP BY status"
+        ).fetchall()
+        return dict(rows)
+
+    def find_by_status(self, statuses: Sequence[Any]) -> Dict[str, Dict[str, Any]]:
+        values = [_status_value(status) for status in statuses]
+        if not values:
+            return {}
+        rows = self._connection().execute(
+            "SELECT task_id, status, progress, created_at, updated_at, data FROM tasks "
+            f"WHERE status IN ({', '.join('?' for _ in values)})",
+            values,
+        ).fetchall()
+        tasks = {}
+        for row in rows:
+            record = json.loads(row[5])
+            record.update(zip(self._COLUMNS, row[1:5]))
+            tasks[row[0]] = record
+        return tasks
+
+    def close(self) -> None:
+        conn = getattr(self._local, "conn", None)
+        if conn is not None:
+            conn.close()
+            self._local.conn = None
+
+
+def create_task_store(kind: str = "sqlite", path: str = "./tasks.db") -> TaskStore:
+    """
+    Build the configured task store
+
+    Args:
+        kind: "sqlite" for the durable store, "memory" for a process-local one
+        path: Database file used by the SQLite store
+
+    Returns:
+        TaskStore instance
+    """
+    if kind == "memory":
+        logger.warning("Using in-memory task store; tasks are lost on restart")
+        return InMemoryTaskStore()
+    if kind != "sqlite":
+        raise ValueError(f"Unknown task store: {kind}")
+    return SQLiteTaskStore(path)
@@ -0,0 +1,145 @@
+import logging
+import re
+from collections import Counter
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+logger = logging.getLogger(__name__)
+
+# Lines at the top and bottom of a page where running headers and footers sit
+EDGE_LINES = 3
+# A line on at least this share of pages (and on MIN_REPEAT_PAGES) is
+# boilerplate: at a page edge, or anywhere on the page
+EDGE_REPEAT_FRACTION = 0.3
+BODY_REPEAT_FRACTION = 0.6
+MIN_REPEAT_PAGES = 3
+
+# Bump when normalization output changes, so cached document text is not reused
+NORMALIZER_VERSION = "3"
+
+# A well-formed roman numeral up to 89 (front matter page numbers), so words
+# like "civic", "ill" or "mix" never match
+_ROMAN = r"(?=[ivxl])(?:xc|xl|l?x{0,3})(?:ix|iv|v?i{0,3})"
+_PAGE_NUMBER = re.compile(
+    rf"^(?:page\s*)?(?:\d{{1,4}}|{_ROMAN})(?:\s*(?:of|/)\s*\d{{1,4}})?$|^[-\u2013\u2014]\s*\d{{1,4}}\s*[-\u2013\u2014]$",
+    re.IGNORECASE,
+)
+_ROMAN_VALUES = {"i": 1, "v": 5, "x": 10, "l": 50, "c": 100}
+# The page's own number within a page-number line
+_NUMBER = re.compile(rf"\d+|(?<!\w){_ROMAN}(?!\w)")
+_DIGITS = re.compile(r"\d+")
+_SPACES = re.compile(r"[ \t\f\v\u00a0]+")
+# A word broken across lines: "token-\nomics" (not "layer-\n2" or a compound
+# such as "Proof-\nof-Stake" or "peer-to-\npeer")
+_HYPHEN_BREAK = re.compile(r"(?<![-\w])([A-Za-z]{2,})-[ \t]*\n[ \t]*([a-z]{2,})(?![-\w])")
+
+
+def _line_key(line: str) -> str:
+    """Comparison key ignoring spacing, case and numbers, so "Page 3" matches "Page 4" """
+    return _DIGITS.sub("#", _SPACES.sub(" ", line).strip().lower())
+
+
+def _roman_value(numeral: str) -> int:
+    total = 0
+    for char, following in zip(numeral, numeral[1:] + " "):
+        value = _ROMAN_VALUES[char]
+        total += -value if _ROMAN_VALUES.get(following, 0) > value else value
+    return total
+
+
+def _page_number_key(line: str, position: int) -> Optional[Tuple[str, int]]:
+    """Shape of a page-number line and its offset from the page's position, or None"""
+    line = _SPACES.sub(" ", line).strip().lower()
+    if not _PAGE_NUMBER.match(line):
+        return None
+    number = _NUMBER.search(line).group()
+    value = int(number) if number.isdigit() else _roman_value(number)
+    return _NUMBER.sub("#", line), value - position
+
+
+def _edge_lines(lines: List[str]) -> List[str]:
+    return lines[:EDGE_LINES] + lines[-EDGE_LINES:]
+
+
+def _page_number_keys(pages: Sequence[List[str]]) -> set:
+    """Page-number keys found at the edges of at least MIN_REPEAT_PAGES pages"""
+    counts: Counter = Counter()
+    for position, lines in enumerate(pages):
+        counts.update({_page_number_key(line, position) for line in _edge_lines(lines)} - {None})
+    return {key for key, count in counts.items() if count >= MIN_REPEAT_PAGES}
+
+
+def _boilerplate_keys(pages: Sequence[List[str]]) -> set:
+    """Keys of lines repeated on enough pages to be headers, footers or disclaimers"""
+    edge_counts: Counter = Counter()
+    body_counts: Counter = Counter()
+    for lines in pages:
+        lines = [line for line in lines if not _PAGE_NUMBER.match(line.strip())]
+        edge_counts.update({_line_key(line) for line in _edge_lines(lines)})
+        body_counts.update({_line_key(line) for line in lines})
+    edge_min = max(MIN_REPEAT_PAGES, EDGE_REPEAT_FRACTION * len(pages))
+    body_min = max(MIN_REPEAT_PAGES, BODY_REPEAT_FRACTION * len(pages))
+    keys = {key for key, count in edge_counts.items() if count >= edge_min}
+    keys.update(key for key, count in body_counts.items() if count >= body_min)
+    keys.discard("")
+    return keys
+
+
+def normalize_pages(pages: Sequence[str]) -> Tuple[List[str], Dict[str, Any]]:
+    """
+    Strip per-page boilerplate and layout noise from extracted page text
+
+    Drops repeated lines and page numbers, rejoins hyphenated words and
+    collapses whitespace. Pages keep their position.
+
+    Args:
+        pages: Text of each page, in order
+
+    Returns:
+        Tuple of (normalized pages, stats on characters removed per step)
+    """
+    before = sum(len(page or "") for page in pages)
+    removed = {"repeated_lines": 0, "page_numbers": 0, "hyphenation": 0, "whitespace": 0}
+
+    # Rejoin hyphenated words first so the tail of a broken word is not
+    # mistaken for a repeated line
+    split = []
+    for page in pages:
+        page = page or ""
+        joined = _HYPHEN_BREAK.sub(r"\1\2", page)
+        removed["hyphenation"] += len(page) - len(joined)
+        split.append([line for line in joined.splitlines() if line.strip()])
+    boilerplate = _boilerplate_keys([lines for lines in split if lines])
+    page_numbers = _page_number_keys(split)
+    examples: Dict[str, str] = {}
+
+    normalized = []
+    for position, lines in enumerate(split):
+        kept = []
+        for index, line in enumerate(lines):
+            at_edge = index < EDGE_LINES or index >= len(lines) - EDGE_LINES
+            if at_edge and _page_number_key(line, position) in page_numbers:
+                removed["page_numbers"] += len(line) + 1
+                continue
+            key = _line_key(line)
+            if key in boilerplate:
+                removed["repeated_lines"] += len(line) + 1
+                examples.setdefault(key, line.strip())
+                continue
+            kept.append(line)
+        normalized.append("\n".join(_SPACES.sub(" ", line).strip() for line in kept))
+
+    after = sum(len(page) for page in normalized)
+    # Blank lines and runs of spaces: whatever the other steps do not account for
+    removed["whitespace"] = before - after - sum(removed.values())
+    stats = {
+        "chars_before": before,
+        "chars_after": after,
+        "removed": removed,
+        "removed_fraction": round(1 - after / before, 4) if before else 0.0,
+        "repeated_lines": list(examples.values())[:5],
+    }
+    logger.info(
+        f"Normalized {len(pages)} pages: {before} -> {after} characters "
+        f"({stats['removed_fraction']:.1%} removed, {len(boilerplate)} repeated lines)"
+    )
+    return normalized, stats
@@ -0,0 +1,221 @@
+import logging
+import math
+import re
+import threading
+from collections import deque
+from typing import Any, Deque, Dict, Optional, Protocol
+
+logger = logging.getLogger(__name__)
+
+# Han, kana, hangul and CJK punctuation/fullwidth forms: about one token each
+_CJK = re.compile(
+    r"[\u3000-\u30ff\u3400-\u4dbf\u4e00-\u9fff\uac00-\ud7af\uf900-\ufaff\uff00-\uffef]"
+)
+CHARS_PER_TOKEN = 4
+
+# Completions of a kind observed before its output reservation adapts
+MIN_SAMPLES = 3
+# Reservation above the largest recent completion of the same kind
+OUTPUT_HEADROOM = 1.25
+
+
+class Tokenizer(Protocol):
+    name: str
+
+    def count(self, text: str) -> int: ...
+
+
+class ApproximateTokenizer:
+    """
+    Fast token estimate without a vocabulary.
+
+    CJK characters count as one token each and everything else as one token
+    per four characters, which is close for English BPE vocabularies and
+    avoids the 4x undercount a pure character ratio gives on CJK text.
+    """
+
+    name = "approx"
+
+    def count(self, text: str) -> int:
+        if not text:
+            return 0
+        cjk = len(_CJK.findall(text))
+        return cjk + math.ceil((len(text) - cjk) / CHARS_PER_TOKEN)
+
+
+class TiktokenTokenizer:
+    """Exact counts for a tiktoken encoding"""
+
+    def __init__(self, encoding: str = "cl100k_base"):
+        import tiktoken
+        self._encoding = tiktoken.get_encoding(encoding)
+        self.name = f"tiktoken:{encoding}"
+
+    def count(self, text: str) -> int:
+        return len(self._encoding.encode(text, disallowed_special=()))
+
+
+def create_tokenizer(spec: str = "approx") -> Tokenizer:
+    """
+    Build the tokenizer named by ``spec``
+
+    Args:
+        spec: "approx", or "tiktoken" / "tiktoken:<encoding>"
+
+    Returns:
+        Tokenizer; the approximation if tiktoken is requested but unavailable
+    """
+    kind, _, encoding = spec.partition(":")
+    if kind == "tiktoken":
+        try:
+            return TiktokenTokenizer(encoding or "cl100k_base")
+        except Exception as e:
+            logger.warning(f"tiktoken unavailable ({str(e)}), using approximate token counts")
+    elif kind != "approx":
+        raise ValueError(f"Unknown tokenizer: {spec}")
+    return ApproximateTokenizer()
+
+
+class TokenBudgeter:
+    """
+    Sizes prompt input and output reservations in tokens.
+
+    The input slice is cut to a token budget instead of a character count,
+    and ``max_tokens`` is chosen per request kind (full report, section
+    group, map step): the configured ceiling until a few completions of that
+    kind have been seen, then the largest recent completion plus headroom,
+    never more than the context window leaves after the prompt. Actual
+    ``response.usage`` is compared with the prediction; with the
+    approximate tokenizer the ratio also calibrates later estimates.
+    """
+
+    def __init__(
+        self,
+        context_window: int = 131072,
+        tokenizer: Optional[Tokenizer] = None,
+        min_output_tokens: int = 1024,
+        window: int = 50
+    ):
+        self.context_window = context_window
+        self.tokenizer = tokenizer or ApproximateTokenizer()
+        self.min_output_tokens = min_output_tokens
+        self.calibration = 1.0
+        self._calibrate = isinstance(self.tokenizer, ApproximateTokenizer)
+        self._completions: Dict[str, Deque[int]] = {}
+        self._totals: Dict[str, Dict[str, int]] = {}
+        self._window = window
+        self._lock = threading.Lock()
+
+    def count(self, text: str) -> int:
+        """Predicted tokens for text"""
+        return math.ceil(self.tokenizer.count(text) * self.calibration)
+
+    def fit_text(self, text: str, max_tokens: int) -> str:
+        """
+        Longest prefix of text predicted to fit in max_tokens
+
+        Args:
+            text: Text to cut
+            max_tokens: Token budget for the prefix
+
+        Returns:
+            text itself if it fits, otherwise a prefix ending at a line or
+            word boundary where possible
+        """
+        if max_tokens <= 0:
+            return ""
+        if self.count(text) <= max_tokens:
+            return text
+        # Binary search on length; counting is monotonic in the prefix
+        low, high = 0, len(text)
+        while low < high:
+            middle = (low + high + 1) // 2
+            if self.count(text[:middle]) <= max_tokens:
+                low = middle
+            else:
+                high = middle - 1
+        prefix = text[:low]
+        for boundary in ("\n", " "):
+            cut = prefix.rfind(boundary)
+            if cut > low * 0.9:
+                return prefix[:cut]
+        return prefix
+
+    def max_tokens(self, kind: str, prompt_tokens: int, ceiling: int) -> int:
+        """
+        Output reservation for a request
+
+        Args:
+            kind: Request kind, e.g. "report", "sections" or "map"
+            prompt_tokens: Predicted prompt size
+            ceiling: Largest reservation allowed for this kind
+
+        Returns:
+            max_tokens to send
+        """
+        reservation = ceiling
+        with self._lock:
+            observed = self._completions.get(kind)
+            if observed and len(observed) >= MIN_SAMPLES:
+                reservation = min(ceiling, math.ceil(max(observed) * OUTPUT_HEADROOM))
+        room = self.context_window - prompt_tokens
+        return max(self.min_output_tokens, min(reservation, room))
+
+    def record(self, kind: str, predicted_prompt: int, max_tokens: int, usage: Any) -> None:
+        """
+        Compare a completion's ``response.usage`` with the prediction
+
+        Args:
+            kind: Request kind the reservation was made for
+            predicted_prompt: Prompt tokens predicted before sending
+            max_tokens: Output reservation sent
+            usage: ``response.usage`` (None if the provider sent none)
+        """
+        prompt = getattr(usage, "prompt_tokens", None)
+        completion = getattr(usage, "completion_tokens", None)
+        if prompt is None or completion is None:
+            return
+        logger.info(
+            f"Token usage ({kind}): prompt {prompt} (predicted {predicted_prompt}), "
+            f"completion {completion} of {max_tokens} reserved"
+        )
+        with self._lock:
+            self._completions.setdefault(kind, deque(maxlen=self._window)).append(completion)
+            totals = self._totals.setdefault(kind, {
+                "completions": 0, "prompt_tokens": 0, "predicted_prompt_tokens": 0,
+                "completion_tokens": 0, "reserved_tokens": 0,
+            })
+            totals["completions"] += 1
+            totals["prompt_tokens"] += prompt
+            totals["predicted_prompt_tokens"] += predicted_prompt
+            totals["completion_tokens"] += completion
+            totals["reserved_tokens"] += max_tokens
+            if self._calibrate and predicted_prompt and prompt:
+                # Moving average of actual/predicted, applied to later counts
+                raw = predicted_prompt / self.calibration
+                self.calibration = 0.8 * self.calibration + 0.2 * (prompt / raw)
+
+    def stats(self) -> Dict[str, Any]:
+        """Tokenizer, calibration and per-kind prediction and reservation accuracy"""
+        with self._lock:
+            kinds = {}
+            for kind, totals in self._totals.items():
+                kinds[kind] = {
+                    **totals,
+                    "prompt_error": round(
+                        totals["predicted_prompt_tokens"] / totals["prompt_tokens"] - 1, 4
+                    ) if totals["prompt_tokens"] else None,
+                    "reservation_used": round(
+                        totals["completion_tokens"] / totals["reserved_tokens"], 4
+                    ) if totals["reserved_tokens"] else None,
+                    "next_reservation": (
+                        math.ceil(max(self._completions[kind]) * OUTPUT_HEADROOM)
+                        if len(self._completions.get(kind, ())) >= MIN_SAMPLES else None
+                    ),
+                }
+            return {
+                "tokenizer": self.tokenizer.name,
+                "context_window": self.context_window,
+                "calibration": round(self.calibration, 4),
+                "kinds": kinds,
+            }
@@ -3,9 +3,12 @@ Simple test script to verify the API is working correctly
 Usage: python test_api.py
 """
 
+import io
+import json
 import requests
 import time
 import sys
+import zipfile
 
 API_BASE = "http://localhost:8000"
 
@@ -52,8 +55,38 @@ def test_upload(pdf_path=None):
         print(f"✗ Upload failed: {e}")
         return False
 
+def test_events(task_id):
+    """Follow a task over the Server-Sent Events stream until its result"""
+    print(f"\nTesting event stream for task: {task_id}")
+    try:
+        with requests.get(f"{API_BASE}/api/events/{task_id}", stream=True, timeout=(10, 120)) as response:
+            response.raise_for_status()
+            event = None
+            for line in response.iter_lines(decode_unicode=True):
+                if line.startswith("event: "):
+                    event = line[len("event: "):]
+                elif line.startswith("data: "):
+                    data = json.loads(line[len("data: "):])
+                    if event == "status":
+                        print(f"  Status: {data['status']} ({data['progress']}%, {data.get('stage')})")
+                    elif event == "result":
+                        if data["status"] == "completed":
+                            print("✓ Processing completed!")
+                            return test_result(task_id)
+                        print(f"✗ Processing failed: {data.get('error')}")
+                        return False
+        print("✗ Event stream ended without a result")
+        return False
+    except Exception as e:
+        print(f"✗ Event stream failed: {e}")
+        return None
+
 def test_status_and_result(task_id):
     """Test status and result endpoints"""
+    passed = test_events(task_id)
+    if passed is not None:
+        return passed
+    
     print(f"\nTesting status endpoint for task: {task_id}")
     
     max_attempts = 60  # Wait up to 2 minutes
@@ -112,6 +145,91 @@ def test_result(task_id):
         print(f"✗ Result retrieval failed: {e}")
         return False
 
+def completions_in_flight():
+    response = requests.get(f"{API_BASE}/api/health")
+    response.raise_for_status()
+    return (response.json().get("completions") or {}).get("in_flight", 0)
+
+def test_cancel(pdf_path=None, timeout=10):
+    """Test that deleting a running task frees its completion slot within timeout seconds"""
+    if not pdf_path:
+        return True
+    
+    print(f"\nTesting cancellation with: {pdf_path}")
+    try:
+        with open(pdf_path, 'rb') as f:
+            # A unique trailer makes the upload miss the result cache, so the model is really called
+            content = f.read() + f"\n% cancel test {time.time()}\n".encode()
+        files = {'file': ('cancel-test.pdf', content, 'application/pdf')}
+        response = requests.post(f"{API_BASE}/api/upload", files=files)
+        response.raise_for_status()
+        task_id = response.json()['task_id']
+        
+        # Wait for the analysis to hold a completion slot
+        deadline = time.time() + 120
+        while completions_in_flight() == 0:
+            status = requests.get(f"{API_BASE}/api/status/{task_id}").json()
+            if status.get('status') in ('completed', 'failed') or time.time() > deadline:
+                print(f"✗ Analysis never reached the model: {status}")
+                return False
+            time.sleep(0.2)
+        in_flight = completions_in_flight()
+        print(f"  Completions in flight: {in_flight}")
+        
+        started = time.time()
+        response = requests.delete(f"{API_BASE}/api/task/{task_id}")
+        response.raise_for_status()
+        while time.time() - started < timeout:
+            if completions_in_flight() < in_flight:
+                elapsed = time.time() - started
+                if requests.get(f"{API_BASE}/api/status/{task_id}").status_code != 404:
+                    print("✗ Task still exists after deletion")
+                    return False
+                print(f"✓ Completion slot released {elapsed:.2f}s after deletion")
+                return True
+            time.sleep(0.1)
+        
+        print(f"✗ Completion slot still held {timeout}s after deletion")
+        return False
+    except Exception as e:
+        print(f"✗ Cancellation test failed: {e}")
+        return False
+
+def test_batch(pdf_path=None, timeout=600):
+    """Test a batch upload: a ZIP holding the PDF twice, followed to completion"""
+    if not pdf_path:
+        return True
+    
+    print(f"\nTesting batch upload with: {pdf_path}")
+    try:
+        archive = io.BytesIO()
+        with zipfile.ZipFile(archive, 'w') as z:
+            z.write(pdf_path, 'batch/first.pdf')
+            z.write(pdf_path, 'batch/second.pdf')
+        files = {'files': ('batch-test.zip', archive.getvalue(), 'application/zip')}
+        response = requests.post(f"{API_BASE}/api/batch", files=files)
+        response.raise_for_status()
+        batch_id = response.json()['batch_id']
+        print(f"✓ Batch uploaded: {batch_id} ({len(response.json()['documents'])} documents)")
+        
+        deadline = time.time() + timeout
+        while time.time() < deadline:
+            batch = requests.get(f"{API_BASE}/api/batch/{batch_id}", params={'results': 'false'}).json()
+            print(f"  Batch progress: {batch['progress']}% {batch['counts']}")
+            if batch['status'] in ('completed', 'failed'):
+                if batch['total'] == 2 and batch['counts'].get('completed') == 2:
+                    print("✓ Batch completed")
+                    return True
+                print(f"✗ Batch finished with failures: {batch['counts']}")
+                return False
+            time.sleep(3)
+        
+        print(f"✗ Batch did not finish within {timeout}s")
+        return False
+    except Exception as e:
+        print(f"✗ Batch test failed: {e}")
+        return False
+
 def main():
     print("=" * 60)
     print("  ERNIE FinSight API Test")
@@ -131,6 +249,14 @@ def main():
         print("\n❌ Upload test failed")
         sys.exit(1)
     
+    if not test_cancel(pdf_path):
+        print("\n❌ Cancellation test failed")
+        sys.exit(1)
+    
+    if not test_batch(pdf_path):
+        print("\n❌ Batch test failed")
+        sys.exit(1)
+    
     print("\n" + "=" * 60)
     print("  ✓ All tests passed!")
     print("=" * 60)
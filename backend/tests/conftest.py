@@ -0,0 +1,41 @@
+import os
+import sys
+import tempfile
+from pathlib import Path
+
+import pytest
+
+BACKEND_DIR = Path(__file__).resolve().parent.parent
+
+# Tests import the backend modules the way main.py does (services.*, models.*)
+sys.path.insert(0, str(BACKEND_DIR))
+
+# main.py reads its configuration at import time: keep tests off the real
+# task database, caches and upload directory, and away from the provider
+_scratch = Path(tempfile.mkdtemp(prefix="finsight-tests-"))
+os.environ["NOVITA_API_KEY"] = ""
+os.environ["TASK_STORE"] = "memory"
+os.environ["CACHE_DIR"] = str(_scratch / "cache")
+os.environ["UPLOAD_DIR"] = str(_scratch / "uploads")
+
+
+@pytest.fixture(scope="session")
+def app_client():
+    """TestClient for the app, with its lifespan (job workers) running"""
+    from fastapi.testclient import TestClient
+    import main
+
+    with TestClient(main.app) as client:
+        yield client
+
+
+@pytest.fixture
+def sample_pdf(tmp_path):
+    """Factory writing a small generated text PDF and returning its bytes"""
+    from benchmark import make_sample_pdf
+
+    def make(pages=3, seed=0):
+        path = make_sample_pdf(tmp_path / f"sample-{seed}.pdf", pages=pages, seed=seed)
+        return Path(path).read_bytes()
+
+    return make
@@ -0,0 +1,90 @@
+import io
+import time
+import zipfile
+
+import main
+from benchmark import FakeCompletionClient
+from services.ernie_analyzer import ERNIEAnalyzer
+
+
+def _zip(members):
+    buffer = io.BytesIO()
+    with zipfile.ZipFile(buffer, "w") as archive:
+        for name, content in members.items():
+            archive.writestr(name, content)
+    return buffer.getvalue()
+
+
+def _wait_for_batch(client, batch_id, timeout=30):
+    deadline = time.monotonic() + timeout
+    while True:
+        batch = client.get(f"/api/batch/{batch_id}").json()
+        if batch["status"] in ("completed", "failed"):
+            return batch
+        assert time.monotonic() < deadline, f"batch still {batch['status']}"
+        time.sleep(0.05)
+
+
+def test_batch_of_files_and_a_zip(app_client, sample_pdf, monkeypatch):
+    analyzer = ERNIEAnalyzer("test-key")
+    analyzer.async_client = FakeCompletionClient(0.01)
+    monkeypatch.setattr(main, "ernie_analyzer", analyzer)
+    archive = _zip({"papers/b.pdf": sample_pdf(seed=952), "readme.txt": b"notes"})
+
+    response = app_client.post("/api/batch", files=[
+        ("files", ("a.pdf", sample_pdf(seed=951), "application/pdf")),
+        ("files", ("papers.zip", archive, "application/zip")),
+        ("files", ("notes.docx", b"not a pdf", "application/octet-stream")),
+    ])
+
+    assert response.status_code == 200
+    upload = response.json()
+    assert [document["filename"] for document in upload["documents"]] == ["a.pdf", "b.pdf"]
+    assert [item["filename"] for item in upload["rejected"]] == ["notes.docx"]
+
+    batch = _wait_for_batch(app_client, upload["batch_id"])
+
+    assert batch["status"] == "completed"
+    assert (batch["progress"], batch["total"], batch["counts"]) == (100, 2, {"completed": 2})
+    assert all(document["result"] for document in batch["documents"])
+    assert [item["filename"] for item in batch["rejected"]] == ["notes.docx"]
+
+
+def test_batch_status_counts_each_document(app_client, monkeypatch):
+    # Documents whose tasks are set directly, so no analysis runs
+    documents = [{"task_id": f"batch-961-{index}", "filename": f"{index}.pdf"} for index in range(4)]
+    states = [("completed", 100), ("failed", 100), ("processing", 50)]
+    for document, (status, progress) in zip(documents, states):
+        main.task_store.create(document["task_id"], {
+            "status": status, "progress": progress, "stage": status, "result": None, "error": None,
+        })
+    # The fourth task was deleted
+    main.batch_store.create("batch-961", {"status": "processing", "documents": documents, "rejected": []})
+
+    batch = app_client.get("/api/batch/batch-961", params={"results": False}).json()
+
+    assert batch["status"] == "processing"
+    assert batch["counts"] == {"completed": 1, "failed": 2, "processing": 1}
+    assert batch["progress"] == (100 + 100 + 50 + 100) // 4
+    assert batch["documents"][3]["error"] == "Task was deleted"
+
+    main.task_store.update("batch-961-2", status="failed", error="Analysis failed")
+    assert app_client.get("/api/batch/batch-961").json()["status"] == "completed"
+
+    for document in documents[:3]:
+        main.task_store.update(document["task_id"], status="failed")
+    assert app_client.get("/api/batch/batch-961").json()["status"] == "failed"
+
+
+def test_batch_without_any_pdf_is_rejected(app_client):
+    response = app_client.post("/api/batch", files=[
+        ("files", ("papers.zip", _zip({"readme.txt": b"notes"}), "application/zip")),
+        ("files", ("broken.zip", b"not a zip", "application/zip")),
+    ])
+
+    assert response.status_code == 400
+    assert "broken.zip: Not a valid ZIP archive" in response.json()["detail"]
+
+
+def test_unknown_batch(app_client):
+    assert app_client.get("/api/batch/unknown").status_code == 404
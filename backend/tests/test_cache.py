@@ -0,0 +1,192 @@
+import json
+import random
+import time
+
+import pytest
+
+import main
+from benchmark import FakeCompletionClient
+from services.cache import DiskLRUCache, ResultCache, TextCache
+from services.ernie_analyzer import ERNIEAnalyzer, SECTION_NAMES
+from services.job_queue import QueueFullError
+
+
+class DroppingCompletionClient(FakeCompletionClient):
+    """Fake client whose replies never contain one section"""
+
+    def __init__(self, seconds_per_section, dropped):
+        super().__init__(seconds_per_section)
+        self.dropped = dropped
+
+    async def create(self, **request):
+        response = await super().create(**request)
+        message = response.choices[0].message
+        sections = json.loads(message.content)
+        sections.pop(self.dropped, None)
+        message.content = json.dumps(sections)
+        return response
+
+
+def _wait_for_result(client, task_id):
+    response = client.get(f"/api/result/{task_id}", params={"wait": 30})
+    assert response.status_code == 200, f"task {task_id} did not finish"
+    return response.json()
+
+
+def _upload(client, content):
+    response = client.post("/api/upload", files={"file": ("paper.pdf", content, "application/pdf")})
+    assert response.status_code == 200
+    return response.json()["task_id"]
+
+
+def test_disk_cache_round_trip_and_stats(tmp_path):
+    cache = DiskLRUCache(tmp_path / "cache.db", max_bytes=1 << 20)
+
+    assert cache.get("a") is None
+    cache.put("a", b"value")
+    assert cache.get("a") == b"value"
+    cache.delete("a")
+    assert cache.get("a") is None
+
+    stats = cache.stats()
+    assert (stats["entries"], stats["hits"], stats["misses"]) == (0, 1, 2)
+
+
+def test_disk_cache_evicts_least_recently_read(tmp_path, monkeypatch):
+    clock = iter(range(1000, 2000))
+    monkeypatch.setattr(time, "time", lambda: next(clock))
+    # Random bytes do not compress, so each entry takes just over 400 bytes
+    values = {key: random.Random(key).randbytes(400) for key in "abc"}
+    cache = DiskLRUCache(tmp_path / "cache.db", max_bytes=900)
+
+    cache.put("a", values["a"])
+    cache.put("b", values["b"])
+    cache.get("a")
+    cache.put("c", values["c"])
+
+    assert cache.get("b") is None
+    assert cache.get("a") == values["a"]
+    assert cache.get("c") == values["c"]
+
+
+def test_disk_cache_expires_entries(tmp_path, monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(time, "time", lambda: now[0])
+    cache = DiskLRUCache(tmp_path / "cache.db", max_bytes=1 << 20, ttl_seconds=60)
+
+    cache.put("a", b"value")
+    now[0] += 59
+    assert cache.get("a") == b"value"
+    now[0] += 2
+    assert cache.get("a") is None
+
+
+def test_disk_cache_is_shared_through_the_file(tmp_path):
+    ResultCache(tmp_path / "cache.db", max_bytes=1 << 20).put_result("k", {"score": 1})
+
+    assert ResultCache(tmp_path / "cache.db", max_bytes=1 << 20).get_result("k") == {"score": 1}
+
+
+def test_result_cache_key_covers_every_input():
+    base = ("pdf", "text", "v1", "model")
+    keys = {ResultCache.make_key(*base)}
+    for position, other in enumerate(["pdf2", "text2", "v2", "model2"]):
+        changed = list(base)
+        changed[position] = other
+        keys.add(ResultCache.make_key(*changed))
+
+    assert len(keys) == 5
+    assert ResultCache.make_key(*base) == ResultCache.make_key(*base)
+
+
+def test_text_cache_restores_pages_from_offsets(tmp_path):
+    cache = TextCache(tmp_path / "text.db", max_bytes=1 << 20)
+    pages = ["First page.", "", "Third page."]
+    document = {
+        "text": "First page.\n\nThird page.",
+        "pages": pages,
+        "page_count": 3,
+        "pages_used": 3,
+        "complete": True,
+        "parse_count": 1,
+    }
+
+    cache.put_document("k", document)
+    cached = cache.get_document("k")
+
+    assert cached["pages"] == pages
+    assert cached["text"] == document["text"]
+    assert "parse_count" not in cached
+
+
+@pytest.mark.parametrize("stored, requested, hit", [
+    (1000, 1000, True),
+    (1000, 500, True),
+    (1000, 2000, False),
+    (1000, None, False),
+])
+def test_text_cache_truncated_document_covers_smaller_budgets(tmp_path, stored, requested, hit):
+    cache = TextCache(tmp_path / "text.db", max_bytes=1 << 20)
+    document = {"text": "x", "pages": ["x"], "page_count": 5, "pages_used": 1, "complete": False}
+
+    cache.put_document("k", document, char_budget=stored)
+
+    assert (cache.get_document("k", requested) is not None) == hit
+
+
+def test_result_with_placeholder_sections_is_not_cached(app_client, sample_pdf, monkeypatch):
+    dropped = SECTION_NAMES[-1]
+    analyzer = ERNIEAnalyzer("test-key")
+    analyzer.async_client = DroppingCompletionClient(0.01, dropped)
+    monkeypatch.setattr(main, "ernie_analyzer", analyzer)
+    content = sample_pdf(seed=601)
+
+    first = _wait_for_result(app_client, _upload(app_client, content))
+    assert first["status"] == "completed"
+    assert first["fallback_sections"] == [dropped]
+
+    analyzer.async_client = FakeCompletionClient(0.01)
+    second = _wait_for_result(app_client, _upload(app_client, content))
+    assert not second["cache_hit"]
+    assert second["fallback_sections"] == []
+
+    third = _wait_for_result(app_client, _upload(app_client, content))
+    assert third["cache_hit"]
+
+
+def test_reanalysis_bypasses_result_cache(app_client, sample_pdf, monkeypatch):
+    analyzer = ERNIEAnalyzer("test-key")
+    analyzer.async_client = FakeCompletionClient(0.01)
+    monkeypatch.setattr(main, "ernie_analyzer", analyzer)
+    content = sample_pdf(seed=602)
+
+    _wait_for_result(app_client, _upload(app_client, content))
+    task_id = _upload(app_client, content)
+    assert _wait_for_result(app_client, task_id)["cache_hit"]
+    calls = analyzer.async_client.calls
+
+    assert app_client.post(f"/api/analyze/{task_id}").status_code == 200
+    rerun = _wait_for_result(app_client, task_id)
+
+    assert rerun["status"] == "completed"
+    assert not rerun["cache_hit"]
+    assert analyzer.async_client.calls > calls
+
+
+def test_refused_reanalysis_keeps_the_previous_result(app_client, sample_pdf, monkeypatch):
+    analyzer = ERNIEAnalyzer("test-key")
+    analyzer.async_client = FakeCompletionClient(0.01)
+    monkeypatch.setattr(main, "ernie_analyzer", analyzer)
+    task_id = _upload(app_client, sample_pdf(seed=603))
+    before = _wait_for_result(app_client, task_id)
+
+    def queue_full(job_id, priority=None):
+        raise QueueFullError(7)
+
+    monkeypatch.setattr(main.job_queue, "submit", queue_full)
+    response = app_client.post(f"/api/analyze/{task_id}")
+
+    assert response.status_code == 429
+    assert app_client.get(f"/api/result/{task_id}").json() == before
+    status = app_client.get(f"/api/status/{task_id}").json()
+    assert (status["status"], status["stage"]) == ("completed", "completed")
@@ -0,0 +1,43 @@
+import time
+
+import pytest
+
+import main
+from benchmark import FakeCompletionClient
+from services.ernie_analyzer import ERNIEAnalyzer
+
+# How long DELETE may take to give a running analysis' completion slot back
+SLOT_RELEASE_SECONDS = 2.0
+
+
+def _completions_in_flight(client):
+    return client.get("/api/health").json()["completions"]["in_flight"]
+
+
+@pytest.mark.parametrize("mode, stream", [("monolithic", False), ("sectioned", True)])
+def test_delete_frees_completion_slot(app_client, sample_pdf, monkeypatch, mode, stream):
+    analyzer = ERNIEAnalyzer("test-key", analysis_mode=mode, stream=stream)
+    # Each completion would take 30s; only cancellation can end it sooner
+    analyzer.async_client = FakeCompletionClient(30)
+    monkeypatch.setattr(main, "ernie_analyzer", analyzer)
+
+    content = sample_pdf(seed=hash(mode) % 1000)
+    response = app_client.post("/api/upload", files={"file": ("paper.pdf", content, "application/pdf")})
+    assert response.status_code == 200
+    task_id = response.json()["task_id"]
+
+    deadline = time.monotonic() + 30
+    while _completions_in_flight(app_client) == 0:
+        assert time.monotonic() < deadline, "analysis never reached the model"
+        time.sleep(0.05)
+
+    started = time.monotonic()
+    assert app_client.delete(f"/api/task/{task_id}").status_code == 200
+    while _completions_in_flight(app_client) > 0:
+        assert time.monotonic() - started < SLOT_RELEASE_SECONDS, "completion slot still held after DELETE"
+        time.sleep(0.02)
+
+    assert app_client.get(f"/api/status/{task_id}").status_code == 404
+    assert not list(main.UPLOAD_DIR.glob(f"{task_id}_*"))
+    assert main.job_queue.stats()["running"] == 0
+
@@ -0,0 +1,56 @@
+import pytest
+
+from services.chunking import chunk_pages, split_text
+
+
+def test_split_text_keeps_short_text_whole():
+    assert split_text("short text", 100) == ["short text"]
+
+
+def test_split_text_prefers_paragraph_boundaries():
+    text = "first paragraph here\n\nsecond one\nwith two lines\n\nthird"
+
+    pieces = split_text(text, 30)
+
+    assert pieces == ["first paragraph here", "second one\nwith two lines", "third"]
+
+
+def test_split_text_falls_back_to_words_then_hard_cuts():
+    assert split_text("alpha beta gamma delta", 11) == ["alpha beta", "gamma delta"]
+    assert split_text("x" * 25, 10) == ["x" * 10, "x" * 10, "x" * 5]
+
+
+@pytest.mark.parametrize("max_chars", [40, 120, 1000])
+def test_chunk_pages_respects_the_size_limit(max_chars):
+    pages = [f"Page {number} says something. " * (number % 4 + 1) for number in range(1, 21)]
+
+    chunks = chunk_pages(pages, max_chars)
+
+    assert all(len(chunk["text"]) <= max_chars for chunk in chunks)
+    # Every page is covered, in order, without overlap between chunks
+    assert chunks[0]["start_page"] == 1
+    assert chunks[-1]["end_page"] == 20
+    for previous, chunk in zip(chunks, chunks[1:]):
+        assert chunk["start_page"] in (previous["end_page"], previous["end_page"] + 1)
+
+
+def test_chunk_pages_marks_pages_and_skips_empty_ones():
+    chunks = chunk_pages(["One.", "", "   ", "Four."], 1000)
+
+    assert chunks == [{"start_page": 1, "end_page": 4, "text": "[Page 1]\nOne.\n\n[Page 4]\nFour."}]
+
+
+def test_chunk_pages_splits_an_oversized_page():
+    page = "\n\n".join(f"Paragraph {number} of the long page." for number in range(10))
+
+    chunks = chunk_pages(["Intro.", page], 100)
+
+    assert len(chunks) > 2
+    assert all(len(chunk["text"]) <= 100 for chunk in chunks)
+    long_page = [chunk for chunk in chunks if chunk["start_page"] == 2]
+    assert all(chunk["text"].startswith("[Page 2]\n") for chunk in long_page)
+    assert "Paragraph 9 of the long page." in long_page[-1]["text"]
+
+
+def test_chunk_pages_without_text():
+    assert chunk_pages(["", None, "  "], 100) == []
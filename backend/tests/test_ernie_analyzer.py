@@ -0,0 +1,119 @@
+import asyncio
+from types import SimpleNamespace
+
+import httpx
+import pytest
+from openai import BadRequestError
+
+from benchmark import FakeCompletionClient
+from services.ernie_analyzer import ERNIEAnalyzer
+from services.execution import ExecutionLayer
+
+
+class RejectingCompletionClient:
+    """Fake client failing every request that asks for a response format"""
+
+    def __init__(self, error):
+        self.error = error
+        self.formats = []
+        self.chat = SimpleNamespace(completions=SimpleNamespace(create=self.create))
+
+    async def create(self, **request):
+        response_format = request.get("response_format", {}).get("type", "none")
+        self.formats.append(response_format)
+        if response_format != "none":
+            raise self.error
+        return SimpleNamespace(
+            choices=[SimpleNamespace(message=SimpleNamespace(content="{}"))],
+            usage=SimpleNamespace(prompt_tokens=10, completion_tokens=1),
+        )
+
+
+def _bad_request(message, param=None):
+    response = httpx.Response(400, request=httpx.Request("POST", "https://provider.test/chat/completions"))
+    return BadRequestError(message, response=response, body={"message": message, "param": param})
+
+
+@pytest.fixture
+def analyzer():
+    return ERNIEAnalyzer("test-key")
+
+
+def test_validate_section_normalizes_only_that_section(analyzer, capsys):
+    section = analyzer._validate_section("overall_assessment", {
+        "innovation_score": "high",
+        "technical_viability": 12,
+        "investment_recommendation": "Sell everything",
+    })
+
+    assert section["innovation_score"] == 5
+    assert section["technical_viability"] == 5
+    assert section["investment_recommendation"] == "Hold"
+    assert "executive_analysis" not in section
+    # Normalization logs instead of printing to the server's stdout
+    assert capsys.readouterr().out == ""
+
+
+def test_validate_section_rejects_values_its_model_refuses(analyzer):
+    assert analyzer._validate_section("tokenomics", {"flow_nodes": [{"id": "users"}]}) is None
+
+
+@pytest.mark.parametrize("error", [
+    _bad_request("Invalid value", param="response_format"),
+    _bad_request("json_schema is not supported by this model"),
+])
+def test_response_format_rejection_steps_down(error):
+    analyzer = ERNIEAnalyzer("test-key", response_format="auto")
+    analyzer.async_client = RejectingCompletionClient(error)
+
+    content, response_format = asyncio.run(analyzer._create_completion_async("text"))
+
+    assert (content, response_format) == ("{}", "none")
+    assert analyzer.async_client.formats == ["json_schema", "json_object", "none"]
+    assert analyzer.active_response_format == "none"
+
+
+def test_unrelated_bad_request_keeps_the_response_format():
+    analyzer = ERNIEAnalyzer("test-key", response_format="auto")
+    analyzer.async_client = RejectingCompletionClient(
+        _bad_request("This model's maximum context length is 8192 tokens", param="messages")
+    )
+
+    with pytest.raises(BadRequestError):
+        asyncio.run(analyzer._create_completion_async("text"))
+
+    assert analyzer.async_client.formats == ["json_schema"]
+    assert analyzer.active_response_format == "json_schema"
+
+
+def test_streamed_completion_reports_usage():
+    analyzer = ERNIEAnalyzer("test-key", stream=True)
+    analyzer.async_client = FakeCompletionClient(0)
+
+    asyncio.run(analyzer.analyze_whitepaper_async("Sample whitepaper text"))
+
+    assert analyzer.token_stats()["kinds"]["report"]["completion_tokens"] > 0
+
+
+def test_retrieval_index_is_built_in_the_execution_layer():
+    execution = ExecutionLayer(io_workers=2, cpu_workers=1)
+    calls = []
+    run_cpu = execution.run_cpu
+
+    async def spy(func, *args, **kwargs):
+        calls.append(func.__name__)
+        return await run_cpu(func, *args, **kwargs)
+
+    execution.run_cpu = spy
+    analyzer = ERNIEAnalyzer("test-key", analysis_mode="sectioned", execution=execution)
+    analyzer.async_client = FakeCompletionClient(0)
+    try:
+        timings = {}
+        asyncio.run(analyzer.analyze_whitepaper_async(
+            "Sample whitepaper text", timings=timings, pages=["Tokenomics and supply.", "Roadmap."]
+        ))
+    finally:
+        execution.shutdown()
+
+    assert calls == ["from_pages"]
+    assert "index_build" in timings
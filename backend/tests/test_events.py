@@ -0,0 +1,93 @@
+import json
+import threading
+import time
+
+import main
+from benchmark import FakeCompletionClient
+from services.ernie_analyzer import ERNIEAnalyzer
+
+
+def _upload(client, content):
+    response = client.post("/api/upload", files={"file": ("paper.pdf", content, "application/pdf")})
+    assert response.status_code == 200
+    return response.json()["task_id"]
+
+
+def _idle_task(task_id):
+    """A pending task that is not queued, so it never finishes on its own"""
+    main.task_store.create(task_id, {
+        "status": "pending", "filename": "paper.pdf", "file_path": None,
+        "progress": 0, "stage": "queued", "result": None, "error": None,
+    })
+
+
+def _events(client, task_id):
+    with client.stream("GET", f"/api/events/{task_id}") as response:
+        assert response.status_code == 200
+        text = "".join(response.iter_text())
+    events = []
+    for block in text.split("\n\n"):
+        fields = dict(line.split(": ", 1) for line in block.splitlines() if line.startswith(("event:", "data:")))
+        if "event" in fields:
+            events.append((fields["event"], json.loads(fields["data"])))
+    return events
+
+
+def test_event_stream_ends_with_the_result(app_client, sample_pdf, monkeypatch):
+    analyzer = ERNIEAnalyzer("test-key")
+    analyzer.async_client = FakeCompletionClient(0.05)
+    monkeypatch.setattr(main, "ernie_analyzer", analyzer)
+    task_id = _upload(app_client, sample_pdf(seed=901))
+
+    events = _events(app_client, task_id)
+
+    name, data = events[-1]
+    assert name == "result"
+    assert data["status"] == "completed"
+    assert data["result"] == app_client.get(f"/api/result/{task_id}").json()["result"]
+    assert all(name == "status" for name, _ in events[:-1])
+
+
+def test_event_stream_reports_a_deleted_task(app_client):
+    _idle_task("events-deleted")
+
+    def delete_once_watched():
+        while not main.event_broker.has_subscribers("events-deleted"):
+            time.sleep(0.01)
+        app_client.delete("/api/task/events-deleted")
+
+    deleter = threading.Thread(target=delete_once_watched)
+    deleter.start()
+    events = _events(app_client, "events-deleted")
+    deleter.join()
+
+    assert [name for name, _ in events] == ["status", "deleted"]
+    assert events[-1][1] == {"task_id": "events-deleted"}
+
+
+def test_event_stream_of_an_unknown_task(app_client):
+    assert app_client.get("/api/events/unknown").status_code == 404
+
+
+def test_long_poll_times_out_with_202(app_client):
+    _idle_task("longpoll-timeout")
+
+    started = time.monotonic()
+    response = app_client.get("/api/result/longpoll-timeout", params={"wait": 0.3})
+
+    assert response.status_code == 202
+    assert response.json()["status"] == "pending"
+    assert time.monotonic() - started >= 0.3
+    assert main.result_waiters == 0
+
+
+def test_long_poll_refused_at_the_waiter_cap(app_client, monkeypatch):
+    _idle_task("longpoll-capped")
+    monkeypatch.setattr(main, "RESULT_MAX_WAITERS", 0)
+
+    response = app_client.get("/api/result/longpoll-capped", params={"wait": 5})
+
+    assert response.status_code == 429
+    assert response.headers["Retry-After"] == "1"
+    # Without wait the request is answered at once, as before
+    assert app_client.get("/api/result/longpoll-capped").status_code == 400
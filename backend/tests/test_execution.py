@@ -0,0 +1,71 @@
+import asyncio
+import time
+
+from services.execution import CompletionGovernor, ExecutionLayer
+
+
+def _sleep_and_return(name, seconds):
+    time.sleep(seconds)
+    return name
+
+
+def test_cancelling_cpu_job_leaves_other_jobs_running():
+    """Recycling the pool for a cancelled job must not cancel other callers' jobs"""
+    async def scenario():
+        execution = ExecutionLayer(io_workers=2, cpu_workers=1)
+        try:
+            jobs = [
+                asyncio.create_task(execution.run_cpu(_sleep_and_return, name, 5 if name == "a" else 0.05))
+                for name in "abcdef"
+            ]
+            # Let job "a" start in the only worker process; b-f wait behind it
+            await asyncio.sleep(0.5)
+            jobs[0].cancel()
+            results = await asyncio.wait_for(asyncio.gather(*jobs, return_exceptions=True), 10)
+            return results, execution.pool_recycles
+        finally:
+            execution.shutdown()
+
+    results, recycles = asyncio.run(scenario())
+    assert isinstance(results[0], asyncio.CancelledError)
+    assert results[1:] == ["b", "c", "d", "e", "f"]
+    assert recycles == 1
+
+
+def test_cancelling_queued_cpu_job_does_not_recycle():
+    async def scenario():
+        execution = ExecutionLayer(io_workers=2, cpu_workers=1)
+        try:
+            jobs = [
+                asyncio.create_task(execution.run_cpu(_sleep_and_return, name, 0.5 if name == "a" else 0.05))
+                for name in "abcd"
+            ]
+            await asyncio.sleep(0.2)
+            # The last job is still waiting in the pool, not in a worker
+            jobs[-1].cancel()
+            results = await asyncio.gather(*jobs, return_exceptions=True)
+            return results[:-1], execution.pool_recycles
+        finally:
+            execution.shutdown()
+
+    assert asyncio.run(scenario()) == (["a", "b", "c"], 0)
+
+
+def test_governor_releases_slot_on_cancellation():
+    async def scenario():
+        governor = CompletionGovernor(max_in_flight=1)
+        holder_entered = asyncio.Event()
+
+        async def hold():
+            async with governor.slot():
+                holder_entered.set()
+                await asyncio.sleep(60)
+
+        holder = asyncio.create_task(hold())
+        await holder_entered.wait()
+        assert governor.stats()["in_flight"] == 1
+        holder.cancel()
+        await asyncio.gather(holder, return_exceptions=True)
+        return governor.stats()
+
+    assert asyncio.run(scenario())["in_flight"] == 0
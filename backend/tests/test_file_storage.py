@@ -0,0 +1,113 @@
+import asyncio
+import hashlib
+import io
+import zipfile
+
+import pytest
+
+import main
+from services.file_storage import FileTooLargeError, RequestBodyLimit, extract_zip_pdfs, stream_to_disk
+
+
+class _Source:
+    """Async readable over bytes, like UploadFile"""
+
+    def __init__(self, data):
+        self._buffer = io.BytesIO(data)
+
+    async def read(self, size=-1):
+        return self._buffer.read(size)
+
+
+def test_stream_to_disk_hashes_in_one_pass(tmp_path):
+    data = b"%PDF-1.4\n" + bytes(range(256)) * 5000
+    dest = tmp_path / "upload.pdf"
+    size, digest = asyncio.run(stream_to_disk(_Source(data), dest, len(data), chunk_size=4096))
+    assert size == len(data)
+    assert digest == hashlib.sha256(data).hexdigest()
+    assert dest.read_bytes() == data
+
+
+def test_stream_to_disk_stops_at_limit_and_removes_partial_file(tmp_path):
+    dest = tmp_path / "big.pdf"
+    with pytest.raises(FileTooLargeError):
+        asyncio.run(stream_to_disk(_Source(b"x" * 10000), dest, 5000, chunk_size=1024))
+    assert not dest.exists()
+
+
+def test_oversized_upload_rejected_before_body_is_read(app_client):
+    limit = main.MAX_FILE_SIZE_MB * 1024 * 1024
+    response = app_client.post(
+        "/api/upload",
+        content=b"",
+        headers={"Content-Type": "multipart/form-data; boundary=x", "Content-Length": str(limit * 2)},
+    )
+    assert response.status_code == 413
+
+
+def test_chunked_upload_cut_off_at_limit(app_client):
+    limit = main.MAX_FILE_SIZE_MB * 1024 * 1024
+    chunk = b"0" * (1024 * 1024)
+    content = iter([b'--x\r\nContent-Disposition: form-data; name="file"; filename="big.pdf"\r\n\r\n']
+                   + [chunk] * (main.MAX_FILE_SIZE_MB * 3))
+    response = app_client.post(
+        "/api/upload", content=content, headers={"Content-Type": "multipart/form-data; boundary=x"}
+    )
+    assert response.status_code == 413
+
+
+def test_body_limit_stops_reading_once_limit_is_crossed():
+    """Without Content-Length the body is read only until the limit, not to its end"""
+    pulled = 0
+
+    async def receive():
+        nonlocal pulled
+        pulled += 1
+        return {"type": "http.request", "body": b"0" * 1000, "more_body": pulled < 100}
+
+    async def drain_body(scope, receive, send):
+        while (await receive()).get("more_body"):
+            pass
+
+    async def send(message):
+        pass
+
+    middleware = RequestBodyLimit(drain_body, {"/api/upload": 5000})
+    scope = {"type": "http", "path": "/api/upload", "headers": [(b"transfer-encoding", b"chunked")]}
+    with pytest.raises(Exception) as error:
+        asyncio.run(middleware(scope, receive, send))
+    assert getattr(error.value, "status_code", None) == 413
+    assert pulled == 6
+
+
+def test_extract_zip_pdfs_applies_the_batch_limits(tmp_path):
+    archive = tmp_path / "batch.zip"
+    with zipfile.ZipFile(archive, "w", zipfile.ZIP_DEFLATED) as zf:
+        zf.writestr("papers/", "")
+        zf.writestr("papers/a.pdf", b"%PDF-1.4 a")
+        zf.writestr("__MACOSX/papers/._a.pdf", b"metadata")
+        zf.writestr("notes.txt", b"not a paper")
+        zf.writestr("big.pdf", b"%PDF-1.4 " + b"0" * 100)
+        zf.writestr("../b.pdf", b"%PDF-1.4 b")
+        zf.writestr("c.pdf", b"%PDF-1.4 c")
+    extracted = tmp_path / "extracted"
+    extracted.mkdir()
+
+    entries = extract_zip_pdfs(archive, lambda name: extracted / name, max_member_bytes=50, max_members=2)
+
+    assert [(entry["filename"], "path" in entry) for entry in entries] == [
+        ("a.pdf", True), ("big.pdf", False), ("b.pdf", True), ("c.pdf", False),
+    ]
+    assert "exceeds maximum allowed size" in entries[1]["error"]
+    assert entries[3]["error"] == "Batch is limited to 2 files"
+    # Members land under the destination whatever path the archive gives them
+    assert sorted(path.name for path in extracted.iterdir()) == ["a.pdf", "b.pdf"]
+    assert entries[2]["sha256"] == hashlib.sha256(b"%PDF-1.4 b").hexdigest()
+
+
+def test_extract_zip_pdfs_rejects_a_non_archive(tmp_path):
+    archive = tmp_path / "fake.zip"
+    archive.write_bytes(b"%PDF-1.4 not a zip")
+
+    with pytest.raises(zipfile.BadZipFile):
+        extract_zip_pdfs(archive, lambda name: tmp_path / name, max_member_bytes=50, max_members=2)
@@ -0,0 +1,141 @@
+import asyncio
+
+import pytest
+
+from models.schemas import JobPriority
+from services.job_queue import JobQueue, QueueFullError
+
+
+def test_priority_order_and_fifo_within_class():
+    async def scenario():
+        order = []
+        queue = JobQueue(max_depth=10, workers=1)
+        queue.submit("low", JobPriority.LOW)
+        queue.submit("normal-1", JobPriority.NORMAL)
+        queue.submit("high", JobPriority.HIGH)
+        queue.submit("normal-2", JobPriority.NORMAL)
+        assert [queue.position(job) for job in ("high", "normal-1", "normal-2", "low")] == [1, 2, 3, 4]
+
+        async def handler(job_id):
+            order.append(job_id)
+
+        queue.start(handler)
+        while len(order) < 4:
+            await asyncio.sleep(0.01)
+        await queue.stop()
+        return order
+
+    assert asyncio.run(scenario()) == ["high", "normal-1", "normal-2", "low"]
+
+
+def test_full_queue_raises_with_retry_after():
+    queue = JobQueue(max_depth=2, workers=4)
+    queue.submit("a")
+    queue.submit("b")
+    # Resubmitting a waiting job is not a new job
+    assert queue.submit("a") == 1
+    assert not queue.has_capacity()
+    with pytest.raises(QueueFullError) as error:
+        queue.submit("c")
+    assert 1 <= error.value.retry_after <= 3600
+
+
+def test_cancel_waiting_job_skips_it():
+    async def scenario():
+        ran = []
+        queue = JobQueue(max_depth=10, workers=1)
+        for job_id in ("a", "b", "c"):
+            queue.submit(job_id)
+        assert queue.cancel("b")
+        assert queue.position("b") is None and queue.position("c") == 2
+        assert not queue.cancel("unknown")
+
+        async def handler(job_id):
+            ran.append(job_id)
+
+        queue.start(handler)
+        while len(ran) < 2:
+            await asyncio.sleep(0.01)
+        await asyncio.sleep(0.05)
+        await queue.stop()
+        return ran, queue.depth
+
+    assert asyncio.run(scenario()) == (["a", "c"], 0)
+
+
+def test_cancel_running_job_keeps_worker_alive():
+    async def scenario():
+        started, finished, unwound = asyncio.Event(), [], []
+        queue = JobQueue(max_depth=10, workers=1)
+
+        async def handler(job_id):
+            if job_id == "slow":
+                started.set()
+                try:
+                    await asyncio.sleep(60)
+                finally:
+                    unwound.append(job_id)
+            finished.append(job_id)
+
+        queue.start(handler)
+        queue.submit("slow")
+        await started.wait()
+        assert queue.is_running("slow")
+        assert queue.cancel("slow")
+        assert await queue.wait_stopped("slow", 1)
+        # The same worker picks up the next job
+        queue.submit("next")
+        while "next" not in finished:
+            await asyncio.sleep(0.01)
+        await queue.stop()
+        # Only the job that finished counts as drained
+        return unwound, finished, queue.stats()["running"], len(queue._completions)
+
+    assert asyncio.run(scenario()) == (["slow"], ["next"], 0, 1)
+
+
+def test_failing_job_does_not_stop_worker():
+    async def scenario():
+        done = []
+        queue = JobQueue(max_depth=10, workers=1)
+
+        async def handler(job_id):
+            if job_id == "bad":
+                raise RuntimeError("boom")
+            done.append(job_id)
+
+        queue.start(handler)
+        queue.submit("bad")
+        queue.submit("good")
+        while not done:
+            await asyncio.sleep(0.01)
+        await queue.stop()
+        return done
+
+    assert asyncio.run(scenario()) == ["good"]
+
+
+def test_promote_moves_a_waiting_job_up():
+    async def scenario():
+        order = []
+        queue = JobQueue(max_depth=10, workers=1)
+        queue.submit("low", JobPriority.LOW)
+        queue.submit("normal", JobPriority.NORMAL)
+        queue.submit("high", JobPriority.HIGH)
+        assert queue.promote("low", JobPriority.HIGH)
+        # Never moved down, and unknown jobs are ignored
+        assert not queue.promote("normal", JobPriority.LOW)
+        assert not queue.promote("unknown", JobPriority.HIGH)
+        assert [queue.position(job) for job in ("low", "high", "normal")] == [1, 2, 3]
+
+        async def handler(job_id):
+            order.append(job_id)
+
+        queue.start(handler)
+        while len(order) < 3:
+            await asyncio.sleep(0.01)
+        await asyncio.sleep(0.05)
+        await queue.stop()
+        return order, queue.depth
+
+    assert asyncio.run(scenario()) == (["low", "high", "normal"], 0)
@@ -0,0 +1,72 @@
+import json
+
+import pytest
+
+from services.json_scanner import SectionStreamParser, extract_json_object
+
+OBJECT = (
+    '{"a": {"text": "braces } and { \\"quotes\\" inside", "items": [1, {"b": 2}]},'
+    ' "count": 3, "name": "x, y", "flag": true}'
+)
+REPORT = f"```json\n{OBJECT}\n```"
+
+
+def _feed(parser, text, size):
+    return [member for start in range(0, len(text), size) for member in parser.feed(text[start:start + size])]
+
+
+@pytest.mark.parametrize("text, expected, repaired", [
+    ('Here you go: {"a": 1} hope that helps', {"a": 1}, False),
+    ('<tool_call>{"x": 1}</tool_call>\n{"a": 2}', {"a": 2}, False),
+    ('{"a": [1, 2,], "b": 1,}', {"a": [1, 2], "b": 1}, True),
+    ('{"a": [1, 2}', {"a": [1, 2]}, True),
+    ('{"a": "cut off', {"a": "cut off"}, True),
+    ('{"a": "ends in \\u00', {"a": "ends in "}, True),
+    ('{"a": 1, "b": ', {"a": 1, "b": None}, True),
+    ('{"a": 1, "dangling', {"a": 1}, True),
+    ('{"a": {"b": 12', {"a": {"b": 12}}, True),
+])
+def test_extract_json_object_repairs_responses(text, expected, repaired):
+    json_text, was_repaired = extract_json_object(text)
+
+    assert json.loads(json_text) == expected
+    assert was_repaired == repaired
+
+
+def test_extract_json_object_without_an_object():
+    assert extract_json_object("no json here") == ("", False)
+
+
+@pytest.mark.parametrize("size", [1, 2, 7, len(REPORT)])
+def test_stream_parser_yields_each_member_as_it_closes(size):
+    parser = SectionStreamParser()
+
+    members = _feed(parser, REPORT, size)
+
+    assert members == list(json.loads(OBJECT).items())
+    assert parser.done
+    assert parser.text == REPORT
+
+
+def test_stream_parser_yields_members_before_the_object_closes():
+    parser = SectionStreamParser()
+
+    assert parser.feed('{"a": {"x": 1}, "b": {"y"') == [("a", {"x": 1})]
+    assert not parser.done
+    assert parser.feed(': 2}}') == [("b", {"y": 2})]
+    assert parser.done
+
+
+def test_stream_parser_skips_invalid_members():
+    parser = SectionStreamParser()
+
+    assert _feed(parser, '{"a": {oops}, "b": [1]}', 3) == [("b", [1])]
+
+
+def test_stream_parser_keeps_only_the_member_being_read():
+    parser = SectionStreamParser()
+    parser.feed('{"first": {"x": "' + "y" * 1000 + '"}, "second": {"z": "')
+    parser.feed("partial")
+
+    # The finished member is no longer held, only the open one
+    assert "".join(parser._captured) == '{"z": "partial'
@@ -0,0 +1,54 @@
+from services.passage_index import PassageIndex, section_query, tokenize
+
+PAGES = [
+    "Introduction to the protocol and its community.",
+    "",
+    "Tokenomics: the total supply is 1,000,000,000 tokens with a 2% inflation rate.",
+    "The roadmap lists milestones for mainnet launch and governance.",
+]
+
+
+def test_tokenize_folds_case_plurals_and_stopwords():
+    assert tokenize("The Milestones of our Strategies") == ["milestone", "strategy"]
+    assert tokenize("代币 supply") == ["代", "币", "supply"]
+
+
+def test_passages_keep_their_page_numbers():
+    index = PassageIndex.from_pages(PAGES)
+
+    assert [passage["page"] for passage in index.passages] == [1, 3, 4]
+
+
+def test_long_pages_are_split_into_passages():
+    page = "\n\n".join(f"Paragraph {number} about staking rewards." for number in range(50))
+
+    index = PassageIndex.from_pages([page], passage_chars=200)
+
+    assert len(index.passages) > 1
+    assert all(len(passage["text"]) <= 200 for passage in index.passages)
+    assert {passage["page"] for passage in index.passages} == {1}
+
+
+def test_search_ranks_matching_passages_first():
+    index = PassageIndex.from_pages(PAGES)
+
+    hits = index.search(["total", "supply", "inflation"], k=3)
+
+    assert [index.passages[position]["page"] for _, position in hits] == [3]
+    assert index.search(["milestones"], k=3)[0][1] == 2
+    assert index.search(["unrelated"], k=3) == []
+
+
+def test_search_returns_at_most_k_best_first():
+    index = PassageIndex.from_pages([f"staking {'staking ' * number}filler text" for number in range(6)])
+
+    hits = index.search(["staking"], k=2)
+
+    assert len(hits) == 2
+    assert hits[0][0] >= hits[1][0]
+
+
+def test_section_query_drops_generic_field_words():
+    assert section_query("tokenomics", ["total_supply", "distribution", "overview_details"]) == [
+        "tokenomics", "total", "supply", "distribution",
+    ]
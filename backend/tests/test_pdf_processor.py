@@ -0,0 +1,94 @@
+import pytest
+
+from benchmark import make_sample_pdf
+from services.pdf_processor import PDFDocument, PDFProcessor, page_text_issue
+
+
+def test_page_text_issue_flags_poor_text():
+    prose = " ".join(["token supply"] * 20)
+
+    assert page_text_issue(prose) is None
+    assert page_text_issue("  \n ") == "empty"
+    assert page_text_issue("Page 1", 612, 792) == "low_density"
+    assert page_text_issue(" ".join(["tokensupplyandemission"] * 20)) == "broken_spacing"
+    assert page_text_issue(" ".join("spaced letters") * 5) == "broken_spacing"
+
+
+def test_clean_pages_are_read_with_one_parse(tmp_path):
+    path = make_sample_pdf(tmp_path / "clean.pdf", pages=4, seed=801)
+
+    with PDFDocument(path) as doc:
+        records = list(doc.iter_page_records())
+
+        assert doc.page_count == 4
+        assert [record["page"] for record in records] == [1, 2, 3, 4]
+        assert {record["extractor"] for record in records} == {"pypdf2"}
+        assert doc.parse_count == 1
+
+
+def test_only_poor_pages_are_escalated(tmp_path):
+    # Every second page positions each word separately, without spaces
+    path = make_sample_pdf(tmp_path / "kerned.pdf", pages=4, seed=802, kerned_every=2)
+
+    with PDFDocument(path) as doc:
+        records = list(doc.iter_page_records())
+
+    assert [(record["extractor"], record["reason"]) for record in records] == [
+        ("pypdf2", None), ("pdfplumber", "broken_spacing"),
+        ("pypdf2", None), ("pdfplumber", "broken_spacing"),
+    ]
+    assert len(records[1]["text"].split()) > 100
+
+
+def test_short_pages_are_escalated(tmp_path):
+    path = make_sample_pdf(tmp_path / "short.pdf", pages=2, seed=803, lines_per_page=0)
+
+    with PDFDocument(path) as doc:
+        records = list(doc.iter_page_records())
+
+    assert {record["reason"] for record in records} == {"low_density"}
+    assert records[0]["text"] == "Sample Whitepaper - Page 1"
+
+
+def test_budget_stops_extraction_early(tmp_path):
+    path = make_sample_pdf(tmp_path / "budget.pdf", pages=6, seed=804)
+
+    with PDFDocument(path) as doc:
+        extracted = doc.extract_text_budgeted(3000)
+
+    assert extracted["pages_used"] == 1
+    assert not extracted["complete"]
+    assert len(extracted["pages"]) == 1
+    assert extracted["extraction"]["extractors"] == {"pypdf2": 1}
+
+    with PDFDocument(path) as doc:
+        assert doc.extract_text_budgeted(None)["complete"]
+
+
+@pytest.mark.parametrize("page_count, workers, threshold, expected", [
+    (10, 1, 4, [(0, 10)]),
+    (3, 4, 4, [(0, 3)]),
+    (10, 4, 4, [(0, 3), (3, 6), (6, 8), (8, 10)]),
+    (5, 8, 2, [(0, 1), (1, 2), (2, 3), (3, 4), (4, 5)]),
+])
+def test_plan_shards_covers_the_document_in_order(page_count, workers, threshold, expected):
+    assert PDFProcessor.plan_shards(page_count, workers, threshold) == expected
+
+
+def test_extract_page_range_pads_unread_pages(tmp_path):
+    path = make_sample_pdf(tmp_path / "range.pdf", pages=6, seed=805)
+
+    records = PDFProcessor.extract_page_range(str(path), 4, 8)
+
+    assert [record["page"] for record in records] == [5, 6, 7, 8]
+    assert records[1]["text"].startswith("Sample Whitepaper - Page 6")
+    assert [(record["text"], record["reason"]) for record in records[2:]] == [("", "error")] * 2
+
+
+def test_extract_page_range_of_an_unreadable_file(tmp_path):
+    path = tmp_path / "broken.pdf"
+    path.write_bytes(b"not a pdf")
+
+    records = PDFProcessor.extract_page_range(str(path), 0, 2)
+
+    assert [(record["page"], record["reason"]) for record in records] == [(1, "error"), (2, "error")]
@@ -0,0 +1,43 @@
+import subprocess
+import sys
+
+import main
+from benchmark import FakeAnalyzer
+
+
+def _dead_pid():
+    process = subprocess.Popen([sys.executable, "-c", "pass"])
+    process.wait()
+    return process.pid
+
+
+def test_restart_requeues_or_fails_orphaned_tasks(app_client, sample_pdf, monkeypatch):
+    monkeypatch.setattr(main, "ernie_analyzer", FakeAnalyzer(0.01))
+    dead_owner = {"pid": _dead_pid(), "instance": "previous-run"}
+    upload = main.UPLOAD_DIR / "orphan_paper.pdf"
+    upload.write_bytes(sample_pdf(seed=31))
+
+    main.task_store.create("orphan-with-upload", {
+        "status": "processing", "progress": 50, "stage": "analyzing", "file_path": str(upload),
+        "content_hash": "orphan-hash", "owner": dead_owner, "timings": {},
+    })
+    main.task_store.create("orphan-without-upload", {
+        "status": "pending", "progress": 0, "stage": "queued",
+        "file_path": str(main.UPLOAD_DIR / "gone.pdf"), "owner": dead_owner,
+    })
+    main.task_store.create("live-sibling", {
+        "status": "processing", "progress": 50, "stage": "analyzing",
+        "file_path": str(upload), "owner": main.PROCESS_OWNER,
+    })
+
+    app_client.portal.call(main.recover_orphaned_tasks)
+
+    result = app_client.get("/api/result/orphan-with-upload", params={"wait": 10}).json()
+    assert result["status"] == "completed"
+    failed = main.task_store.get("orphan-without-upload")
+    assert failed["status"] == "failed" and "upload it again" in failed["error"]
+    # Tasks owned by a running process are left to it
+    assert main.task_store.get("live-sibling")["stage"] == "analyzing"
+
+    for task_id in ("orphan-with-upload", "orphan-without-upload", "live-sibling"):
+        main.task_store.delete(task_id)
@@ -0,0 +1,117 @@
+import asyncio
+
+import main
+from benchmark import FakeCompletionClient
+from services.ernie_analyzer import ERNIEAnalyzer
+from services.job_queue import JobQueue
+from services.single_flight import SingleFlight
+
+
+def test_first_task_leads_and_later_ones_follow():
+    flight = SingleFlight()
+
+    assert flight.attach("pdf", "a") is None
+    assert flight.attach("pdf", "b") == "a"
+    assert flight.attach("pdf", "c") == "a"
+    assert flight.attach("other", "d") is None
+
+    assert flight.followers("a") == ["b", "c"]
+    assert flight.leader_of("c") == "a"
+    assert flight.leader_of("a") is None
+    assert flight.stats() == {"in_flight": 2, "followers": 2, "coalesced": 2}
+
+
+def test_leader_can_attach_again():
+    flight = SingleFlight()
+    flight.attach("pdf", "a")
+
+    assert flight.attach("pdf", "a") is None
+    assert flight.followers("a") == []
+
+
+def test_detach_removes_a_follower():
+    flight = SingleFlight()
+    flight.attach("pdf", "a")
+    flight.attach("pdf", "b")
+    flight.attach("pdf", "c")
+
+    flight.detach("b")
+    flight.detach("a")  # not a follower: nothing to do
+
+    assert flight.followers("a") == ["c"]
+    assert flight.leader_of("b") is None
+
+
+def test_finish_releases_the_key_and_returns_followers():
+    flight = SingleFlight()
+    flight.attach("pdf", "a")
+    flight.attach("pdf", "b")
+
+    assert flight.finish("a") == ["b"]
+    assert flight.leader_of("b") is None
+    assert flight.stats()["in_flight"] == 0
+    # The next task for the key runs on its own
+    assert flight.attach("pdf", "c") is None
+    assert flight.finish("unknown") == []
+
+
+def _upload(client, content):
+    response = client.post("/api/upload", files={"file": ("paper.pdf", content, "application/pdf")})
+    assert response.status_code == 200
+    return response.json()["task_id"]
+
+
+def _result(client, task_id):
+    response = client.get(f"/api/result/{task_id}", params={"wait": 30})
+    assert response.status_code == 200
+    return response.json()
+
+
+def test_identical_uploads_share_one_analysis(app_client, sample_pdf, monkeypatch):
+    analyzer = ERNIEAnalyzer("test-key")
+    analyzer.async_client = FakeCompletionClient(0.05)
+    monkeypatch.setattr(main, "ernie_analyzer", analyzer)
+    content = sample_pdf(seed=701)
+
+    leader = _upload(app_client, content)
+    follower = _upload(app_client, content)
+    assert main.single_flight.leader_of(follower) == leader
+
+    leader_result, follower_result = _result(app_client, leader), _result(app_client, follower)
+
+    assert leader_result["status"] == follower_result["status"] == "completed"
+    assert follower_result["result"] == leader_result["result"]
+    assert analyzer.async_client.calls == 1
+    assert main.single_flight.leader_of(follower) is None
+
+
+def test_deleted_leader_keeps_running_for_its_followers(app_client, sample_pdf, monkeypatch):
+    analyzer = ERNIEAnalyzer("test-key")
+    analyzer.async_client = FakeCompletionClient(0.05)
+    monkeypatch.setattr(main, "ernie_analyzer", analyzer)
+    content = sample_pdf(seed=702)
+
+    leader = _upload(app_client, content)
+    follower = _upload(app_client, content)
+    assert app_client.delete(f"/api/task/{leader}").status_code == 200
+
+    assert _result(app_client, follower)["status"] == "completed"
+    assert app_client.get(f"/api/status/{leader}").status_code == 404
+
+
+def test_released_follower_is_no_longer_coalesced(monkeypatch):
+    # A queue without workers keeps the re-enqueued tasks waiting
+    monkeypatch.setattr(main, "job_queue", JobQueue())
+    monkeypatch.setattr(main, "single_flight", SingleFlight())
+    for task_id in ("lead-703", "first-703", "second-703"):
+        main.task_store.create(task_id, {"status": "pending", "content_hash": "hash-703"})
+    main.single_flight.attach("hash-703", "lead-703")
+    for follower in ("first-703", "second-703"):
+        main.single_flight.attach("hash-703", follower)
+        main.task_store.update(follower, coalesced_with="lead-703")
+
+    asyncio.run(main.release_followers("lead-703"))
+
+    assert main.task_store.get("first-703")["coalesced_with"] is None
+    assert main.job_queue.position("first-703") == 1
+    assert main.task_store.get("second-703")["coalesced_with"] == "first-703"
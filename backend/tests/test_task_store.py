@@ -0,0 +1,76 @@
+import time
+
+import pytest
+
+from models.schemas import TaskStatus
+from services.task_store import InMemoryTaskStore, SQLiteTaskStore, create_task_store
+
+
+@pytest.fixture(params=["memory", "sqlite"])
+def store(request, tmp_path):
+    store = create_task_store(request.param, str(tmp_path / "tasks.db"))
+    yield store
+    store.close()
+
+
+def test_create_factory_kinds(tmp_path):
+    assert isinstance(create_task_store("memory"), InMemoryTaskStore)
+    assert isinstance(create_task_store("sqlite", str(tmp_path / "t.db")), SQLiteTaskStore)
+
+
+def test_get_returns_snapshot(store):
+    store.create("t1", {"status": TaskStatus.PENDING, "progress": 0, "timings": {}})
+    snapshot = store.get("t1")
+    snapshot["timings"]["extract"] = 1.0
+    assert store.get("t1")["timings"] == {}
+    assert snapshot["status"] == "pending"
+    assert "t1" in store
+    assert store.get("missing") is None
+
+
+def test_update_merges_fields_and_reports_missing(store):
+    store.create("t1", {"status": TaskStatus.PENDING, "progress": 0, "stage": "queued"})
+    assert store.update("t1", status=TaskStatus.PROCESSING, progress=40, stage="analyzing")
+    record = store.get("t1")
+    assert (record["status"], record["progress"], record["stage"]) == ("processing", 40, "analyzing")
+    assert store.update("missing", progress=1) is False
+
+
+def test_update_if_checks_expected_values(store):
+    owner = {"pid": 1, "instance": "a"}
+    store.create("t1", {"status": TaskStatus.PROCESSING, "progress": 10, "owner": owner})
+    assert not store.update_if("t1", {"owner": {"pid": 1, "instance": "b"}}, progress=0)
+    assert not store.update_if("t1", {"status": TaskStatus.PENDING}, progress=0)
+    assert store.update_if("t1", {"owner": owner, "status": TaskStatus.PROCESSING}, owner=None, progress=0)
+    # The first claim changed the owner, so a second one with the old owner fails
+    assert not store.update_if("t1", {"owner": owner}, progress=5)
+    assert store.get("t1")["progress"] == 0
+    assert not store.update_if("missing", {}, progress=1)
+
+
+def test_find_and_count_by_status(store):
+    store.create("a", {"status": TaskStatus.PENDING, "progress": 0})
+    store.create("b", {"status": TaskStatus.PROCESSING, "progress": 50})
+    store.create("c", {"status": TaskStatus.COMPLETED, "progress": 100})
+    found = store.find_by_status([TaskStatus.PENDING, TaskStatus.PROCESSING])
+    assert sorted(found) == ["a", "b"]
+    assert found["b"]["progress"] == 50
+    assert store.find_by_status([]) == {}
+    assert store.count_by_status() == {"pending": 1, "processing": 1, "completed": 1}
+
+
+def test_delete_and_purge(store):
+    store.create("old", {"status": TaskStatus.COMPLETED, "progress": 100, "created_at": time.time() - 7200})
+    store.create("new", {"status": TaskStatus.PENDING, "progress": 0})
+    assert store.purge(3600) == 1
+    assert store.get("old") is None
+    assert store.delete("new")
+    assert not store.delete("new")
+
+
+def test_sqlite_store_is_shared_between_instances(tmp_path):
+    path = str(tmp_path / "shared.db")
+    writer, reader = SQLiteTaskStore(path), SQLiteTaskStore(path)
+    writer.create("t1", {"status": TaskStatus.PENDING, "progress": 0, "result": None})
+    writer.update("t1", status=TaskStatus.COMPLETED, progress=100, result={"ok": True})
+    assert reader.get("t1")["result"] == {"ok": True}
@@ -0,0 +1,82 @@
+from services.text_normalizer import normalize_pages
+
+
+# Page numbers in tests stay below 12, so every body line is unique
+WORDS = "alpha beta gamma delta epsilon zeta eta theta iota kappa lambda omicron".split()
+
+
+def _page(number, footer=None):
+    lines = [f"Body line on {WORDS[number]} {WORDS[index]} about the protocol." for index in range(6)]
+    if footer is not None:
+        lines.append(footer)
+    return "\n".join(lines)
+
+
+def test_numbered_pages_lose_their_page_numbers():
+    pages = [_page(number, footer=f"Page {number} of 5") for number in range(1, 6)]
+
+    normalized, stats = normalize_pages(pages)
+
+    assert not any("of 5" in page for page in normalized)
+    assert stats["removed"]["page_numbers"] > 0
+
+
+def test_roman_front_matter_numbers_are_dropped():
+    pages = [_page(number, footer=numeral) for number, numeral in enumerate(["i", "ii", "iii", "iv", "v", "vi"])]
+
+    normalized, _ = normalize_pages(pages)
+
+    assert all(page.splitlines()[-1].startswith("Body line") for page in normalized)
+
+
+def test_words_and_years_at_page_edges_are_kept():
+    pages = [_page(number, footer=str(number)) for number in range(1, 9)]
+    pages[2] = "civic\n" + pages[2]
+    pages[3] = "ill\n" + pages[3]
+    pages[4] = "Vic\n" + pages[4]
+    pages[5] = "2021\n" + pages[5]
+
+    normalized, _ = normalize_pages(pages)
+
+    assert [page.splitlines()[0] for page in normalized[2:6]] == ["civic", "ill", "Vic", "2021"]
+    # The footers are still recognized as page numbers
+    assert all(page.splitlines()[-1].startswith("Body line") for page in normalized)
+
+
+def test_lone_numbers_are_kept_when_pages_are_not_numbered():
+    pages = [_page(number) for number in range(1, 9)]
+    pages[0] = "2021\n" + pages[0]
+    pages[5] = _page(5, footer="42")
+
+    normalized, stats = normalize_pages(pages)
+
+    assert normalized[0].startswith("2021\n")
+    assert normalized[5].endswith("\n42")
+    assert stats["removed"]["page_numbers"] == 0
+
+
+def test_repeated_headers_and_hyphenation():
+    pages = [f"ACME Whitepaper v1.0\n{_page(number)}" for number in range(1, 6)]
+    pages[0] = pages[0].replace("the protocol", "its token-\nomics")
+    pages[1] = pages[1].replace("the protocol", "Proof-\nof-Stake")
+    pages[2] = pages[2].replace("the protocol", "a peer-to-\npeer network")
+    pages[3] = pages[3].replace("the protocol", "state-\nof-the-art tooling")
+
+    normalized, stats = normalize_pages(pages)
+
+    assert all("ACME Whitepaper" not in page for page in normalized)
+    assert "about its tokenomics." in normalized[0]
+    # Hyphenated compounds broken across a line are not joined
+    assert "Proofof" not in normalized[1]
+    assert "topeer" not in normalized[2]
+    assert "stateof" not in normalized[3]
+    assert stats["repeated_lines"] == ["ACME Whitepaper v1.0"]
+
+
+def test_numbering_may_start_after_an_unnumbered_cover():
+    pages = ["Cover title"] + [_page(number, footer=f"- {number} -") for number in range(1, 6)]
+
+    normalized, _ = normalize_pages(pages)
+
+    assert normalized[0] == "Cover title"
+    assert not any(page.endswith("-") for page in normalized)
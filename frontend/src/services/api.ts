@@ -20,6 +20,7 @@ export interface TaskStatus {
   status: "pending" | "processing" | "completed" | "failed";
   message?: string;
   progress?: number;
+  stage?: string;
 }
 
 export interface TaskResult {
@@ -29,6 +30,14 @@ export interface TaskResult {
   error?: string;
 }
 
+// The task no longer exists on the server; polling would only get 404s
+export class TaskDeletedError extends Error {
+  constructor(taskId: string) {
+    super(`Task ${taskId} was deleted`);
+    this.name = "TaskDeletedError";
+  }
+}
+
 export const apiService = {
   uploadWhitepaper: async (file: File): Promise<UploadResponse> => {
     const formData = new FormData();
@@ -53,11 +62,54 @@ export const apiService = {
     return response.data;
   },
 
+  watchTaskEvents: (
+    taskId: string,
+    onProgress?: (status: TaskStatus) => void
+  ): Promise<TaskResult> => {
+    return new Promise((resolve, reject) => {
+      const source = new EventSource(`${API_BASE_URL}/api/events/${taskId}`);
+      let received = false;
+
+      source.addEventListener("status", (event) => {
+        received = true;
+        if (onProgress) {
+          onProgress(JSON.parse((event as MessageEvent).data));
+        }
+      });
+      source.addEventListener("result", (event) => {
+        source.close();
+        resolve(JSON.parse((event as MessageEvent).data));
+      });
+      source.addEventListener("deleted", () => {
+        source.close();
+        reject(new TaskDeletedError(taskId));
+      });
+      source.onerror = () => {
+        // The browser reconnects on its own once the stream was working
+        if (!received) {
+          source.close();
+          reject(new Error("Event stream unavailable"));
+        }
+      };
+    });
+  },
+
   pollTaskStatus: async (
     taskId: string,
     onProgress?: (status: TaskStatus) => void,
     intervalMs: number = 2000
   ): Promise<TaskResult> => {
+    if (typeof EventSource !== "undefined") {
+      try {
+        return await apiService.watchTaskEvents(taskId, onProgress);
+      } catch (error) {
+        // A deleted task is final; otherwise fall back to polling below
+        if (error instanceof TaskDeletedError) {
+          throw error;
+        }
+      }
+    }
+
     return new Promise((resolve, reject) => {
       const poll = async () => {
         try {